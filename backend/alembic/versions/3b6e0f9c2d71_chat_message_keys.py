@@ -0,0 +1,45 @@
+"""chat message keys
+
+Revision ID: 3b6e0f9c2d71
+Revises: 7f3c9d2e4b18
+Create Date: 2026-10-19 16:02:17.538260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b6e0f9c2d71'
+down_revision: Union[str, Sequence[str], None] = '7f3c9d2e4b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Khóa idempotency (sender_id, client_message_id) cho việc gửi lại tin nhắn
+    op.create_table(
+        'chat_message_keys',
+        sa.Column('sender_id', sa.Uuid(), nullable=False),
+        sa.Column('client_message_id', sa.String(length=64), nullable=False),
+        sa.Column('message_id', sa.Uuid(), nullable=False),
+        sa.Column('message_created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('create_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['sender_id'], ['user.id'], name=op.f('chat_message_keys_sender_id_fkey'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id', name=op.f('chat_message_keys_pkey')),
+        sa.UniqueConstraint('sender_id', 'client_message_id', name='uq_chat_message_key_sender'),
+    )
+    op.create_index(op.f('chat_message_keys_id_idx'), 'chat_message_keys', ['id'], unique=False)
+    op.create_index('chat_message_keys_create_at_idx', 'chat_message_keys', ['create_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('chat_message_keys_create_at_idx', table_name='chat_message_keys')
+    op.drop_index(op.f('chat_message_keys_id_idx'), table_name='chat_message_keys')
+    op.drop_table('chat_message_keys')
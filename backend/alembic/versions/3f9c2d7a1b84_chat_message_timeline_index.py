@@ -0,0 +1,58 @@
+"""chat message timeline index
+
+Revision ID: 3f9c2d7a1b84
+Revises: 04b0aefcf46d
+Create Date: 2026-10-19 09:12:04.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2d7a1b84'
+down_revision: Union[str, Sequence[str], None] = '04b0aefcf46d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Tạo index CONCURRENTLY để không khóa ghi trên bảng chat_messages lớn
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'chat_messages_conversation_timeline_idx',
+            'chat_messages',
+            ['conversation_id', sa.text('create_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # Index composite đã bao phủ tiền tố conversation_id
+        op.drop_index(
+            op.f('chat_messages_conversation_id_idx'),
+            table_name='chat_messages',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('chat_messages_conversation_id_idx'),
+            'chat_messages',
+            ['conversation_id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            'chat_messages_conversation_timeline_idx',
+            table_name='chat_messages',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
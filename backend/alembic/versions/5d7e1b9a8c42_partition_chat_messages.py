@@ -0,0 +1,181 @@
+"""partition chat messages
+
+Revision ID: 5d7e1b9a8c42
+Revises: e9a4b27c3f15
+Create Date: 2026-10-19 14:05:33.671904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7e1b9a8c42'
+down_revision: Union[str, Sequence[str], None] = 'e9a4b27c3f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Số tháng partition tạo sẵn phía trước; cron `maintain_chat_partitions` duy trì tiếp
+MONTHS_AHEAD = 3
+
+COPY_COLUMNS = (
+    "id, conversation_id, sender_id, seq, content, attachment_name, attachment_key, "
+    "attachment_content_type, attachment_size, create_at, updated_at"
+)
+
+
+def _message_columns() -> list[sa.Column]:
+    return [
+        sa.Column('create_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('conversation_id', sa.Uuid(), nullable=False),
+        sa.Column('sender_id', sa.Uuid(), nullable=False),
+        sa.Column('seq', sa.BigInteger(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('attachment_name', sa.String(length=255), nullable=True),
+        sa.Column('attachment_key', sa.String(length=512), nullable=True),
+        sa.Column('attachment_content_type', sa.String(length=100), nullable=True),
+        sa.Column('attachment_size', sa.Integer(), nullable=True),
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "to_tsvector('chat_search'::regconfig, coalesce(content, ''))",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['conversation_id'], ['chat_conversations.id'], name=op.f('chat_messages_conversation_id_fkey'), ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['sender_id'], ['user.id'], name=op.f('chat_messages_sender_id_fkey'), ondelete='CASCADE'),
+    ]
+
+
+def _create_message_indexes(*, unique_seq: bool) -> None:
+    op.create_index(op.f('chat_messages_id_idx'), 'chat_messages', ['id'], unique=False)
+    op.create_index(op.f('chat_messages_sender_id_idx'), 'chat_messages', ['sender_id'], unique=False)
+    op.create_index(
+        'chat_messages_conversation_timeline_idx',
+        'chat_messages',
+        ['conversation_id', sa.text('create_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'chat_messages_conversation_seq_idx',
+        'chat_messages',
+        ['conversation_id', 'seq'],
+        unique=unique_seq,
+    )
+    op.create_index(
+        'chat_messages_search_idx',
+        'chat_messages',
+        ['search_vector'],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def _drop_message_indexes() -> None:
+    for name in (
+        'chat_messages_search_idx',
+        'chat_messages_conversation_seq_idx',
+        'chat_messages_conversation_timeline_idx',
+        'chat_messages_sender_id_idx',
+        'chat_messages_id_idx',
+    ):
+        op.drop_index(name, table_name='chat_messages')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Giữ bảng cũ để copy dữ liệu; bỏ index trước để tránh trùng tên và copy nhanh hơn
+    _drop_message_indexes()
+    op.execute("ALTER TABLE chat_messages RENAME CONSTRAINT chat_messages_pkey TO chat_messages_unpartitioned_pkey")
+    op.rename_table('chat_messages', 'chat_messages_unpartitioned')
+
+    op.create_table(
+        'chat_messages',
+        *_message_columns(),
+        sa.PrimaryKeyConstraint('create_at', 'id', name=op.f('chat_messages_pkey')),
+        postgresql_partition_by='RANGE (create_at)',
+    )
+
+    # Partition theo tháng: từ tháng của tin nhắn cũ nhất tới MONTHS_AHEAD tháng sau
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month_start timestamptz := date_trunc(
+                'month',
+                LEAST(
+                    COALESCE((SELECT MIN(create_at) FROM chat_messages_unpartitioned), now()),
+                    now()
+                ) AT TIME ZONE 'UTC'
+            ) AT TIME ZONE 'UTC';
+            last_month timestamptz := date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+                + interval '{MONTHS_AHEAD} months';
+        BEGIN
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF chat_messages FOR VALUES FROM (%L) TO (%L)',
+                    'chat_messages_p' || to_char(month_start AT TIME ZONE 'UTC', 'YYYYMM'),
+                    month_start,
+                    month_start + interval '1 month'
+                );
+                month_start := month_start + interval '1 month';
+            END LOOP;
+        END
+        $$
+        """
+    )
+
+    op.execute(
+        f"INSERT INTO chat_messages ({COPY_COLUMNS}) "
+        f"SELECT {COPY_COLUMNS} FROM chat_messages_unpartitioned"
+    )
+    op.drop_table('chat_messages_unpartitioned')
+
+    # Index tạo trên bảng cha sẽ tự áp dụng cho mọi partition
+    _create_message_indexes(unique_seq=False)
+
+    op.create_table(
+        'chat_message_archives',
+        sa.Column('range_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('range_end', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('object_key', sa.String(length=512), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('create_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('chat_message_archives_pkey')),
+        sa.UniqueConstraint('range_start', name=op.f('chat_message_archives_range_start_key')),
+    )
+    op.create_index(op.f('chat_message_archives_id_idx'), 'chat_message_archives', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Dữ liệu đã archive lên S3 không được nạp lại
+    op.drop_index(op.f('chat_message_archives_id_idx'), table_name='chat_message_archives')
+    op.drop_table('chat_message_archives')
+
+    _drop_message_indexes()
+    op.execute("ALTER TABLE chat_messages RENAME CONSTRAINT chat_messages_pkey TO chat_messages_partitioned_pkey")
+    op.rename_table('chat_messages', 'chat_messages_partitioned')
+
+    op.create_table(
+        'chat_messages',
+        *_message_columns(),
+        sa.PrimaryKeyConstraint('id', name=op.f('chat_messages_pkey')),
+    )
+    op.execute(
+        f"INSERT INTO chat_messages ({COPY_COLUMNS}) "
+        f"SELECT {COPY_COLUMNS} FROM chat_messages_partitioned"
+    )
+    # DROP bảng cha partitioned sẽ xóa luôn các partition con
+    op.drop_table('chat_messages_partitioned')
+
+    _create_message_indexes(unique_seq=True)
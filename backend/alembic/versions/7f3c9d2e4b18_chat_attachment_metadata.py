@@ -0,0 +1,30 @@
+"""chat attachment metadata
+
+Revision ID: 7f3c9d2e4b18
+Revises: 5d7e1b9a8c42
+Create Date: 2026-10-19 15:12:48.204517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3c9d2e4b18'
+down_revision: Union[str, Sequence[str], None] = '5d7e1b9a8c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Kích thước ảnh, blurhash và key thumbnail do job `generate_attachment_thumbnails` ghi
+    op.add_column('chat_messages', sa.Column('attachment_metadata', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chat_messages', 'attachment_metadata')
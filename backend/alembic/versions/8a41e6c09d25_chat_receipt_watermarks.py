@@ -0,0 +1,91 @@
+"""chat receipt watermarks
+
+Revision ID: 8a41e6c09d25
+Revises: 3f9c2d7a1b84
+Create Date: 2026-10-19 10:03:51.402217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a41e6c09d25'
+down_revision: Union[str, Sequence[str], None] = '3f9c2d7a1b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_participants', sa.Column('last_delivered_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Backfill watermark từ receipts cũ: mốc = create_at của tin nhắn mới nhất đã delivered/read
+    op.execute(
+        """
+        UPDATE chat_participants AS p
+        SET last_delivered_at = w.delivered_up_to,
+            last_read_at = COALESCE(w.read_up_to, p.last_read_at)
+        FROM (
+            SELECT m.conversation_id,
+                   r.user_id,
+                   MAX(m.create_at) FILTER (
+                       WHERE r.delivered_at IS NOT NULL OR r.read_at IS NOT NULL
+                   ) AS delivered_up_to,
+                   MAX(m.create_at) FILTER (WHERE r.read_at IS NOT NULL) AS read_up_to
+            FROM chat_message_receipts AS r
+            JOIN chat_messages AS m ON m.id = r.message_id
+            GROUP BY m.conversation_id, r.user_id
+        ) AS w
+        WHERE p.conversation_id = w.conversation_id
+          AND p.user_id = w.user_id
+        """
+    )
+
+    op.drop_index(op.f('chat_message_receipts_user_id_idx'), table_name='chat_message_receipts')
+    op.drop_index(op.f('chat_message_receipts_message_id_idx'), table_name='chat_message_receipts')
+    op.drop_index(op.f('chat_message_receipts_id_idx'), table_name='chat_message_receipts')
+    op.drop_table('chat_message_receipts')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table('chat_message_receipts',
+    sa.Column('message_id', sa.Uuid(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('create_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['message_id'], ['chat_messages.id'], name=op.f('chat_message_receipts_message_id_fkey'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], name=op.f('chat_message_receipts_user_id_fkey'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name=op.f('chat_message_receipts_pkey')),
+    sa.UniqueConstraint('message_id', 'user_id', name='uq_chat_message_receipt')
+    )
+    op.create_index(op.f('chat_message_receipts_id_idx'), 'chat_message_receipts', ['id'], unique=False)
+    op.create_index(op.f('chat_message_receipts_message_id_idx'), 'chat_message_receipts', ['message_id'], unique=False)
+    op.create_index(op.f('chat_message_receipts_user_id_idx'), 'chat_message_receipts', ['user_id'], unique=False)
+
+    # Tái tạo receipts theo từng tin nhắn từ watermark
+    op.execute(
+        """
+        INSERT INTO chat_message_receipts (id, message_id, user_id, delivered_at, read_at, create_at, updated_at)
+        SELECT gen_random_uuid(),
+               m.id,
+               p.user_id,
+               CASE WHEN GREATEST(p.last_delivered_at, p.last_read_at) >= m.create_at
+                    THEN GREATEST(p.last_delivered_at, p.last_read_at) END,
+               CASE WHEN p.last_read_at >= m.create_at THEN p.last_read_at END,
+               m.create_at,
+               now()
+        FROM chat_messages AS m
+        JOIN chat_participants AS p
+          ON p.conversation_id = m.conversation_id
+         AND p.user_id <> m.sender_id
+        """
+    )
+
+    op.drop_column('chat_participants', 'last_delivered_at')
@@ -0,0 +1,63 @@
+"""chat direct pair key
+
+Revision ID: 9a2d4c6e8f13
+Revises: 3b6e0f9c2d71
+Create Date: 2026-10-19 16:48:05.214733
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a2d4c6e8f13'
+down_revision: Union[str, Sequence[str], None] = '3b6e0f9c2d71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_conversations', sa.Column('direct_pair_key', sa.String(length=73), nullable=True))
+
+    # Backfill cho hội thoại 1:1 có sẵn; nếu một cặp đã bị tạo trùng thì chỉ
+    # hội thoại cũ nhất giữ khóa, các bản trùng để NULL
+    op.execute(
+        """
+        WITH pairs AS (
+            SELECT conversation_id,
+                   MIN(user_id::text COLLATE "C") || ':' || MAX(user_id::text COLLATE "C") AS pair_key
+            FROM chat_participants
+            GROUP BY conversation_id
+            HAVING COUNT(DISTINCT user_id) = 2
+        ),
+        ranked AS (
+            SELECT pairs.conversation_id,
+                   pairs.pair_key,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY pairs.pair_key
+                       ORDER BY chat_conversations.create_at, chat_conversations.id
+                   ) AS position
+            FROM pairs
+            JOIN chat_conversations ON chat_conversations.id = pairs.conversation_id
+        )
+        UPDATE chat_conversations
+        SET direct_pair_key = ranked.pair_key
+        FROM ranked
+        WHERE chat_conversations.id = ranked.conversation_id
+          AND ranked.position = 1
+        """
+    )
+    op.create_unique_constraint(
+        'uq_chat_conversation_direct_pair',
+        'chat_conversations',
+        ['direct_pair_key'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_chat_conversation_direct_pair', 'chat_conversations', type_='unique')
+    op.drop_column('chat_conversations', 'direct_pair_key')
@@ -0,0 +1,33 @@
+"""chat group conversations
+
+Revision ID: c4e8a1f7d205
+Revises: 9a2d4c6e8f13
+Create Date: 2026-10-19 17:21:46.903518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f7d205'
+down_revision: Union[str, Sequence[str], None] = '9a2d4c6e8f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Hội thoại nhóm: tiêu đề, cờ is_group và vai trò thành viên (admin/member)
+    op.add_column('chat_conversations', sa.Column('is_group', sa.Boolean(), server_default='false', nullable=False))
+    op.add_column('chat_conversations', sa.Column('title', sa.String(length=255), nullable=True))
+    op.add_column('chat_participants', sa.Column('role', sa.String(length=16), server_default='member', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chat_participants', 'role')
+    op.drop_column('chat_conversations', 'title')
+    op.drop_column('chat_conversations', 'is_group')
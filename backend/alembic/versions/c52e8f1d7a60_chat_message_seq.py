@@ -0,0 +1,68 @@
+"""chat message seq
+
+Revision ID: c52e8f1d7a60
+Revises: 8a41e6c09d25
+Create Date: 2026-10-19 11:26:08.514093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52e8f1d7a60'
+down_revision: Union[str, Sequence[str], None] = '8a41e6c09d25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_conversations', sa.Column('last_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('chat_messages', sa.Column('seq', sa.BigInteger(), nullable=True))
+
+    # Đánh số lại tin nhắn cũ theo thứ tự thời gian trong từng hội thoại
+    op.execute(
+        """
+        UPDATE chat_messages AS m
+        SET seq = numbered.seq
+        FROM (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY conversation_id
+                       ORDER BY create_at, id
+                   ) AS seq
+            FROM chat_messages
+        ) AS numbered
+        WHERE numbered.id = m.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE chat_conversations AS c
+        SET last_seq = counts.last_seq
+        FROM (
+            SELECT conversation_id, MAX(seq) AS last_seq
+            FROM chat_messages
+            GROUP BY conversation_id
+        ) AS counts
+        WHERE counts.conversation_id = c.id
+        """
+    )
+
+    op.alter_column('chat_messages', 'seq', nullable=False)
+    op.create_index(
+        'chat_messages_conversation_seq_idx',
+        'chat_messages',
+        ['conversation_id', 'seq'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('chat_messages_conversation_seq_idx', table_name='chat_messages')
+    op.drop_column('chat_messages', 'seq')
+    op.drop_column('chat_conversations', 'last_seq')
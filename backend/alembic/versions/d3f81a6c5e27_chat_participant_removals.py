@@ -0,0 +1,45 @@
+"""chat participant removals
+
+Revision ID: d3f81a6c5e27
+Revises: e1b7c3a9f462
+Create Date: 2026-10-19 21:04:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f81a6c5e27'
+down_revision: Union[str, Sequence[str], None] = 'e1b7c3a9f462'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Dấu vết thành viên rời / bị xóa khỏi hội thoại, để /chat/sync báo lại
+    op.create_table(
+        'chat_participant_removals',
+        sa.Column('conversation_id', sa.Uuid(), nullable=False),
+        sa.Column('user_id', sa.Uuid(), nullable=False),
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('create_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['conversation_id'], ['chat_conversations.id'], name=op.f('chat_participant_removals_conversation_id_fkey'), ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], name=op.f('chat_participant_removals_user_id_fkey'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id', name=op.f('chat_participant_removals_pkey')),
+    )
+    op.create_index(op.f('chat_participant_removals_id_idx'), 'chat_participant_removals', ['id'], unique=False)
+    op.create_index('chat_participant_removals_conversation_create_at_idx', 'chat_participant_removals', ['conversation_id', 'create_at'], unique=False)
+    op.create_index('chat_participant_removals_user_create_at_idx', 'chat_participant_removals', ['user_id', 'create_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('chat_participant_removals_user_create_at_idx', table_name='chat_participant_removals')
+    op.drop_index('chat_participant_removals_conversation_create_at_idx', table_name='chat_participant_removals')
+    op.drop_index(op.f('chat_participant_removals_id_idx'), table_name='chat_participant_removals')
+    op.drop_table('chat_participant_removals')
@@ -0,0 +1,42 @@
+"""chat moderation rules
+
+Revision ID: e1b7c3a9f462
+Revises: c4e8a1f7d205
+Create Date: 2026-10-19 17:58:12.406781
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b7c3a9f462'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a1f7d205'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Từ khóa / regex bị chặn trong tin nhắn chat, do admin cấu hình
+    op.create_table(
+        'chat_moderation_rules',
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('pattern', sa.String(length=512), nullable=False),
+        sa.Column('reason', sa.String(length=255), nullable=True),
+        sa.Column('is_active', sa.Boolean(), server_default='true', nullable=False),
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('create_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('chat_moderation_rules_pkey')),
+        sa.UniqueConstraint('kind', 'pattern', name='uq_chat_moderation_rule_pattern'),
+    )
+    op.create_index(op.f('chat_moderation_rules_id_idx'), 'chat_moderation_rules', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('chat_moderation_rules_id_idx'), table_name='chat_moderation_rules')
+    op.drop_table('chat_moderation_rules')
@@ -0,0 +1,61 @@
+"""chat message search
+
+Revision ID: e9a4b27c3f15
+Revises: c52e8f1d7a60
+Create Date: 2026-10-19 12:40:17.286530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9a4b27c3f15'
+down_revision: Union[str, Sequence[str], None] = 'c52e8f1d7a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+
+    # Cấu hình full-text bỏ dấu tiếng Việt: tách từ kiểu `simple` rồi qua `unaccent`
+    op.execute("CREATE TEXT SEARCH CONFIGURATION chat_search (COPY = simple)")
+    op.execute(
+        """
+        ALTER TEXT SEARCH CONFIGURATION chat_search
+            ALTER MAPPING FOR hword, hword_part, word
+            WITH unaccent, simple
+        """
+    )
+
+    op.add_column(
+        'chat_messages',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "to_tsvector('chat_search'::regconfig, coalesce(content, ''))",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        'chat_messages_search_idx',
+        'chat_messages',
+        ['search_vector'],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('chat_messages_search_idx', table_name='chat_messages', postgresql_using='gin')
+    op.drop_column('chat_messages', 'search_vector')
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS chat_search")
@@ -0,0 +1,51 @@
+"""chat receipt seq watermarks
+
+Revision ID: f6a2c8d4b913
+Revises: d3f81a6c5e27
+Create Date: 2026-10-19 21:41:09.552817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a2c8d4b913'
+down_revision: Union[str, Sequence[str], None] = 'd3f81a6c5e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_participants', sa.Column('last_delivered_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('chat_participants', sa.Column('last_read_seq', sa.BigInteger(), server_default='0', nullable=False))
+
+    # Backfill từ watermark thời gian: seq lớn nhất của tin nhắn có create_at <= mốc;
+    # mốc đã qua tin cuối cùng (kể cả tin đã lưu trữ) thì lấy luôn last_seq của hội thoại
+    for column in ('delivered', 'read'):
+        op.execute(
+            f"""
+            UPDATE chat_participants AS p
+            SET last_{column}_seq = GREATEST(
+                COALESCE((
+                    SELECT MAX(m.seq)
+                    FROM chat_messages AS m
+                    WHERE m.conversation_id = p.conversation_id
+                      AND m.create_at <= p.last_{column}_at
+                ), 0),
+                CASE WHEN p.last_{column}_at >= c.last_message_at THEN c.last_seq ELSE 0 END
+            )
+            FROM chat_conversations AS c
+            WHERE c.id = p.conversation_id
+              AND p.last_{column}_at IS NOT NULL
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chat_participants', 'last_read_seq')
+    op.drop_column('chat_participants', 'last_delivered_seq')
@@ -0,0 +1,482 @@
+"""Load test for the chat WebSocket endpoint.
+
+Seeds throwaway users and conversations straight into Postgres, opens
+authenticated `/chat/ws` sockets and drives a weighted mix of message, typing
+and ack events at a fixed rate. Reports fan-out latency percentiles (send ->
+each recipient, and send -> last recipient), server CPU time and DB queries
+per event, and server memory per connection.
+
+Run from `backend/` with the same `.env` as the API server, against the
+docker-compose Postgres / Redis and a locally running server:
+
+    uv run python -m scripts.chat_load_test --users 1000 --connections 2000 \\
+        --group-size 2 --rate 200 --duration 60 --server-pid <uvicorn pid>
+
+Server CPU and memory are read from /proc/<pid> (Linux only; skipped without
+`--server-pid`). DB queries come from `pg_stat_statements` when the extension
+is installed, otherwise committed transactions are reported instead. Seeded
+rows are deleted at the end unless `--keep-data` is given.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from sqlalchemy import delete, insert, text
+from websockets.asyncio.client import ClientConnection, connect
+
+from src.auth.services import create_access_token, hash_password
+from src.chat.models import ChatConversation, ChatParticipant, direct_pair_key
+from src.core.base_model import time_now
+from src.core.database import SessionLocal
+from src.user.models import User
+
+EVENT_TYPES = ("message", "typing", "ack")
+# Server-side chat limit: CHAT_RATE_LIMIT_MAX_EVENTS per CHAT_RATE_LIMIT_WINDOW_SECONDS.
+SAFE_MESSAGES_PER_USER_PER_SECOND = 3.0
+
+
+@dataclass
+class Conversation:
+    id: uuid.UUID
+    member_ids: list[uuid.UUID]
+
+
+@dataclass
+class PendingMessage:
+    sent_ns: int
+    expected: int
+    received: int = 0
+    last_ns: int = 0
+
+
+@dataclass
+class Stats:
+    sent: Counter = field(default_factory=Counter)
+    received: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    delivery_ms: list[float] = field(default_factory=list)
+    pending: dict[str, PendingMessage] = field(default_factory=dict)
+
+
+    def record_delivery(self, client_message_id: str, now_ns: int) -> None:
+        pending = self.pending.get(client_message_id)
+        if pending is None:
+            return
+        pending.received += 1
+        pending.last_ns = max(pending.last_ns, now_ns)
+        self.delivery_ms.append((now_ns - pending.sent_ns) / 1e6)
+
+
+class Client:
+    """One socket of a seeded user."""
+
+    def __init__(self, user_id: uuid.UUID, token: str, conversations: list[Conversation]) -> None:
+        self.user_id = user_id
+        self.token = token
+        self.conversations = conversations
+        self.websocket: ClientConnection | None = None
+        self.last_message_ids: dict[str, str] = {}
+
+
+    async def open(self, ws_url: str) -> None:
+        self.websocket = await connect(
+            f"{ws_url}?token={self.token}",
+            open_timeout=30,
+            ping_interval=None,
+            max_size=2**20,
+        )
+
+
+    async def send(self, payload: dict) -> None:
+        await self.websocket.send(json.dumps(payload))
+
+
+    async def read(self, stats: Stats) -> None:
+        async for raw in self.websocket:
+            now_ns = time.monotonic_ns()
+            event = json.loads(raw)
+            event_type = event.get("type")
+            stats.received[event_type] += 1
+            if event_type == "ping":
+                await self.send({"type": "pong"})
+            elif event_type == "error":
+                stats.errors[event.get("message")] += 1
+            elif event_type == "message":
+                data = event["data"]
+                if data["sender_id"] == str(self.user_id):
+                    continue
+                self.last_message_ids[data["conversation_id"]] = data["id"]
+                if data.get("client_message_id"):
+                    stats.record_delivery(data["client_message_id"], now_ns)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def format_percentiles(values: list[float]) -> str:
+    if not values:
+        return "n/a"
+    return "  ".join(
+        f"p{label}={percentile(values, fraction):.1f}ms"
+        for label, fraction in (("50", 0.5), ("90", 0.9), ("99", 0.99), ("max", 1.0))
+    )
+
+
+class ProcessSampler:
+    """CPU seconds and RSS of the server process from /proc (Linux)."""
+
+    def __init__(self, pid: int | None) -> None:
+        self.pid = pid
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+    def cpu_seconds(self) -> float | None:
+        if self.pid is None:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/stat") as handle:
+                # Fields after the command name; utime and stime are 14 and 15.
+                fields = handle.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+
+    def rss_bytes(self) -> int | None:
+        if self.pid is None:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/status") as handle:
+                for line in handle:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+        return None
+
+
+async def db_query_count() -> tuple[int | None, str]:
+    async with SessionLocal() as db:
+        try:
+            calls = await db.scalar(text("SELECT sum(calls) FROM pg_stat_statements"))
+            return int(calls or 0), "queries"
+        except Exception:
+            await db.rollback()
+        try:
+            committed = await db.scalar(
+                text(
+                    "SELECT xact_commit + xact_rollback FROM pg_stat_database "
+                    "WHERE datname = current_database()"
+                )
+            )
+            return int(committed or 0), "transactions"
+        except Exception:
+            return None, "queries"
+
+
+async def seed(run_id: str, user_count: int, group_size: int) -> tuple[list[uuid.UUID], list[Conversation]]:
+    password_hash = hash_password(uuid.uuid4().hex)
+    now = time_now()
+    user_rows = [
+        {
+            "id": uuid.uuid4(),
+            "username": f"loadtest {run_id} {index}",
+            "email": f"lt-{run_id}-{index}@example.com",
+            "hashed_password": password_hash,
+            "role": "client",
+            "is_email_verified": True,
+            "create_at": now,
+            "updated_at": now,
+        }
+        for index in range(user_count)
+    ]
+    user_ids = [row["id"] for row in user_rows]
+
+    conversations: list[Conversation] = []
+    conversation_rows = []
+    participant_rows = []
+    for start in range(0, user_count - group_size + 1, group_size):
+        member_ids = user_ids[start:start + group_size]
+        conversation = Conversation(id=uuid.uuid4(), member_ids=member_ids)
+        conversations.append(conversation)
+        is_group = group_size > 2
+        conversation_rows.append(
+            {
+                "id": conversation.id,
+                "is_group": is_group,
+                "title": f"loadtest {run_id}" if is_group else None,
+                "direct_pair_key": None if is_group else direct_pair_key(*member_ids),
+                "last_seq": 0,
+                "create_at": now,
+                "updated_at": now,
+            }
+        )
+        participant_rows.extend(
+            {
+                "id": uuid.uuid4(),
+                "conversation_id": conversation.id,
+                "user_id": member_id,
+                "role": "admin" if is_group and position == 0 else "member",
+                "create_at": now,
+                "updated_at": now,
+            }
+            for position, member_id in enumerate(member_ids)
+        )
+
+    async with SessionLocal() as db:
+        for table, rows in (
+            (User, user_rows),
+            (ChatConversation, conversation_rows),
+            (ChatParticipant, participant_rows),
+        ):
+            for offset in range(0, len(rows), 1000):
+                await db.execute(insert(table), rows[offset:offset + 1000])
+        await db.commit()
+    return user_ids, conversations
+
+
+async def cleanup(user_ids: list[uuid.UUID], conversations: list[Conversation]) -> None:
+    async with SessionLocal() as db:
+        conversation_ids = [conversation.id for conversation in conversations]
+        for offset in range(0, len(conversation_ids), 1000):
+            await db.execute(
+                delete(ChatConversation).where(
+                    ChatConversation.id.in_(conversation_ids[offset:offset + 1000])
+                )
+            )
+        for offset in range(0, len(user_ids), 1000):
+            await db.execute(delete(User).where(User.id.in_(user_ids[offset:offset + 1000])))
+        await db.commit()
+
+
+def raise_fd_limit() -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def open_clients(clients: list[Client], ws_url: str, concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = Counter()
+
+    async def open_one(client: Client) -> None:
+        async with semaphore:
+            try:
+                await client.open(ws_url)
+            except Exception as exc:
+                failures[type(exc).__name__] += 1
+
+    await asyncio.gather(*(open_one(client) for client in clients))
+    for reason, count in failures.items():
+        print(f"  connect failures: {count} x {reason}", flush=True)
+    return sum(failures.values())
+
+
+async def drive(clients: list[Client],
+                stats: Stats,
+                *,
+                run_id: str,
+                rate: float,
+                duration: float,
+                weights: dict[str, float]
+                ) -> None:
+    sockets_by_user: dict[uuid.UUID, int] = Counter(client.user_id for client in clients)
+    kinds = list(weights)
+    kind_weights = [weights[kind] for kind in kinds]
+    interval = 1 / rate
+    deadline = time.monotonic() + duration
+    next_at = time.monotonic()
+    sequence = 0
+
+    while time.monotonic() < deadline:
+        client = random.choice(clients)
+        conversation = random.choice(client.conversations)
+        kind = random.choices(kinds, kind_weights)[0]
+        try:
+            if kind == "message":
+                sequence += 1
+                client_message_id = f"{run_id}:{sequence}"
+                stats.pending[client_message_id] = PendingMessage(
+                    sent_ns=time.monotonic_ns(),
+                    expected=sum(
+                        sockets_by_user[member_id]
+                        for member_id in conversation.member_ids
+                        if member_id != client.user_id
+                    ),
+                )
+                await client.send(
+                    {
+                        "type": "message",
+                        "conversation_id": str(conversation.id),
+                        "content": f"load test message {sequence}",
+                        "client_message_id": client_message_id,
+                    }
+                )
+            elif kind == "typing":
+                await client.send(
+                    {"type": "typing", "conversation_id": str(conversation.id), "is_typing": True}
+                )
+            else:
+                message_id = client.last_message_ids.get(str(conversation.id))
+                if message_id is None:
+                    kind = "ack_skipped"
+                else:
+                    await client.send(
+                        {
+                            "type": "ack",
+                            "conversation_id": str(conversation.id),
+                            "up_to_message_id": message_id,
+                            "status": "read",
+                        }
+                    )
+            stats.sent[kind] += 1
+        except Exception as exc:
+            stats.errors[f"send: {type(exc).__name__}"] += 1
+
+        next_at += interval
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def parse_weights(raw: str) -> dict[str, float]:
+    weights = {}
+    for part in raw.split(","):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in EVENT_TYPES:
+            raise argparse.ArgumentTypeError(f"unknown event type: {name}")
+        weights[name] = float(value)
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError("at least one weight must be positive")
+    return weights
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ws-url", default="ws://localhost:8000/chat/ws")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=None, help="sockets to open (default: one per user)")
+    parser.add_argument("--group-size", type=int, default=2, help="members per conversation; 2 = direct chats")
+    parser.add_argument("--rate", type=float, default=50.0, help="events per second across all sockets")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--mix", type=parse_weights, default="message=0.6,typing=0.3,ack=0.1")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--drain", type=float, default=3.0, help="seconds to wait for in-flight fan-out")
+    parser.add_argument("--server-pid", type=int, default=None, help="uvicorn worker pid for CPU / memory")
+    parser.add_argument("--keep-data", action="store_true", help="do not delete seeded rows")
+    args = parser.parse_args()
+    if args.group_size < 2 or args.users < args.group_size:
+        parser.error("--group-size must be at least 2 and at most --users")
+    return args
+
+
+async def main() -> None:
+    args = parse_args()
+    raise_fd_limit()
+    run_id = uuid.uuid4().hex[:8]
+    connection_count = args.connections or args.users
+    sampler = ProcessSampler(args.server_pid)
+
+    messages_per_user = args.rate * args.mix.get("message", 0) / sum(args.mix.values()) / args.users
+    if messages_per_user > SAFE_MESSAGES_PER_USER_PER_SECOND:
+        print(
+            f"warning: ~{messages_per_user:.1f} messages/s per user will hit the chat rate limit",
+            flush=True,
+        )
+
+    print(f"seeding run {run_id}: {args.users} users, group size {args.group_size}", flush=True)
+    user_ids, conversations = await seed(run_id, args.users, args.group_size)
+    conversations_by_user: dict[uuid.UUID, list[Conversation]] = defaultdict(list)
+    for conversation in conversations:
+        for member_id in conversation.member_ids:
+            conversations_by_user[member_id].append(conversation)
+    members = [user_id for user_id in user_ids if conversations_by_user[user_id]]
+    emails = {user_id: f"lt-{run_id}-{index}@example.com" for index, user_id in enumerate(user_ids)}
+
+    try:
+        clients = [
+            Client(
+                user_id,
+                create_access_token(data={"sub": emails[user_id]}),
+                conversations_by_user[user_id],
+            )
+            for user_id in (members[index % len(members)] for index in range(connection_count))
+        ]
+
+        rss_before = sampler.rss_bytes()
+        started = time.monotonic()
+        failed = await open_clients(clients, args.ws_url, args.connect_concurrency)
+        clients = [client for client in clients if client.websocket is not None]
+        print(
+            f"opened {len(clients)} sockets in {time.monotonic() - started:.1f}s ({failed} failed)",
+            flush=True,
+        )
+        if not clients:
+            return
+        # Let the server settle presence broadcasts before measuring.
+        await asyncio.sleep(1.0)
+        rss_after = sampler.rss_bytes()
+
+        stats = Stats()
+        readers = [asyncio.create_task(client.read(stats)) for client in clients]
+        cpu_before = sampler.cpu_seconds()
+        queries_before, query_unit = await db_query_count()
+
+        await drive(
+            clients,
+            stats,
+            run_id=run_id,
+            rate=args.rate,
+            duration=args.duration,
+            weights=args.mix,
+        )
+        await asyncio.sleep(args.drain)
+
+        cpu_after = sampler.cpu_seconds()
+        queries_after, _ = await db_query_count()
+
+        for client in clients:
+            await client.websocket.close()
+        await asyncio.gather(*readers, return_exceptions=True)
+    finally:
+        if not args.keep_data:
+            await cleanup(user_ids, conversations)
+
+    total_events = sum(count for kind, count in stats.sent.items() if kind in EVENT_TYPES)
+    complete = [pending for pending in stats.pending.values() if pending.expected and pending.received >= pending.expected]
+    last_recipient_ms = [(pending.last_ns - pending.sent_ns) / 1e6 for pending in complete]
+    expected_messages = sum(1 for pending in stats.pending.values() if pending.expected)
+
+    print("\n=== chat load test ===")
+    print(f"sockets:            {len(clients)} ({len(members)} users, {len(conversations)} conversations)")
+    print(f"events sent:        {dict(stats.sent)} in {args.duration:.0f}s ({total_events / args.duration:.1f}/s)")
+    print(f"events received:    {dict(stats.received)}")
+    if stats.errors:
+        print(f"errors:             {dict(stats.errors)}")
+    print(f"delivery latency:   {format_percentiles(stats.delivery_ms)}")
+    print(f"last recipient:     {format_percentiles(last_recipient_ms)}")
+    print(f"fully delivered:    {len(complete)}/{expected_messages} messages")
+    if cpu_before is not None and cpu_after is not None and total_events:
+        print(f"server CPU/event:   {(cpu_after - cpu_before) / total_events * 1000:.3f}ms")
+    if queries_before is not None and queries_after is not None and total_events:
+        print(f"DB {query_unit}/event: {(queries_after - queries_before) / total_events:.2f}")
+    if rss_before is not None and rss_after is not None:
+        print(f"server RSS/socket:  {(rss_after - rss_before) / len(clients) / 1024:.1f}KiB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -10,7 +10,7 @@ from src.booking.models import (
     LawyerRating,
     LawyerScheduleSlot,
 )
-from src.chat.models import ChatConversation, ChatMessage, ChatParticipant
+from src.chat.models import ChatConversation, ChatMessage, ChatParticipant, direct_pair_key
 from src.core.database import DATABASE_URL, SessionLocal
 from src.lawyer.models import LawyerProfile
 from src.user.models import User
@@ -125,7 +125,11 @@ async def seed_data() -> None:
             # ------------------------------------------------------------------
             # 4. Create chat conversation between client and lawyer
             # ------------------------------------------------------------------
-            conversation = ChatConversation(last_message_at=now)
+            conversation = ChatConversation(
+                direct_pair_key=direct_pair_key(client.id, lawyer.id),
+                last_message_at=now,
+                last_seq=1,
+            )
             session.add(conversation)
             await session.flush()
             session.add_all(
@@ -139,6 +143,7 @@ async def seed_data() -> None:
                 ChatMessage(
                     conversation_id=conversation.id,
                     sender_id=client.id,
+                    seq=1,
                     content="Xin chào luật sư, tôi muốn hỏi về hợp đồng lao động.",
                 )
             )
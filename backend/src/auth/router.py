@@ -4,7 +4,9 @@ from sqlalchemy.future import select
 from jose import JWTError
 
 from src.core.database import SessionDep
+from src.core.config import settings
 from src.core.exceptions import NotAuthenticated
+from src.core.rate_limit import RateLimitPolicy, rate_limit
 
 from src.auth.services import (
     create_access_token,
@@ -27,9 +29,16 @@ auth_route = APIRouter(
 )
 
 
+LOGIN_POLICY = RateLimitPolicy(
+    name="auth.login",
+    limit=settings.AUTH_LOGIN_RATE_LIMIT_MAX_EVENTS,
+    period_seconds=settings.AUTH_LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+)
+
+
 #      LOGIN ROUTE      #
 
-@auth_route.post('/login')
+@auth_route.post('/login', dependencies=[Depends(rate_limit(LOGIN_POLICY, by="ip"))])
 async def login(db: SessionDep,
                 login_request: OAuth2PasswordRequestForm = Depends()):
     
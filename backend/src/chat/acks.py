@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from src.chat.manager import manager
+from src.chat.schemas import MessageDeliveryStatus
+from src.chat.services import ChatService
+from src.core.config import settings
+from src.core.database import SessionLocal
+
+logger = logging.getLogger("chat")
+
+AckKey = tuple[uuid.UUID, uuid.UUID]
+
+
+@dataclass
+class _PendingAck:
+    delivered_ids: set[uuid.UUID] = field(default_factory=set)
+    read_ids: set[uuid.UUID] = field(default_factory=set)
+    waiters: list[asyncio.Future[None]] = field(default_factory=list)
+
+
+class AckCoalescer:
+    """Buffers acks per (user, conversation) and flushes them once per window.
+
+    Acks are buffered as raw message ids. Every flush resolves them with one
+    SELECT, applies a single watermark UPDATE and publishes one aggregated
+    `receipt` event on the conversation topic, however many acks arrived
+    during the window. The UPDATE only matches the user's own participant
+    row, so acks for conversations the user is not in change nothing.
+    """
+
+    def __init__(self, window_seconds: float) -> None:
+        self._window = window_seconds
+        self._pending: dict[AckKey, _PendingAck] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._lock = asyncio.Lock()
+
+
+    async def submit(self,
+                     user_id: uuid.UUID,
+                     conversation_id: uuid.UUID,
+                     status: MessageDeliveryStatus,
+                     message_ids: Iterable[uuid.UUID],
+                     *,
+                     wait: bool = False
+                     ) -> None:
+        key = (user_id, conversation_id)
+        waiter: asyncio.Future[None] | None = None
+        async with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _PendingAck()
+                task = asyncio.create_task(self._flush_later(key))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            if status is MessageDeliveryStatus.READ:
+                pending.read_ids.update(message_ids)
+            else:
+                pending.delivered_ids.update(message_ids)
+
+            if wait:
+                waiter = asyncio.get_running_loop().create_future()
+                pending.waiters.append(waiter)
+
+        if waiter is not None:
+            await waiter
+
+
+    async def _flush_later(self, key: AckKey) -> None:
+        await asyncio.sleep(self._window)
+        await self._flush(key)
+
+
+    async def _flush(self, key: AckKey) -> None:
+        async with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+
+        user_id, conversation_id = key
+        try:
+            async with SessionLocal() as db:
+                service = ChatService(db)
+                created = await service.get_ack_watermarks(
+                    conversation_id,
+                    user_id,
+                    pending.delivered_ids | pending.read_ids,
+                )
+                read_up_to = max(
+                    (created[mid] for mid in pending.read_ids if mid in created),
+                    default=None,
+                )
+                delivered_up_to = max(
+                    (created[mid] for mid in pending.delivered_ids if mid in created),
+                    default=None,
+                )
+                moved = await service.advance_watermarks(
+                    conversation_id,
+                    user_id,
+                    delivered_up_to=delivered_up_to,
+                    read_up_to=read_up_to,
+                )
+                await db.commit()
+        except Exception as exc:
+            logger.exception(
+                "chat.ack.flush_failed",
+                extra={
+                    "conversation_id": str(conversation_id),
+                    "user_id": str(user_id),
+                },
+            )
+            for waiter in pending.waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+            return
+
+        if moved:
+            status = (
+                MessageDeliveryStatus.READ
+                if read_up_to is not None
+                else MessageDeliveryStatus.DELIVERED
+            )
+            delivered_up_to = max(
+                value
+                for value in (delivered_up_to, read_up_to)
+                if value is not None
+            )
+            await manager.publish(
+                conversation_id,
+                {
+                    "type": "receipt",
+                    "data": {
+                        "conversation_id": str(conversation_id),
+                        "message_ids": [str(mid) for mid in created],
+                        "status": status.value,
+                        "user_id": str(user_id),
+                        "delivered_up_to_seq": delivered_up_to[0],
+                        "read_up_to_seq": read_up_to[0] if read_up_to else None,
+                        "delivered_up_to": delivered_up_to[1].isoformat(),
+                        "read_up_to": (
+                            read_up_to[1].isoformat() if read_up_to else None
+                        ),
+                    },
+                },
+            )
+            logger.info(
+                "chat.message.acknowledged",
+                extra={
+                    "conversation_id": str(conversation_id),
+                    "user_id": str(user_id),
+                    "status": status.value,
+                    "message_count": len(created),
+                },
+            )
+
+        for waiter in pending.waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+    async def drain(self) -> None:
+        async with self._lock:
+            keys = list(self._pending)
+        await asyncio.gather(*(self._flush(key) for key in keys), return_exceptions=True)
+
+
+ack_coalescer = AckCoalescer(
+    window_seconds=settings.CHAT_ACK_COALESCE_WINDOW_MS / 1000,
+)
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+
+from aiobotocore.session import get_session
+from botocore.exceptions import ClientError
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chat.models import ChatConversation, ChatMessage, ChatMessageArchive
+from src.chat.schemas import MessagePageDirection
+from src.core.config import settings
+
+logger = logging.getLogger("chat")
+
+PARTITION_PREFIX = "chat_messages_p"
+CHAT_ARCHIVE_ROOT = "chat_archive/chat_messages"
+_UPLOAD_CONCURRENCY = 16
+
+# Columns exported to Parquet; `search_vector` is derived and not archived.
+_ARCHIVE_COLUMNS = (
+    "id",
+    "conversation_id",
+    "sender_id",
+    "seq",
+    "content",
+    "attachment_name",
+    "attachment_key",
+    "attachment_content_type",
+    "attachment_size",
+    "attachment_metadata",
+    "create_at",
+    "updated_at",
+)
+_UUID_COLUMNS = ("id", "conversation_id", "sender_id")
+
+
+def month_start(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{PARTITION_PREFIX}{start:%Y%m}"
+
+
+def _parse_partition_name(name: str) -> datetime | None:
+    try:
+        return datetime.strptime(name.removeprefix(PARTITION_PREFIX), "%Y%m").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _load_pyarrow():
+    # Imported on first use: pyarrow is heavy and only archive jobs and
+    # archive reads need it.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    return pa, pq
+
+
+def archive_object_key(prefix: str, conversation_id: uuid.UUID) -> str:
+    return f"{prefix}{conversation_id}.parquet"
+
+
+class _ArchiveCache:
+    """LRU of decoded archive objects, bounded by the total number of rows.
+
+    Archived months never change, so entries need no TTL. A missing object
+    (the conversation had no messages that month) is cached as empty.
+    """
+
+    def __init__(self, max_rows: int) -> None:
+        self._max_rows = max_rows
+        self._rows = 0
+        self._entries: OrderedDict[str, tuple[dict, ...]] = OrderedDict()
+
+
+    def get(self, key: str) -> tuple[dict, ...] | None:
+        rows = self._entries.get(key)
+        if rows is not None:
+            self._entries.move_to_end(key)
+        return rows
+
+
+    def set(self, key: str, rows: tuple[dict, ...]) -> None:
+        if len(rows) > self._max_rows:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._rows -= len(previous)
+        self._entries[key] = rows
+        self._rows += len(rows)
+        while self._rows > self._max_rows:
+            _, evicted = self._entries.popitem(last=False)
+            self._rows -= len(evicted)
+
+
+archive_cache = _ArchiveCache(max_rows=settings.CHAT_ARCHIVE_CACHE_MAX_ROWS)
+
+
+async def ensure_partitions(db: AsyncSession, *, months_ahead: int, now: datetime | None = None) -> list[str]:
+    start = month_start(now or datetime.now(timezone.utc))
+    created: list[str] = []
+    for offset in range(months_ahead + 1):
+        lower = add_months(start, offset)
+        upper = add_months(lower, 1)
+        name = partition_name(lower)
+        await db.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF chat_messages '
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+        created.append(name)
+    return created
+
+
+async def list_partitions(db: AsyncSession) -> list[tuple[str, datetime]]:
+    result = await db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = 'chat_messages'::regclass"
+        )
+    )
+    partitions = []
+    for (name,) in result.all():
+        start = _parse_partition_name(name)
+        if start is not None:
+            partitions.append((name, start))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def _write_parquet(rows: list[dict]) -> bytes:
+    """One conversation's messages for one month."""
+    pa, pq = _load_pyarrow()
+    rows = [
+        {**row, **{column: str(row[column]) for column in _UUID_COLUMNS}}
+        for row in rows
+    ]
+    rows.sort(key=lambda row: (row["create_at"], row["id"]))
+    table = pa.Table.from_pylist(rows)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd")
+    return buffer.getvalue()
+
+
+def _read_parquet(data: bytes) -> tuple[dict, ...]:
+    _, pq = _load_pyarrow()
+    rows = pq.read_table(io.BytesIO(data)).to_pylist()
+    for row in rows:
+        for column in _UUID_COLUMNS:
+            row[column] = uuid.UUID(row[column])
+    return tuple(rows)
+
+
+def _s3_client():
+    return get_session().create_client(
+        "s3",
+        region_name=settings.AWS_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+    )
+
+
+async def archive_partition(db: AsyncSession, name: str, start: datetime) -> ChatMessageArchive:
+    """Export one partition to Parquet, record it, then detach and drop it.
+
+    Each conversation gets its own object under the month's prefix, so a
+    history page reads only that conversation's messages.
+    """
+    columns = ", ".join(_ARCHIVE_COLUMNS)
+    result = await db.execute(text(f'SELECT {columns} FROM "{name}"'))
+    by_conversation: dict[uuid.UUID, list[dict]] = defaultdict(list)
+    row_count = 0
+    for row in result.mappings():
+        by_conversation[row["conversation_id"]].append(dict(row))
+        row_count += 1
+
+    end = add_months(start, 1)
+    object_key = f"{CHAT_ARCHIVE_ROOT}/{start:%Y/%m}/"
+    semaphore = asyncio.Semaphore(_UPLOAD_CONCURRENCY)
+
+    async def upload(client, conversation_id: uuid.UUID, rows: list[dict]) -> None:
+        async with semaphore:
+            payload = await asyncio.to_thread(_write_parquet, rows)
+            await client.put_object(
+                Bucket=settings.S3_BUCKET,
+                Key=archive_object_key(object_key, conversation_id),
+                Body=payload,
+                ContentType="application/vnd.apache.parquet",
+            )
+
+    if by_conversation:
+        async with _s3_client() as client:
+            await asyncio.gather(
+                *(upload(client, conversation_id, rows) for conversation_id, rows in by_conversation.items())
+            )
+
+    archive = ChatMessageArchive(
+        range_start=start,
+        range_end=end,
+        object_key=object_key,
+        row_count=row_count,
+    )
+    db.add(archive)
+    await db.flush()
+    await db.execute(text(f'ALTER TABLE chat_messages DETACH PARTITION "{name}"'))
+    await db.execute(text(f'DROP TABLE "{name}"'))
+    logger.info(
+        "chat.archive.partition_archived",
+        extra={
+            "partition": name,
+            "object_key": object_key,
+            "row_count": row_count,
+            "conversation_count": len(by_conversation),
+        },
+    )
+    return archive
+
+
+async def _fetch_archive_rows(archive: ChatMessageArchive, conversation_id: uuid.UUID) -> tuple[dict, ...]:
+    if archive.row_count == 0:
+        return ()
+    object_key = archive_object_key(archive.object_key, conversation_id)
+    rows = archive_cache.get(object_key)
+    if rows is not None:
+        return rows
+
+    async with _s3_client() as client:
+        try:
+            response = await client.get_object(Bucket=settings.S3_BUCKET, Key=object_key)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                logger.warning("chat.archive.object_unavailable", extra={"object_key": object_key})
+                return ()
+            # No messages in this conversation that month.
+            rows = ()
+        else:
+            async with response["Body"] as body:
+                data = await body.read()
+            rows = await asyncio.to_thread(_read_parquet, data)
+    archive_cache.set(object_key, rows)
+    return rows
+
+
+async def load_archived_messages(db: AsyncSession,
+                                 conversation_id: uuid.UUID,
+                                 *,
+                                 direction: MessagePageDirection,
+                                 position: tuple[datetime, uuid.UUID] | None,
+                                 limit: int
+                                 ) -> list[ChatMessage]:
+    """Page through archived months in timeline order, like `list_messages`.
+
+    Returns transient `ChatMessage` instances, newest first for OLDER pages
+    and oldest first for NEWER pages.
+    """
+    conversation_created = (
+        select(ChatConversation.create_at)
+        .where(ChatConversation.id == conversation_id)
+        .scalar_subquery()
+    )
+    stmt = select(ChatMessageArchive).where(ChatMessageArchive.range_end > conversation_created)
+    if direction is MessagePageDirection.NEWER:
+        stmt = stmt.order_by(ChatMessageArchive.range_start.asc())
+        if position:
+            stmt = stmt.where(ChatMessageArchive.range_end > position[0])
+    else:
+        stmt = stmt.order_by(ChatMessageArchive.range_start.desc())
+        if position:
+            stmt = stmt.where(ChatMessageArchive.range_start <= position[0])
+
+    archives = list((await db.execute(stmt)).scalars().all())
+    if not archives:
+        return []
+
+    newer = direction is MessagePageDirection.NEWER
+    collected: list[ChatMessage] = []
+    for archive in archives:
+        # Cached rows are shared: filter into a new list, never mutate them.
+        rows = list(await _fetch_archive_rows(archive, conversation_id))
+        if position:
+            rows = [
+                row for row in rows
+                if ((row["create_at"], row["id"]) > position if newer
+                    else (row["create_at"], row["id"]) < position)
+            ]
+        rows.sort(key=lambda row: (row["create_at"], row["id"]), reverse=not newer)
+        collected.extend(ChatMessage(**row) for row in rows)
+        if len(collected) >= limit:
+            break
+    return collected[:limit]
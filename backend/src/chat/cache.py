@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from redis.exceptions import RedisError
+
+from src.core.config import settings
+
+logger = logging.getLogger("chat")
+
+
+class IdSetCache:
+    """uuid -> frozenset of uuids.
+
+    In-process LRU with a TTL, optionally backed by Redis so workers share
+    warm entries. Writers must call `invalidate` whenever the set changes.
+    Used for conversation participants and for each user's contacts and
+    conversations.
+    """
+
+    def __init__(self,
+                 key_prefix: str,
+                 *,
+                 max_entries: int,
+                 ttl_seconds: float,
+                 redis_ttl_seconds: int
+                 ) -> None:
+        self._key_prefix = key_prefix
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._redis_ttl = redis_ttl_seconds
+        self._entries: OrderedDict[uuid.UUID, tuple[float, frozenset[uuid.UUID]]] = OrderedDict()
+        self._redis: Any | None = None
+
+
+    def attach_redis(self, redis_client: Any) -> None:
+        self._redis = redis_client
+
+
+    def _key(self, owner_id: uuid.UUID) -> str:
+        return f"{self._key_prefix}{owner_id}"
+
+
+    def _store_local(self, owner_id: uuid.UUID, ids: frozenset[uuid.UUID]) -> None:
+        self._entries[owner_id] = (time.monotonic() + self._ttl, ids)
+        self._entries.move_to_end(owner_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+    async def get(self, owner_id: uuid.UUID) -> frozenset[uuid.UUID] | None:
+        entry = self._entries.get(owner_id)
+        if entry is not None:
+            expires_at, ids = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(owner_id)
+                return ids
+            self._entries.pop(owner_id, None)
+
+        if self._redis is None:
+            return None
+        try:
+            raw_ids = await self._redis.smembers(self._key(owner_id))
+        except RedisError:
+            logger.warning("chat.id_set_cache.redis_unavailable", extra={"prefix": self._key_prefix})
+            return None
+        if not raw_ids:
+            return None
+
+        ids = frozenset(uuid.UUID(str(raw)) for raw in raw_ids)
+        self._store_local(owner_id, ids)
+        return ids
+
+
+    async def set(self, owner_id: uuid.UUID, ids: Iterable[uuid.UUID]) -> None:
+        ids = frozenset(ids)
+        if not ids:
+            return
+        self._store_local(owner_id, ids)
+
+        if self._redis is None:
+            return
+        key = self._key(owner_id)
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.sadd(key, *(str(item_id) for item_id in ids))
+                pipe.expire(key, self._redis_ttl)
+                await pipe.execute()
+        except RedisError:
+            logger.warning("chat.id_set_cache.redis_unavailable", extra={"prefix": self._key_prefix})
+
+
+    async def invalidate(self, owner_id: uuid.UUID) -> None:
+        self._entries.pop(owner_id, None)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(self._key(owner_id))
+        except RedisError:
+            logger.warning("chat.id_set_cache.redis_unavailable", extra={"prefix": self._key_prefix})
+
+
+    def drop_local(self, owner_ids: Iterable[uuid.UUID] | None = None) -> None:
+        """Forget in-process entries (all of them when `owner_ids` is None),
+        e.g. after another worker changed and invalidated the sets."""
+        if owner_ids is None:
+            self._entries.clear()
+            return
+        for owner_id in owner_ids:
+            self._entries.pop(owner_id, None)
+
+
+    async def invalidate_many(self, owner_ids: Iterable[uuid.UUID]) -> None:
+        """One Redis round trip, e.g. for every member of a group."""
+        keys = []
+        for owner_id in set(owner_ids):
+            self._entries.pop(owner_id, None)
+            keys.append(self._key(owner_id))
+        if not keys or self._redis is None:
+            return
+        try:
+            await self._redis.delete(*keys)
+        except RedisError:
+            logger.warning("chat.id_set_cache.redis_unavailable", extra={"prefix": self._key_prefix})
+
+
+# conversation id -> participant ids
+membership_cache = IdSetCache(
+    "chat:members:",
+    max_entries=settings.CHAT_MEMBERSHIP_CACHE_SIZE,
+    ttl_seconds=settings.CHAT_MEMBERSHIP_CACHE_TTL_SECONDS,
+    redis_ttl_seconds=settings.CHAT_MEMBERSHIP_CACHE_REDIS_TTL_SECONDS,
+)
+
+# user id -> everyone the user shares a conversation with
+contact_cache = IdSetCache(
+    "chat:contacts:",
+    max_entries=settings.CHAT_CONTACT_CACHE_SIZE,
+    ttl_seconds=settings.CHAT_CONTACT_CACHE_TTL_SECONDS,
+    redis_ttl_seconds=settings.CHAT_MEMBERSHIP_CACHE_REDIS_TTL_SECONDS,
+)
+
+# user id -> conversations the user belongs to (fan-out topics of a socket)
+conversation_cache = IdSetCache(
+    "chat:conversations:",
+    max_entries=settings.CHAT_CONTACT_CACHE_SIZE,
+    ttl_seconds=settings.CHAT_CONTACT_CACHE_TTL_SECONDS,
+    redis_ttl_seconds=settings.CHAT_MEMBERSHIP_CACHE_REDIS_TTL_SECONDS,
+)
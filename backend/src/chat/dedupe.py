@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import logging
+import uuid
+from typing import Any
+
+from redis.exceptions import RedisError
+
+from src.chat.models import ChatMessage
+from src.chat.write_behind import decode_message_row, encode_message_row
+from src.core.config import settings
+
+logger = logging.getLogger("chat")
+
+_ROW_FIELDS = (
+    "id",
+    "conversation_id",
+    "sender_id",
+    "seq",
+    "content",
+    "attachment_name",
+    "attachment_key",
+    "attachment_content_type",
+    "attachment_size",
+    "create_at",
+    "updated_at",
+)
+
+
+class MessageInFlight:
+    """Another request with the same key is still being written."""
+
+
+IN_FLIGHT = MessageInFlight()
+
+
+class MessageKeyCache:
+    """Short-lived Redis record of `(sender_id, client_message_id)` -> message.
+
+    A retry that finds its key here is answered without touching Postgres.
+    The first request claims the key with `SET NX` before writing, so a
+    retry racing the original sees it as in flight instead of inserting
+    again. Postgres (`chat_message_keys`) stays the durable backstop.
+    """
+
+    KEY_PREFIX = "chat:msgkey:"
+    _PENDING = "pending"
+
+    def __init__(self, ttl_seconds: int, pending_ttl_seconds: int) -> None:
+        self._ttl = ttl_seconds
+        self._pending_ttl = pending_ttl_seconds
+        self._redis: Any | None = None
+
+
+    def attach_redis(self, redis_client: Any) -> None:
+        self._redis = redis_client
+
+
+    def _key(self, sender_id: uuid.UUID, client_message_id: str) -> str:
+        return f"{self.KEY_PREFIX}{sender_id}:{client_message_id}"
+
+
+    async def claim(self,
+                    sender_id: uuid.UUID,
+                    client_message_id: str
+                    ) -> ChatMessage | MessageInFlight | None:
+        """None when the caller now owns the key (or Redis is unavailable)."""
+        if self._redis is None:
+            return None
+        key = self._key(sender_id, client_message_id)
+        try:
+            if await self._redis.set(key, self._PENDING, nx=True, ex=self._pending_ttl):
+                return None
+            raw = await self._redis.get(key)
+        except RedisError:
+            logger.warning("chat.message_keys.redis_unavailable")
+            return None
+        if raw is None:
+            return None
+        if raw == self._PENDING:
+            return IN_FLIGHT
+        return ChatMessage(**decode_message_row(raw))
+
+
+    async def remember(self, client_message_id: str, message: ChatMessage) -> None:
+        if self._redis is None:
+            return
+        row = {field: getattr(message, field) for field in _ROW_FIELDS}
+        try:
+            await self._redis.set(
+                self._key(message.sender_id, client_message_id),
+                encode_message_row(row),
+                ex=self._ttl,
+            )
+        except RedisError:
+            logger.warning("chat.message_keys.redis_unavailable")
+
+
+    async def release(self, sender_id: uuid.UUID, client_message_id: str) -> None:
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(self._key(sender_id, client_message_id))
+        except RedisError:
+            logger.warning("chat.message_keys.redis_unavailable")
+
+
+message_key_cache = MessageKeyCache(
+    ttl_seconds=settings.CHAT_MESSAGE_KEY_CACHE_TTL_SECONDS,
+    pending_ttl_seconds=30,
+)
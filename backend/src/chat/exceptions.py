@@ -66,9 +66,90 @@ class RateLimitExceeded(HTTPException):
         )
 
 
-class AttachmentUploadFailed(HTTPException):
+class AttachmentNotUploaded(HTTPException):
     def __init__(self) -> None:
         super().__init__(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to upload attachment. Please try again."
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Attachment has not been uploaded."
+        )
+
+
+class InvalidAttachmentKey(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Attachment does not belong to this conversation."
+        )
+
+
+class InvalidCursor(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pagination cursor is invalid."
+        )
+
+
+class MessageSendInProgress(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A message with this client_message_id is still being sent."
+        )
+
+
+class MessageBacklogFull(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Messages cannot be saved right now. Please retry shortly.",
+            headers={"Retry-After": "5"},
+        )
+
+
+class GroupAdminRequired(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only group admins can manage members."
+        )
+
+
+class NotAGroupConversation(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This conversation is not a group."
+        )
+
+
+class GroupMemberLimitExceeded(HTTPException):
+    def __init__(self, limit: int) -> None:
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A group can have at most {limit} members."
+        )
+
+
+class ModerationAdminRequired(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can manage moderation rules."
+        )
+
+
+class InvalidModerationRule(HTTPException):
+    def __init__(self, reason: str) -> None:
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid moderation rule: {reason}"
+        )
+
+
+class ModerationRuleNotFound(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Moderation rule not found."
         )
@@ -1,58 +1,304 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import logging
+import time
 import uuid
 from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Iterable
 
 from fastapi import WebSocket
 
+from src.chat.metrics import fanout_sockets, open_sockets, send_failures, send_queue_depth
+from src.chat.protocol import EncodedEvent, Frame
 from src.core.base_model import time_now
+from src.core.config import settings
+
+logger = logging.getLogger("chat")
+
+# Close codes sent to sockets the server drops on its own.
+CLOSE_IDLE_TIMEOUT = 4408
+CLOSE_USER_LIMIT = 4429
+CLOSE_WORKER_LIMIT = 1013
+
+
+@dataclass
+class _SocketState:
+    user_id: uuid.UUID
+    connected_at: float
+    last_activity: float
+    subprotocol: str | None = None
 
 
 class ConnectionManager:
-    def __init__(self) -> None:
+    """Per-worker registry of chat sockets.
+
+    A heartbeat loop pings sockets that have been quiet for one interval and
+    reaps those silent for longer than `idle_timeout`, so half-open clients
+    stop receiving fan-out and stop counting as online. Sockets are capped
+    per user and per worker; the oldest socket is evicted to make room.
+
+    Each socket speaks the subprotocol negotiated at accept time; outgoing
+    events are encoded once per subprotocol and the frames shared by every
+    recipient.
+
+    Connected users are also subscribed to a topic per conversation they
+    belong to, so conversation events are published once per topic and only
+    touch members connected to this worker, however large the group.
+    """
+
+    def __init__(self,
+                 *,
+                 heartbeat_interval: float,
+                 idle_timeout: float,
+                 max_per_user: int,
+                 max_per_worker: int
+                 ) -> None:
 
         self._connections: dict[uuid.UUID, set[WebSocket]] = defaultdict(set)
+        self._sockets: dict[WebSocket, _SocketState] = {}
         self._last_seen: dict[uuid.UUID, datetime] = {}
+        # conversation id -> subscribed users, and the reverse index
+        self._topics: dict[uuid.UUID, set[uuid.UUID]] = defaultdict(set)
+        self._user_topics: dict[uuid.UUID, set[uuid.UUID]] = defaultdict(set)
         self._lock = asyncio.Lock()
+        self._heartbeat_interval = heartbeat_interval
+        self._idle_timeout = idle_timeout
+        self._max_per_user = max_per_user
+        self._max_per_worker = max_per_worker
+        self._heartbeat_task: asyncio.Task[None] | None = None
+
+
+    @property
+    def idle_timeout(self) -> float:
+        return self._idle_timeout
 
 
-    async def connect(self, user_id: uuid.UUID, websocket: WebSocket) -> None:
+    async def connect(self,
+                      user_id: uuid.UUID,
+                      websocket: WebSocket,
+                      subprotocol: str | None = None
+                      ) -> None:
+        now = time.monotonic()
         async with self._lock:
+            evicted: list[tuple[uuid.UUID, WebSocket, int]] = []
+            user_sockets = self._connections.get(user_id, set())
+            if len(user_sockets) >= self._max_per_user:
+                oldest = min(user_sockets, key=lambda ws: self._sockets[ws].connected_at)
+                evicted.append((user_id, oldest, CLOSE_USER_LIMIT))
+                self._remove(oldest)
+            if len(self._sockets) >= self._max_per_worker:
+                oldest = min(self._sockets, key=lambda ws: self._sockets[ws].connected_at)
+                evicted.append((self._sockets[oldest].user_id, oldest, CLOSE_WORKER_LIMIT))
+                self._remove(oldest)
+
             self._connections[user_id].add(websocket)
+            self._sockets[websocket] = _SocketState(
+                user_id=user_id,
+                connected_at=now,
+                last_activity=now,
+                subprotocol=subprotocol,
+            )
             self._last_seen[user_id] = time_now()
+            open_sockets.set(len(self._sockets))
+
+        for evicted_user_id, socket, code in evicted:
+            logger.info("chat.ws.evicted", extra={"user_id": str(evicted_user_id), "close_code": code})
+            await self._close(socket, code)
 
 
-    async def disconnect(self, user_id: uuid.UUID, websocket: WebSocket) -> None:
+    async def disconnect(self, user_id: uuid.UUID, websocket: WebSocket) -> bool:
+        """Forget a socket; returns True when the user has no sockets left."""
         async with self._lock:
-            connections = self._connections.get(user_id)
+            if websocket in self._sockets:
+                self._remove(websocket)
+            return user_id not in self._connections
+
 
-            if not connections:
+    def _remove(self, websocket: WebSocket) -> None:
+        state = self._sockets.pop(websocket)
+        open_sockets.set(len(self._sockets))
+        connections = self._connections.get(state.user_id)
+        if connections is None:
+            return
+        connections.discard(websocket)
+        if not connections:
+            self._connections.pop(state.user_id, None)
+            self._last_seen[state.user_id] = time_now()
+            self._drop_topics(state.user_id, self._user_topics.pop(state.user_id, ()))
+
+
+    def _drop_topics(self, user_id: uuid.UUID, conversation_ids: Iterable[uuid.UUID]) -> None:
+        for conversation_id in conversation_ids:
+            subscribers = self._topics.get(conversation_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(user_id)
+            if not subscribers:
+                del self._topics[conversation_id]
+
+
+    async def subscribe(self, user_id: uuid.UUID, conversation_ids: Iterable[uuid.UUID]) -> None:
+        """Route a connected user's conversation events to their sockets."""
+        async with self._lock:
+            if user_id not in self._connections:
+                return
+            for conversation_id in conversation_ids:
+                self._topics[conversation_id].add(user_id)
+                self._user_topics[user_id].add(conversation_id)
+
+
+    async def unsubscribe(self, user_id: uuid.UUID, conversation_ids: Iterable[uuid.UUID]) -> None:
+        async with self._lock:
+            conversation_ids = set(conversation_ids)
+            topics = self._user_topics.get(user_id)
+            if topics is None:
                 return
-            connections.discard(websocket)
+            topics.difference_update(conversation_ids)
+            if not topics:
+                del self._user_topics[user_id]
+            self._drop_topics(user_id, conversation_ids)
+
+
+    def is_subscribed(self, user_id: uuid.UUID, conversation_id: uuid.UUID) -> bool:
+        """Whether a connected user receives this conversation's events."""
+        return conversation_id in self._user_topics.get(user_id, ())
+
 
-            if not connections:
-                self._connections.pop(user_id, None)
-                self._last_seen[user_id] = time_now()
+    def touch(self, websocket: WebSocket) -> None:
+        """Record inbound traffic; any frame counts as a heartbeat reply."""
+        state = self._sockets.get(websocket)
+        if state is not None:
+            state.last_activity = time.monotonic()
+
+
+    async def _close(self, websocket: WebSocket, code: int) -> None:
+        try:
+            await websocket.close(code=code)
+        except RuntimeError:
+            # Already closed by the client or the ASGI server.
+            pass
+
+
+    async def _send_frame(self, user_id: uuid.UUID, websocket: WebSocket, frame: Frame) -> None:
+        try:
+            if isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+        except RuntimeError:
+            send_failures.inc()
+            await self.disconnect(user_id, websocket)
 
 
     async def send_json(self, user_id: uuid.UUID, payload: dict) -> None:
-        message = json.dumps(payload, default=str)
+        await self.broadcast((user_id,), payload)
+
+
+    async def send_to_socket(self, websocket: WebSocket, payload: dict) -> None:
+        """Reply on one socket using its negotiated subprotocol."""
+        state = self._sockets.get(websocket)
+        if state is None:
+            return
+        frame = EncodedEvent(payload).frame(state.subprotocol)
+        await self._send_frame(state.user_id, websocket, frame)
+
+
+    async def _send_event(self,
+                          targets: list[tuple[uuid.UUID, WebSocket, str | None]],
+                          payload: dict
+                          ) -> None:
+        if not targets:
+            return
+        fanout_sockets.labels(payload.get("type", "unknown")).observe(len(targets))
+        event = EncodedEvent(payload)
+        pending = len(targets)
+        send_queue_depth.inc(pending)
+        try:
+            for user_id, websocket, subprotocol in targets:
+                await self._send_frame(user_id, websocket, event.frame(subprotocol))
+                pending -= 1
+                send_queue_depth.dec()
+        finally:
+            if pending:
+                send_queue_depth.dec(pending)
+
+
+    async def broadcast(self, user_ids: Iterable[uuid.UUID], payload: dict) -> None:
+        async with self._lock:
+            targets = [
+                (user_id, websocket, self._sockets[websocket].subprotocol)
+                for user_id in set(user_ids)
+                for websocket in self._connections.get(user_id, ())
+            ]
+        await self._send_event(targets, payload)
+
+
+    async def publish(self,
+                      conversation_id: uuid.UUID,
+                      payload: dict,
+                      *,
+                      exclude: uuid.UUID | None = None
+                      ) -> None:
+        """Send an event to every subscriber of a conversation's topic."""
         async with self._lock:
-            connections = list(self._connections.get(user_id, set()))
-        for connection in connections:
+            targets = [
+                (user_id, websocket, self._sockets[websocket].subprotocol)
+                for user_id in self._topics.get(conversation_id, ())
+                if user_id != exclude
+                for websocket in self._connections.get(user_id, ())
+            ]
+        await self._send_event(targets, payload)
+
+
+    def start_heartbeat(self) -> None:
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+
+    async def stop_heartbeat(self) -> None:
+        if self._heartbeat_task is None:
+            return
+        self._heartbeat_task.cancel()
+        await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+        self._heartbeat_task = None
+
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._heartbeat_interval)
             try:
-                await connection.send_text(message)
-            except RuntimeError:
-                await self.disconnect(user_id, connection)
+                await self.heartbeat()
+            except Exception:
+                logger.exception("chat.ws.heartbeat_failed")
 
 
-    async def broadcast(self, user_ids: Iterable[uuid.UUID], payload: dict) -> None:
-        for user_id in user_ids:
-            await self.send_json(user_id, payload)
+    async def heartbeat(self) -> int:
+        """Ping quiet sockets and reap idle ones; returns the number reaped."""
+        now = time.monotonic()
+        async with self._lock:
+            idle: list[WebSocket] = []
+            quiet: list[tuple[_SocketState, WebSocket]] = []
+            for websocket, state in self._sockets.items():
+                silent_for = now - state.last_activity
+                if silent_for >= self._idle_timeout:
+                    idle.append(websocket)
+                elif silent_for >= self._heartbeat_interval:
+                    quiet.append((state, websocket))
+            for websocket in idle:
+                self._remove(websocket)
+
+        for websocket in idle:
+            await self._close(websocket, CLOSE_IDLE_TIMEOUT)
+        if idle:
+            logger.info("chat.ws.reaped", extra={"socket_count": len(idle)})
+
+        ping = EncodedEvent({"type": "ping"})
+        for state, websocket in quiet:
+            await self._send_frame(state.user_id, websocket, ping.frame(state.subprotocol))
+        return len(idle)
 
 
     async def snapshot_connections(self) -> dict[uuid.UUID, set[WebSocket]]:
@@ -77,4 +323,9 @@ class ConnectionManager:
             return self._last_seen.get(user_id)
 
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(
+    heartbeat_interval=settings.CHAT_WS_HEARTBEAT_INTERVAL_SECONDS,
+    idle_timeout=settings.CHAT_WS_IDLE_TIMEOUT_SECONDS,
+    max_per_user=settings.CHAT_WS_MAX_CONNECTIONS_PER_USER,
+    max_per_worker=settings.CHAT_WS_MAX_CONNECTIONS_PER_WORKER,
+)
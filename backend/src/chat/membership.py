@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Iterable
+
+from redis.exceptions import RedisError
+
+from src.chat.cache import contact_cache, conversation_cache, membership_cache
+from src.chat.manager import manager
+from src.chat.typing import typing_throttle
+
+logger = logging.getLogger("chat")
+
+
+class MembershipBroadcast:
+    """Applies conversation membership changes on every worker.
+
+    The worker that changed the membership invalidates the caches (Redis
+    included) and updates its own sockets' topics, then publishes the change
+    on a Redis channel. Every other worker drops its in-process cache entries
+    and subscribes or unsubscribes the affected users' local sockets, so a
+    removed member stops receiving the group's events everywhere.
+    """
+
+    CHANNEL = "chat:membership"
+
+    def __init__(self, *, retry_interval: float) -> None:
+        self._retry_interval = retry_interval
+        self._worker_id = uuid.uuid4().hex
+        self._redis: Any | None = None
+        self._listen_task: asyncio.Task[None] | None = None
+
+
+    def attach_redis(self, redis_client: Any) -> None:
+        self._redis = redis_client
+
+
+    async def changed(self,
+                      conversation_id: uuid.UUID,
+                      member_ids: Iterable[uuid.UUID],
+                      *,
+                      added_ids: Iterable[uuid.UUID] = (),
+                      removed_ids: Iterable[uuid.UUID] = ()
+                      ) -> None:
+        """Apply a committed change here and announce it to the other workers.
+
+        `member_ids` is everyone whose contacts may have changed.
+        """
+        member_ids, added_ids, removed_ids = set(member_ids), set(added_ids), set(removed_ids)
+        await membership_cache.invalidate(conversation_id)
+        await contact_cache.invalidate_many(member_ids | added_ids | removed_ids)
+        await conversation_cache.invalidate_many(added_ids | removed_ids)
+        for user_id in added_ids:
+            await manager.subscribe(user_id, (conversation_id,))
+        for user_id in removed_ids:
+            await self._unsubscribe(user_id, conversation_id)
+
+        if self._redis is None:
+            return
+        event = {
+            "worker_id": self._worker_id,
+            "conversation_id": str(conversation_id),
+            "member_ids": [str(user_id) for user_id in member_ids],
+            "added_ids": [str(user_id) for user_id in added_ids],
+            "removed_ids": [str(user_id) for user_id in removed_ids],
+        }
+        try:
+            await self._redis.publish(self.CHANNEL, json.dumps(event))
+        except RedisError:
+            # Other workers catch up when their cache TTL lapses.
+            logger.warning("chat.membership.redis_unavailable")
+
+
+    async def _unsubscribe(self, user_id: uuid.UUID, conversation_id: uuid.UUID) -> None:
+        await manager.unsubscribe(user_id, (conversation_id,))
+        await typing_throttle.clear(user_id, conversation_id)
+
+
+    async def _apply_remote(self, raw: str | bytes) -> None:
+        event = json.loads(raw)
+        if event["worker_id"] == self._worker_id:
+            return
+        conversation_id = uuid.UUID(event["conversation_id"])
+        added_ids = [uuid.UUID(user_id) for user_id in event["added_ids"]]
+        removed_ids = [uuid.UUID(user_id) for user_id in event["removed_ids"]]
+        member_ids = [uuid.UUID(user_id) for user_id in event["member_ids"]]
+
+        # The Redis entries were already deleted by the publishing worker.
+        membership_cache.drop_local((conversation_id,))
+        contact_cache.drop_local([*member_ids, *added_ids, *removed_ids])
+        conversation_cache.drop_local([*added_ids, *removed_ids])
+        for user_id in added_ids:
+            await manager.subscribe(user_id, (conversation_id,))
+        for user_id in removed_ids:
+            await self._unsubscribe(user_id, conversation_id)
+
+
+    def start(self) -> None:
+        if self._listen_task is None and self._redis is not None:
+            self._listen_task = asyncio.create_task(self._listen_loop())
+
+
+    async def stop(self) -> None:
+        if self._listen_task is None:
+            return
+        self._listen_task.cancel()
+        await asyncio.gather(self._listen_task, return_exceptions=True)
+        self._listen_task = None
+
+
+    async def _listen_loop(self) -> None:
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                # Changes published while we were not listening are lost.
+                membership_cache.drop_local()
+                contact_cache.drop_local()
+                conversation_cache.drop_local()
+                async for message in pubsub.listen():
+                    try:
+                        await self._apply_remote(message["data"])
+                    except (KeyError, TypeError, ValueError):
+                        logger.warning("chat.membership.event_malformed")
+            except RedisError:
+                logger.warning("chat.membership.redis_unavailable")
+            except Exception:
+                logger.exception("chat.membership.listen_failed")
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(self._retry_interval)
+
+
+membership_broadcast = MembershipBroadcast(retry_interval=1.0)
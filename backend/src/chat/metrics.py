@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from src.core.metrics import time_queries
+
+# Inbound event types get their own label; anything else is "unknown".
+INBOUND_EVENT_TYPES = frozenset({"message", "typing", "ack", "ping", "pong"})
+
+open_sockets = Gauge(
+    "chat_ws_open_sockets",
+    "Chat WebSocket connections open on this worker.",
+)
+events_received = Counter(
+    "chat_ws_events_received",
+    "Inbound chat WebSocket events by type; undecodable frames are 'invalid'.",
+    ("type",),
+)
+event_db_seconds = Histogram(
+    "chat_ws_event_db_seconds",
+    "Time spent in database queries while handling one inbound event.",
+    ("type",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+event_db_queries = Histogram(
+    "chat_ws_event_db_queries",
+    "Database queries issued while handling one inbound event.",
+    ("type",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21),
+)
+fanout_sockets = Histogram(
+    "chat_ws_fanout_sockets",
+    "Sockets on this worker targeted by one outgoing event.",
+    ("type",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+send_queue_depth = Gauge(
+    "chat_ws_send_queue_depth",
+    "Frames of in-progress fan-outs not yet written to their socket.",
+)
+send_failures = Counter(
+    "chat_ws_send_failures",
+    "Frames that could not be written because the socket was gone.",
+)
+message_fanout_seconds = Histogram(
+    "chat_message_fanout_seconds",
+    "Time from receiving a message on the socket to its last recipient send on this worker.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+@contextmanager
+def track_event(event_type: object) -> Iterator[None]:
+    """Count an inbound event and record the database time spent handling it."""
+    label = event_type if isinstance(event_type, str) and event_type in INBOUND_EVENT_TYPES else "unknown"
+    events_received.labels(label).inc()
+    with time_queries() as timer:
+        try:
+            yield
+        finally:
+            event_db_seconds.labels(label).observe(timer.seconds)
+            event_db_queries.labels(label).observe(timer.count)
@@ -3,17 +3,55 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Computed,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    TIMESTAMP,
+    Text,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from src.chat.schemas import ChatParticipantRole, ModerationRuleKind
 from src.user.models import User
-from src.core.base_model import Base
+from src.core.base_model import Base, time_now
+
+# Text search configuration created by migration: `simple` parsing with an
+# `unaccent` pass, so "hợp đồng" and "hop dong" match each other.
+CHAT_SEARCH_CONFIG = "chat_search"
+
+
+def direct_pair_key(user_id: uuid.UUID, other_user_id: uuid.UUID) -> str:
+    """Canonical key of a 1:1 conversation: both user ids, sorted."""
+    first, second = sorted((str(user_id), str(other_user_id)))
+    return f"{first}:{second}"
 
 
 class ChatConversation(Base):
     __tablename__ = "chat_conversations"
+    __table_args__ = (
+        UniqueConstraint(
+            "direct_pair_key",
+            name="uq_chat_conversation_direct_pair",
+        ),
+    )
 
+    # `direct_pair_key(...)` of the two participants; the unique constraint
+    # keeps concurrent "message this user" clicks on one conversation.
+    direct_pair_key: Mapped[str | None] = mapped_column(String(73), nullable=True)
+    # Group conversations have a title, admins and no pair key.
+    is_group: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="false")
+    title: Mapped[str | None] = mapped_column(String(255), nullable=True)
     last_message_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Highest `ChatMessage.seq` handed out in this conversation.
+    last_seq: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
 
     participants: Mapped[list["ChatParticipant"]] = relationship(
         "ChatParticipant",
@@ -25,7 +63,8 @@ class ChatConversation(Base):
         "ChatMessage",
         back_populates="conversation",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
+        lazy="select",
     )
 
 
@@ -49,12 +88,26 @@ class ChatParticipant(Base):
         nullable=False,
         index=True,
     )
+    role: Mapped[str] = mapped_column(
+        String(16),
+        nullable=False,
+        default=ChatParticipantRole.MEMBER.value,
+        server_default=ChatParticipantRole.MEMBER.value,
+    )
+    # Receipt watermarks: every message from another participant with a `seq`
+    # at or below the watermark counts as delivered / read for this participant.
+    # `seq` follows commit order; `create_at` is stamped before the insert
+    # commits, so it cannot be used to decide coverage.
+    last_delivered_seq: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+    last_read_seq: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+    # When the newest acknowledged message was sent; informational only.
+    last_delivered_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     last_read_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     conversation: Mapped[ChatConversation] = relationship(
         "ChatConversation",
         back_populates="participants",
-        lazy="joined",
+        lazy="select",
     )
     user: Mapped["User"] = relationship(
         "User",
@@ -64,65 +117,155 @@ class ChatParticipant(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    # Monthly range partitions, created ahead of time and archived by
+    # `src.chat.archive`. The partition key has to be part of the primary key.
+    __table_args__ = {"postgresql_partition_by": "RANGE (create_at)"}
 
+    create_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        primary_key=True,
+        default=time_now,
+    )
     conversation_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("chat_conversations.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     sender_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("user.id", ondelete="CASCADE"),
         nullable=False,
         index=True,
     )
+    # Gap-free, monotonic position within the conversation (1, 2, 3, ...).
+    seq: Mapped[int] = mapped_column(BigInteger, nullable=False)
     content: Mapped[str | None] = mapped_column(Text, nullable=True)
     attachment_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     attachment_key: Mapped[str | None] = mapped_column(String(512), nullable=True)
     attachment_content_type: Mapped[str | None] = mapped_column(String(100), nullable=True)
     attachment_size: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Filled in by the thumbnail job for images:
+    # {"width", "height", "blurhash", "thumbnails": {"<size>": "<s3 key>"}}
+    attachment_metadata: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"to_tsvector('{CHAT_SEARCH_CONFIG}'::regconfig, coalesce(content, ''))",
+            persisted=True,
+        ),
+        nullable=True,
+        deferred=True,
+    )
 
     conversation: Mapped[ChatConversation] = relationship(
         "ChatConversation",
         back_populates="messages",
-        lazy="joined",
+        lazy="select",
     )
     sender: Mapped["User"] = relationship(
         "User",
         lazy="joined",
     )
-    receipts: Mapped[list["ChatMessageReceipt"]] = relationship(
-        "ChatMessageReceipt",
-        back_populates="message",
-        cascade="all, delete-orphan",
-        lazy="selectin",
-    )
 
 
-class ChatMessageReceipt(Base):
-    __tablename__ = "chat_message_receipts"
+# Keyset pagination index: serves `(create_at, id)` range scans per conversation
+# in both directions and replaces the single-column conversation_id index.
+Index(
+    "chat_messages_conversation_timeline_idx",
+    ChatMessage.conversation_id,
+    ChatMessage.create_at.desc(),
+    ChatMessage.id.desc(),
+)
+
+# Gap-fill lookups (`after_seq`). Not unique: a unique index on a partitioned
+# table must include `create_at`, so uniqueness rests on `allocate_seq`.
+Index(
+    "chat_messages_conversation_seq_idx",
+    ChatMessage.conversation_id,
+    ChatMessage.seq,
+)
+
+Index(
+    "chat_messages_search_idx",
+    ChatMessage.search_vector,
+    postgresql_using="gin",
+)
+
+
+class ChatMessageArchive(Base):
+    """A detached `chat_messages` partition exported to Parquet in S3."""
+
+    __tablename__ = "chat_message_archives"
+
+    range_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, unique=True)
+    range_end: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # Key prefix; one Parquet object per conversation lives below it.
+    object_key: Mapped[str] = mapped_column(String(512), nullable=False)
+    row_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class ChatMessageKey(Base):
+    """Client-generated idempotency key of a sent message.
+
+    Kept outside `chat_messages` because a unique constraint on the
+    partitioned table would have to include `create_at`.
+    """
+
+    __tablename__ = "chat_message_keys"
     __table_args__ = (
         UniqueConstraint(
-            "message_id",
-            "user_id",
-            name="uq_chat_message_receipt",
+            "sender_id",
+            "client_message_id",
+            name="uq_chat_message_key_sender",
         ),
+        # Expired keys are pruned by age.
+        Index("chat_message_keys_create_at_idx", "create_at"),
     )
 
-    message_id: Mapped[uuid.UUID] = mapped_column(
-        ForeignKey("chat_messages.id", ondelete="CASCADE"),
+    sender_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("user.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    client_message_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    message_id: Mapped[uuid.UUID] = mapped_column(nullable=False)
+    # Partition key of the message, so the lookup prunes to one partition.
+    message_created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
+
+
+class ChatParticipantRemoval(Base):
+    """Tombstone of a member who left or was removed from a conversation.
+
+    Participant rows are deleted, so this is what the sync feed reports to
+    the remaining members and to the removed user.
+    """
+
+    __tablename__ = "chat_participant_removals"
+    __table_args__ = (
+        Index("chat_participant_removals_conversation_create_at_idx", "conversation_id", "create_at"),
+        Index("chat_participant_removals_user_create_at_idx", "user_id", "create_at"),
+    )
+
+    conversation_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("chat_conversations.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     user_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("user.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
-    delivered_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
-    read_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
-    message: Mapped[ChatMessage] = relationship(
-        "ChatMessage",
-        back_populates="receipts",
-        lazy="joined",
-    )
\ No newline at end of file
+
+class ChatModerationRule(Base):
+    """Admin-configured blocked term or regex, compiled by `src.chat.moderation`."""
+
+    __tablename__ = "chat_moderation_rules"
+    __table_args__ = (
+        UniqueConstraint(
+            "kind",
+            "pattern",
+            name="uq_chat_moderation_rule_pattern",
+        ),
+    )
+
+    kind: Mapped[str] = mapped_column(String(16), nullable=False, default=ModerationRuleKind.TERM.value)
+    pattern: Mapped[str] = mapped_column(String(512), nullable=False)
+    reason: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True, server_default="true")
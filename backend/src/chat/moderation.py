@@ -1,12 +1,301 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import re
-from typing import Iterable
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Iterable, Sequence
 
+import re2
 from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+from sqlalchemy import select
 
-BANNED_PATTERNS: tuple[re.Pattern[str], ...] = (
-    re.compile(r"https?://[^\s]+", re.IGNORECASE),
+from src.chat.models import ChatModerationRule
+from src.chat.schemas import ModerationRuleKind
+from src.core.config import settings
+from src.core.database import SessionLocal
+
+logger = logging.getLogger("chat")
+
+DEFAULT_REASON = "Message contains blocked content."
+
+
+# Rule errors surface as `re.error`; RE2 would also print them to stderr.
+_RE2_OPTIONS = re2.Options()
+_RE2_OPTIONS.log_errors = False
+
+
+@dataclass(frozen=True)
+class ModerationRule:
+    kind: ModerationRuleKind
+    pattern: str
+    reason: str | None = None
+
+
+# Always active, whatever is configured in the database.
+BUILTIN_RULES: tuple[ModerationRule, ...] = (
+    ModerationRule(
+        ModerationRuleKind.REGEX,
+        r"https?://[^\s]+",
+        "Links are not allowed in chat messages at this time.",
+    ),
+)
+
+
+def normalize_text(text: str) -> str:
+    """Casefold and strip diacritics, so "Hợp Đồng" and "hop dong" compare equal."""
+    decomposed = unicodedata.normalize("NFD", text.casefold())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    # `đ` is a separate letter, not `d` plus a combining mark.
+    return stripped.replace("đ", "d")
+
+
+def normalize_pattern(pattern: str) -> str:
+    """Strip diacritics from a regex rule so it matches normalized content.
+
+    Unlike `normalize_text` this keeps case: `\\S` and `\\s` differ, and rules
+    are matched case-insensitively anyway.
+    """
+    decomposed = unicodedata.normalize("NFD", pattern)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return stripped.replace("đ", "d").replace("Đ", "D")
+
+
+class TermAutomaton:
+    """Aho-Corasick automaton over normalized terms.
+
+    One pass over the text finds every term, however many are loaded. Terms
+    only match on word boundaries, so "ass" does not block "class".
+    """
+
+    __slots__ = ("_goto", "_fail", "_outputs", "_lengths")
+
+    def __init__(self, terms: Sequence[str]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._outputs: list[tuple[int, ...]] = [()]
+        self._lengths = [len(term) for term in terms]
+        for index, term in enumerate(terms):
+            node = 0
+            for char in term:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._outputs.append(())
+                node = next_node
+            self._outputs[node] += (index,)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._outputs[child] += self._outputs[self._fail[child]]
+                queue.append(child)
+
+
+    def search(self, text: str) -> int | None:
+        """Index of the first term found in `text` (already normalized)."""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in outputs[node]:
+                start = position - self._lengths[index] + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (
+                    position + 1 == len(text) or not text[position + 1].isalnum()
+                ):
+                    return index
+        return None
+
+
+class CompiledRules:
+    """Immutable snapshot of the rule set; swapped whole on reload."""
+
+    def __init__(self, rules: Iterable[ModerationRule]) -> None:
+        self.terms: list[ModerationRule] = []
+        self.regexes: list[ModerationRule] = []
+        for rule in rules:
+            if rule.kind is ModerationRuleKind.TERM:
+                if normalize_text(rule.pattern).strip():
+                    self.terms.append(rule)
+            else:
+                self.regexes.append(rule)
+
+        self._automaton = TermAutomaton([normalize_text(rule.pattern).strip() for rule in self.terms])
+        self._pattern = compile_alternation(normalize_pattern(rule.pattern) for rule in self.regexes)
+
+
+    def check(self, content: str) -> ModerationRule | None:
+        normalized = normalize_text(content)
+        index = self._automaton.search(normalized)
+        if index is not None:
+            return self.terms[index]
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(normalized)
+        if match is None:
+            return None
+        # The outermost group closes last, so this is the rule's own group.
+        return self.regexes[int(match.lastgroup[1:])]
+
+
+def _compile(pattern: str) -> Any:
+    try:
+        return re2.compile(pattern, _RE2_OPTIONS)
+    except re2.error as exc:
+        reason = exc.args[0] if exc.args else ""
+        if isinstance(reason, bytes):
+            reason = reason.decode(errors="replace")
+        raise re.error(reason) from exc
+
+
+def validate_regex_rule(pattern: str) -> None:
+    """Raise `re.error` unless `pattern` can join the combined alternation.
+
+    RE2 scans in linear time and rejects backtracking-only syntax such as
+    backreferences and lookarounds; named groups would clash with the
+    per-rule groups of `compile_alternation`.
+    """
+    compiled = _compile(f"(?i){normalize_pattern(pattern)}")
+    if compiled.groupindex:
+        raise re.error("named groups are not allowed")
+
+
+def compile_alternation(patterns: Iterable[str]) -> Any | None:
+    """One case-insensitive alternation of every regex rule, one named
+    group per rule. Raises `re.error` if any rule is invalid."""
+    alternatives = "|".join(f"(?P<r{index}>{pattern})" for index, pattern in enumerate(patterns))
+    if not alternatives:
+        return None
+    return _compile(f"(?i){alternatives}")
+
+
+class ModerationEngine:
+    """Checks chat content against the built-in and admin-configured rules.
+
+    Rules live in `chat_moderation_rules`. Writers bump a version counter in
+    Redis; every worker polls it and recompiles from Postgres when it moves,
+    so rule changes apply without a restart.
+    """
+
+    VERSION_KEY = "chat:moderation:version"
+
+    def __init__(self, *, reload_interval: float) -> None:
+        self._reload_interval = reload_interval
+        self._rules = CompiledRules(BUILTIN_RULES)
+        self._version: str | None = None
+        self._loaded = False
+        self._redis: Any | None = None
+        self._poll_task: asyncio.Task[None] | None = None
+
+
+    def attach_redis(self, redis_client: Any) -> None:
+        self._redis = redis_client
+
+
+    def check(self, content: str) -> ModerationRule | None:
+        return self._rules.check(content)
+
+
+    async def reload(self) -> None:
+        """Recompile from Postgres; on failure the previous rules stay active."""
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(ChatModerationRule).where(ChatModerationRule.is_active.is_(True))
+            )
+            rows = result.scalars().all()
+
+        rules = [*BUILTIN_RULES]
+        for row in rows:
+            rule = ModerationRule(ModerationRuleKind(row.kind), row.pattern, row.reason)
+            if rule.kind is ModerationRuleKind.REGEX:
+                try:
+                    validate_regex_rule(rule.pattern)
+                except re.error:
+                    logger.warning("chat.moderation.invalid_rule", extra={"rule_id": str(row.id)})
+                    continue
+            rules.append(rule)
+        try:
+            compiled = CompiledRules(rules)
+        except re.error:
+            logger.exception("chat.moderation.compile_failed")
+            return
+        self._rules = compiled
+        self._loaded = True
+        logger.info(
+            "chat.moderation.reloaded",
+            extra={"term_count": len(self._rules.terms), "regex_count": len(self._rules.regexes)},
+        )
+
+
+    async def _read_version(self) -> str | None:
+        if self._redis is None:
+            return None
+        try:
+            return await self._redis.get(self.VERSION_KEY)
+        except RedisError:
+            logger.warning("chat.moderation.redis_unavailable")
+            return self._version
+
+
+    async def publish_change(self) -> None:
+        """Reload here and tell the other workers to do the same."""
+        if self._redis is not None:
+            try:
+                self._version = str(await self._redis.incr(self.VERSION_KEY))
+            except RedisError:
+                logger.warning("chat.moderation.redis_unavailable")
+        await self.reload()
+
+
+    async def load(self) -> None:
+        """Initial load; failures keep the built-in rules and are retried by
+        the poll loop rather than failing startup."""
+        self._version = await self._read_version()
+        try:
+            await self.reload()
+        except Exception:
+            logger.exception("chat.moderation.reload_failed")
+
+
+    def start(self) -> None:
+        if self._poll_task is None:
+            self._poll_task = asyncio.create_task(self._poll_loop())
+
+
+    async def stop(self) -> None:
+        if self._poll_task is None:
+            return
+        self._poll_task.cancel()
+        await asyncio.gather(self._poll_task, return_exceptions=True)
+        self._poll_task = None
+
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._reload_interval)
+            try:
+                version = await self._read_version()
+                if version != self._version or not self._loaded:
+                    self._version = version
+                    await self.reload()
+            except Exception:
+                logger.exception("chat.moderation.reload_failed")
+
+
+moderation_engine = ModerationEngine(
+    reload_interval=settings.CHAT_MODERATION_RELOAD_INTERVAL_SECONDS,
 )
 
 
@@ -23,12 +312,12 @@ def validate_message_content(content: str, *, max_length: int = 4000) -> None:
             detail="Message is too long.",
         )
 
-    for pattern in BANNED_PATTERNS:
-        if pattern.search(content):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Links are not allowed in chat messages at this time.",
-            )
+    rule = moderation_engine.check(content)
+    if rule is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=rule.reason or DEFAULT_REASON,
+        )
 
 
 def validate_attachment_content_type(content_type: str | None, allowed: Iterable[str]) -> None:
@@ -42,4 +331,4 @@ def validate_attachment_content_type(content_type: str | None, allowed: Iterable
         raise HTTPException(
             status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             detail="Attachment content type is not permitted.",
-        )
\ No newline at end of file
+        )
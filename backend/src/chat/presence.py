@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable
+
+from redis.exceptions import RedisError
+
+from src.chat.manager import manager
+from src.core.base_model import time_now
+from src.core.config import settings
+
+logger = logging.getLogger("chat")
+
+
+# Drop the online key only if this worker wrote it last; another worker that
+# still holds a socket for the user re-creates it on its next refresh.
+_MARK_OFFLINE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+return 1
+"""
+
+
+@dataclass(frozen=True)
+class PresenceStatus:
+    online: bool
+    last_seen_at: datetime | None = None
+
+
+class PresenceService:
+    """Cluster-wide online status and last-seen timestamps.
+
+    Each worker keeps `presence:{user_id}` alive with a short TTL for every
+    user it holds a socket for, so a crashed worker's users go offline once
+    the TTL lapses. Last-seen times are kept in one Redis hash without expiry.
+    Without Redis, answers come from this worker's `ConnectionManager`.
+    """
+
+    KEY_PREFIX = "presence:"
+    LAST_SEEN_KEY = "presence:last_seen"
+
+    def __init__(self, *, ttl_seconds: int, refresh_interval: float) -> None:
+        self._ttl = ttl_seconds
+        self._refresh_interval = refresh_interval
+        self._worker_id = uuid.uuid4().hex
+        self._redis: Any | None = None
+        self._mark_offline_script: Any | None = None
+        self._refresh_task: asyncio.Task[None] | None = None
+
+
+    def attach_redis(self, redis_client: Any) -> None:
+        self._redis = redis_client
+        self._mark_offline_script = redis_client.register_script(_MARK_OFFLINE_SCRIPT)
+
+
+    def _key(self, user_id: uuid.UUID) -> str:
+        return f"{self.KEY_PREFIX}{user_id}"
+
+
+    async def mark_online(self, user_id: uuid.UUID) -> None:
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(self._key(user_id), self._worker_id, ex=self._ttl)
+        except RedisError:
+            logger.warning("chat.presence.redis_unavailable")
+
+
+    async def mark_offline(self, user_id: uuid.UUID) -> datetime:
+        """Record the user's last socket on this worker closing; returns last seen."""
+        last_seen = await manager.get_last_seen(user_id) or time_now()
+        if self._redis is None:
+            return last_seen
+        try:
+            await self._mark_offline_script(
+                keys=[self._key(user_id), self.LAST_SEEN_KEY],
+                args=[self._worker_id, str(user_id), last_seen.isoformat()],
+            )
+        except RedisError:
+            logger.warning("chat.presence.redis_unavailable")
+        return last_seen
+
+
+    async def refresh(self) -> None:
+        """Extend the online keys of every user connected to this worker."""
+        if self._redis is None:
+            return
+        user_ids = await manager.get_online_user_ids()
+        if not user_ids:
+            return
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.set(self._key(user_id), self._worker_id, ex=self._ttl)
+                await pipe.execute()
+        except RedisError:
+            logger.warning("chat.presence.redis_unavailable")
+
+
+    async def get_online(self, user_ids: Iterable[uuid.UUID]) -> set[uuid.UUID]:
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return set()
+        if self._redis is not None:
+            try:
+                values = await self._redis.mget([self._key(user_id) for user_id in user_ids])
+                return {user_id for user_id, value in zip(user_ids, values) if value is not None}
+            except RedisError:
+                logger.warning("chat.presence.redis_unavailable")
+        return await manager.get_online_user_ids(user_ids)
+
+
+    async def get_statuses(self, user_ids: Iterable[uuid.UUID]) -> dict[uuid.UUID, PresenceStatus]:
+        """Online flag and last seen for many users in one round trip."""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+        if self._redis is not None:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.mget([self._key(user_id) for user_id in user_ids])
+                    pipe.hmget(self.LAST_SEEN_KEY, [str(user_id) for user_id in user_ids])
+                    online_values, last_seen_values = await pipe.execute()
+                return {
+                    user_id: PresenceStatus(
+                        online=online is not None,
+                        last_seen_at=datetime.fromisoformat(last_seen) if last_seen else None,
+                    )
+                    for user_id, online, last_seen in zip(user_ids, online_values, last_seen_values)
+                }
+            except RedisError:
+                logger.warning("chat.presence.redis_unavailable")
+
+        online_ids = await manager.get_online_user_ids(user_ids)
+        return {
+            user_id: PresenceStatus(
+                online=user_id in online_ids,
+                last_seen_at=await manager.get_last_seen(user_id),
+            )
+            for user_id in user_ids
+        }
+
+
+    def start(self) -> None:
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+
+    async def stop(self) -> None:
+        if self._refresh_task is None:
+            return
+        self._refresh_task.cancel()
+        await asyncio.gather(self._refresh_task, return_exceptions=True)
+        self._refresh_task = None
+
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("chat.presence.refresh_failed")
+
+
+presence_service = PresenceService(
+    ttl_seconds=settings.CHAT_PRESENCE_TTL_SECONDS,
+    refresh_interval=settings.CHAT_WS_HEARTBEAT_INTERVAL_SECONDS,
+)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable
+
+import msgpack
+
+MSGPACK_SUBPROTOCOL = "legalconnect.msgpack.v1"
+
+Frame = str | bytes
+
+
+def negotiate_subprotocol(requested: Iterable[str]) -> str | None:
+    """Pick the binary protocol when the client offers it; None means JSON."""
+    if MSGPACK_SUBPROTOCOL in requested:
+        return MSGPACK_SUBPROTOCOL
+    return None
+
+
+def encode_event(payload: dict[str, Any], subprotocol: str | None) -> Frame:
+    if subprotocol == MSGPACK_SUBPROTOCOL:
+        # Same coercion as the JSON frames: UUIDs and datetimes become strings.
+        return msgpack.packb(payload, default=str, use_bin_type=True)
+    return json.dumps(payload, default=str)
+
+
+def decode_frame(message: dict[str, Any]) -> dict[str, Any] | None:
+    """Decode an inbound ASGI `websocket.receive` message; None if malformed."""
+    try:
+        if message.get("bytes") is not None:
+            payload = msgpack.unpackb(message["bytes"], raw=False)
+        else:
+            payload = json.loads(message.get("text") or "")
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+class EncodedEvent:
+    """Encodes a payload at most once per subprotocol for a whole fan-out."""
+
+    __slots__ = ("_payload", "_frames")
+
+    def __init__(self, payload: dict[str, Any]) -> None:
+        self._payload = payload
+        self._frames: dict[str | None, Frame] = {}
+
+
+    def frame(self, subprotocol: str | None) -> Frame:
+        frame = self._frames.get(subprotocol)
+        if frame is None:
+            frame = encode_event(self._payload, subprotocol)
+            self._frames[subprotocol] = frame
+        return frame
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Iterable, Protocol
+
+import httpx
+
+from src.chat.models import ChatMessage
+from src.core.config import settings
+
+logger = logging.getLogger("chat")
+
+PENDING_KEY_PREFIX = "chat:push:pending:"
+PREVIEW_MAX_CHARS = 120
+
+
+class PushProvider(Protocol):
+    name: str
+
+    async def send(self, user_id: uuid.UUID, notifications: list[dict[str, Any]]) -> None:
+        """Deliver collapsed notifications to every device of `user_id`."""
+
+
+class LogPushProvider:
+    """Local stub: logs and keeps what would have been pushed."""
+
+    name = "log"
+
+    def __init__(self) -> None:
+        self.sent: list[tuple[uuid.UUID, list[dict[str, Any]]]] = []
+
+    async def send(self, user_id: uuid.UUID, notifications: list[dict[str, Any]]) -> None:
+        self.sent.append((user_id, notifications))
+        logger.info(
+            "chat.push.stub_sent",
+            extra={"user_id": str(user_id), "notification_count": len(notifications)},
+        )
+
+
+class WebhookPushProvider:
+    """Hands notifications to a push gateway that owns device tokens."""
+
+    name = "webhook"
+
+    def __init__(self, url: str, token: str | None) -> None:
+        self._url = url
+        self._token = token
+
+    async def send(self, user_id: uuid.UUID, notifications: list[dict[str, Any]]) -> None:
+        headers = {"Authorization": f"Bearer {self._token}"} if self._token else {}
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.post(
+                self._url,
+                json={"user_id": str(user_id), "notifications": notifications},
+                headers=headers,
+            )
+            response.raise_for_status()
+
+
+_provider: PushProvider | None = None
+
+
+def get_push_provider() -> PushProvider:
+    global _provider
+    if _provider is None:
+        provider = settings.CHAT_PUSH_PROVIDER.lower()
+        if provider == "log":
+            _provider = LogPushProvider()
+        elif provider == "webhook":
+            if not settings.CHAT_PUSH_WEBHOOK_URL:
+                raise RuntimeError("CHAT_PUSH_WEBHOOK_URL is required for the webhook push provider")
+            _provider = WebhookPushProvider(settings.CHAT_PUSH_WEBHOOK_URL, settings.CHAT_PUSH_WEBHOOK_TOKEN)
+        else:
+            raise RuntimeError(f"Unknown chat push provider: {provider}. Use 'log' or 'webhook'")
+    return _provider
+
+
+def set_push_provider(provider: PushProvider | None) -> None:
+    """Swap the provider, e.g. for a `LogPushProvider` in tests."""
+    global _provider
+    _provider = provider
+
+
+def pending_key(user_id: uuid.UUID | str) -> str:
+    return f"{PENDING_KEY_PREFIX}{user_id}"
+
+
+def build_notification(message: ChatMessage, sender_name: str) -> dict[str, Any]:
+    preview = message.content or message.attachment_name or ""
+    if len(preview) > PREVIEW_MAX_CHARS:
+        preview = preview[: PREVIEW_MAX_CHARS - 1] + "…"
+    return {
+        "conversation_id": str(message.conversation_id),
+        "message_id": str(message.id),
+        "sender_id": str(message.sender_id),
+        "sender_name": sender_name,
+        "preview": preview,
+        "sent_at": message.create_at.isoformat(),
+        "queued_at": time.time(),
+    }
+
+
+async def enqueue_offline_notifications(arq_pool: Any,
+                                        recipient_ids: Iterable[uuid.UUID],
+                                        message: ChatMessage,
+                                        sender_name: str
+                                        ) -> None:
+    """Hand a message's recipients to the worker in a single job, whatever
+    the size of the conversation; the worker skips those online."""
+    recipient_ids = [str(user_id) for user_id in recipient_ids]
+    if not recipient_ids:
+        return
+
+    await arq_pool.enqueue_job(
+        "fan_out_push_notifications",
+        build_notification(message, sender_name),
+        recipient_ids,
+        _job_id=f"chat-push-fanout:{message.id}",
+    )
+
+
+async def buffer_notifications(arq_pool: Any, recipient_ids: list[str], notification: dict[str, Any]) -> None:
+    """Buffer a notification per recipient and schedule one job per user per
+    window; the job collapses whatever accumulated meanwhile."""
+    window = settings.CHAT_PUSH_BATCH_WINDOW_SECONDS
+    bucket = int(time.time() // window)
+    entry = json.dumps(notification)
+    async with arq_pool.pipeline(transaction=False) as pipe:
+        for user_id in recipient_ids:
+            pipe.rpush(pending_key(user_id), entry)
+            pipe.expire(pending_key(user_id), settings.CHAT_PUSH_PENDING_TTL_SECONDS)
+        await pipe.execute()
+
+    defer_by = max((bucket + 1) * window - time.time(), 0)
+    # Same job id within a window: arq ignores the duplicate enqueue.
+    await asyncio.gather(*(
+        arq_pool.enqueue_job(
+            "deliver_push_notifications",
+            user_id,
+            _job_id=f"chat-push:{user_id}:{bucket}",
+            _defer_by=defer_by,
+        )
+        for user_id in recipient_ids
+    ))
+
+
+def collapse_notifications(entries: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """One notification per conversation: the latest message plus a count."""
+    by_conversation: dict[str, dict[str, Any]] = {}
+    seen_messages: set[str] = set()
+    for entry in entries:
+        if entry["message_id"] in seen_messages:
+            continue
+        seen_messages.add(entry["message_id"])
+        current = by_conversation.get(entry["conversation_id"])
+        count = current["message_count"] + 1 if current else 1
+        if current is None or entry["sent_at"] >= current["sent_at"]:
+            current = {key: value for key, value in entry.items() if key != "queued_at"}
+        current["message_count"] = count
+        by_conversation[entry["conversation_id"]] = current
+    return sorted(by_conversation.values(), key=lambda item: item["sent_at"])
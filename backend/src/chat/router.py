@@ -1,59 +1,111 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import html
 import logging
+import math
+import re
+import time
 import uuid
-from datetime import datetime
+from bisect import bisect_left
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import timedelta
+from typing import Any
 
 from fastapi import (
     APIRouter,
     Depends,
-    File,
-    Form,
     HTTPException,
-    UploadFile,
+    Query,
+    Request,
     WebSocket,
     WebSocketDisconnect,
 )
+from redis.exceptions import RedisError
 from sqlalchemy import select
-from sqlalchemy.orm import aliased, selectinload
 
 from src.auth.dependencies import get_current_user
 from src.auth.exceptions import InvalidToken
 from src.auth.services import decode_token
 from src.chat.exceptions import (
+    AttachmentNotUploaded,
     AttachmentTooLarge,
-    AttachmentUploadFailed,
     ConversationAccessForbidden,
+    ConversationNotFound,
+    InvalidAttachmentKey,
+    InvalidCursor,
+    InvalidModerationRule,
+    MessageNotFound,
+    MessageSendInProgress,
+    ModerationAdminRequired,
+    ModerationRuleNotFound,
 )
-from src.chat.manager import manager
+from src.chat.acks import ack_coalescer
+from src.chat.manager import CLOSE_IDLE_TIMEOUT, manager
+from src.chat.membership import membership_broadcast
+from src.chat.metrics import events_received, message_fanout_seconds, track_event
+from src.chat.presence import PresenceStatus, presence_service
+from src.chat.push import enqueue_offline_notifications
+from src.chat.protocol import decode_frame, negotiate_subprotocol
 from src.chat.moderation import (
+    moderation_engine,
+    normalize_text,
     validate_attachment_content_type,
     validate_message_content,
+    validate_regex_rule,
 )
 from src.chat.rate_limit import rate_limiter
-from src.chat.models import ChatConversation, ChatMessage, ChatParticipant
+from src.chat.models import ChatMessage, ChatModerationRule, ChatParticipant
 from src.chat.schemas import (
+    ChatAcknowledgeAccepted,
+    ChatAttachmentComplete,
+    ChatAttachmentIntentCreate,
+    ChatAttachmentIntentResponse,
+    ChatConversationAcknowledge,
     ChatConversationCreate,
+    ChatConversationPage,
     ChatConversationResponse,
+    ChatGroupCreate,
+    ChatGroupMembersAdd,
     ChatMessageAcknowledge,
     ChatMessageCreate,
+    ChatMessagePage,
     ChatMessageResponse,
+    ChatMessageSearchHit,
+    ChatMessageSearchPage,
+    ChatModerationRuleCreate,
+    ChatModerationRuleResponse,
+    ChatParticipantPage,
+    ChatParticipantRemovalResponse,
     ChatParticipantResponse,
+    ChatSyncResponse,
     ChatUserSummary,
     MessageDeliveryStatus,
+    MessagePageDirection,
+    ModerationRuleKind,
+    SyncChangeKind,
 )
-from src.chat.services import ChatService
+from src.chat.services import ChatService, InboxRow
+from src.chat.typing import typing_throttle
+from src.chat.dedupe import IN_FLIGHT, message_key_cache
+from src.chat.write_behind import message_write_behind
 from src.chat.utils import (
+    attachment_key_belongs_to,
     build_chat_attachment_key,
-    generate_attachment_url,
-    upload_attachment_to_s3,
+    decode_cursor,
+    decode_directional_cursor,
+    encode_cursor,
+    generate_attachment_upload,
+    generate_attachment_urls,
+    head_attachment,
 )
 from src.core.base_model import time_now
 from src.core.config import settings
 from src.core.database import SessionDep, SessionLocal
+from src.user.constants import UserRole
+from src.user.exceptions import UserNotFound
 from src.user.models import User
-from src.user.utils import resolve_avatar_url
+from src.user.utils import resolve_avatar_urls
 
 
 chat_route = APIRouter(
@@ -61,6 +113,10 @@ chat_route = APIRouter(
     prefix="/chat",
 )
 
+# Private-use sentinels for ts_headline, swapped for <mark> after escaping.
+_SNIPPET_START = "\ue000"
+_SNIPPET_STOP = "\ue001"
+
 logger = logging.getLogger("chat")
 
 
@@ -68,6 +124,104 @@ def _chat_service(db: SessionDep) -> ChatService:
     return ChatService(db)
 
 
+async def _persist_message(
+    service: ChatService,
+    conversation_id: uuid.UUID,
+    sender_id: uuid.UUID,
+    *,
+    client_message_id: str | None = None,
+    **fields: Any,
+) -> tuple[ChatMessage, bool]:
+    """Returns the message and whether this call created it.
+
+    A repeated `client_message_id` returns the original message instead.
+    """
+    if client_message_id:
+        existing = await message_key_cache.claim(sender_id, client_message_id)
+        if existing is IN_FLIGHT:
+            raise MessageSendInProgress()
+        if existing is not None:
+            await service.db.commit()
+            return existing, False
+
+    try:
+        created = True
+        message_id, sent_at = uuid.uuid4(), time_now()
+        # The Redis claim above is only a fast path: it is gone once its TTL
+        # lapses or Redis is down, so the durable key is claimed here first,
+        # in write-behind mode too.
+        if client_message_id and not await service.claim_message_key(
+            sender_id,
+            client_message_id,
+            message_id=message_id,
+            sent_at=sent_at,
+        ):
+            created = False
+            message = await service.get_message_by_key(sender_id, client_message_id)
+            if message is None:
+                if message_write_behind.enabled:
+                    # The original is still buffered, not yet in Postgres.
+                    raise MessageSendInProgress()
+                raise MessageNotFound()
+        elif message_write_behind.enabled:
+            message = await message_write_behind.submit(
+                conversation_id,
+                sender_id,
+                message_id=message_id,
+                sent_at=sent_at,
+                **fields,
+            )
+        else:
+            message = await service.create_message(
+                conversation_id,
+                sender_id,
+                message_id=message_id,
+                sent_at=sent_at,
+                **fields,
+            )
+        # Also ends any read transaction opened by a membership cache miss.
+        await service.db.commit()
+    except BaseException:
+        if client_message_id:
+            await message_key_cache.release(sender_id, client_message_id)
+        raise
+
+    if client_message_id:
+        await message_key_cache.remember(client_message_id, message)
+    return message, created
+
+
+async def _fan_out_message(
+    arq_pool: Any,
+    participant_ids: frozenset[uuid.UUID],
+    sender: User,
+    message: ChatMessage,
+    response: ChatMessageResponse,
+    received_at: float | None = None,
+) -> None:
+    await manager.publish(
+        message.conversation_id,
+        {
+            "type": "message",
+            "data": response.model_dump(),
+        },
+    )
+    if received_at is not None:
+        # Local sockets only; other workers' sends are not visible here.
+        message_fanout_seconds.observe(time.perf_counter() - received_at)
+
+    # Recipients without a socket on any worker get a push notification; the
+    # worker checks presence so a large group costs one enqueue here.
+    recipient_ids = [pid for pid in participant_ids if pid != sender.id]
+    try:
+        await enqueue_offline_notifications(arq_pool, recipient_ids, message, sender.username)
+    except RedisError:
+        logger.warning(
+            "chat.push.enqueue_failed",
+            extra={"message_id": str(message.id), "recipient_count": len(recipient_ids)},
+        )
+
+
 @chat_route.get("/health")
 async def chat_health() -> dict[str, object]:
     online_users = await manager.get_online_user_ids()
@@ -77,10 +231,11 @@ async def chat_health() -> dict[str, object]:
     }
 
 
-async def _serialize_participant(
+def _build_participant_response(
     participant: ChatParticipant,
+    avatar_url: str | None,
+    presence: PresenceStatus | None = None,
 ) -> ChatParticipantResponse:
-    avatar_url = await resolve_avatar_url(participant.user.avatar_url)
     return ChatParticipantResponse(
         conversation_id=participant.conversation_id,
         user=ChatUserSummary(
@@ -88,26 +243,92 @@ async def _serialize_participant(
             username=participant.user.username,
             email=participant.user.email,
             avatar_url=avatar_url,
+            is_online=presence.online if presence else False,
+            last_seen_at=presence.last_seen_at if presence else None,
         ),
+        role=participant.role,
         joined_at=participant.create_at,
+        last_delivered_seq=participant.last_delivered_seq,
+        last_read_seq=participant.last_read_seq,
+        last_delivered_at=participant.last_delivered_at,
         last_read_at=participant.last_read_at,
     )
 
 
-async def _serialize_message(message: ChatMessage) -> ChatMessageResponse:
-    attachment_url = None
-    if message.attachment_key:
-        attachment_url = await generate_attachment_url(message.attachment_key)
-    delivered_to = [
-        receipt.user_id
-        for receipt in message.receipts
-        if receipt.delivered_at is not None
-    ]
-    read_by = [
-        receipt.user_id
-        for receipt in message.receipts
-        if receipt.read_at is not None
-    ]
+def _watermark_covers(watermark: int, message: ChatMessage) -> bool:
+    return watermark >= message.seq
+
+
+def _delivered_watermark(participant: ChatParticipant) -> int:
+    # Reading a message implies it was delivered.
+    return max(participant.last_delivered_seq, participant.last_read_seq)
+
+
+class _ReceiptIndex:
+    """Receipt state of one conversation for serializing many messages.
+
+    Watermarks are sorted once, so counting a message's receipts costs two
+    bisections instead of a pass over every member of a large group.
+    """
+
+    def __init__(self, participants: Sequence[ChatParticipant]) -> None:
+        self._participants = participants
+        self._by_user = {participant.user_id: participant for participant in participants}
+        self._delivered = sorted(map(_delivered_watermark, participants))
+        self._read = sorted(participant.last_read_seq for participant in participants)
+
+
+    def counts(self, message: ChatMessage) -> tuple[int, int]:
+        delivered = len(self._delivered) - bisect_left(self._delivered, message.seq)
+        read = len(self._read) - bisect_left(self._read, message.seq)
+        # The sender's own watermark is not a receipt.
+        sender = self._by_user.get(message.sender_id)
+        if sender is not None:
+            delivered -= _watermark_covers(_delivered_watermark(sender), message)
+            read -= _watermark_covers(sender.last_read_seq, message)
+        return delivered, read
+
+
+    def members(self, message: ChatMessage) -> tuple[list[uuid.UUID], list[uuid.UUID]]:
+        """(delivered_to, read_by); only listed for 1:1 conversations."""
+        if len(self._participants) > 2:
+            return [], []
+        recipients = [
+            participant
+            for participant in self._participants
+            if participant.user_id != message.sender_id
+        ]
+        delivered_to = [
+            participant.user_id
+            for participant in recipients
+            if _watermark_covers(_delivered_watermark(participant), message)
+        ]
+        read_by = [
+            participant.user_id
+            for participant in recipients
+            if _watermark_covers(participant.last_read_seq, message)
+        ]
+        return delivered_to, read_by
+
+
+def _thumbnail_keys(message: ChatMessage) -> tuple[str | None, str | None]:
+    """(smallest, largest) thumbnail keys recorded by the thumbnail job."""
+    thumbnails = (message.attachment_metadata or {}).get("thumbnails") or {}
+    if not thumbnails:
+        return None, None
+    sizes = sorted(thumbnails, key=int)
+    return thumbnails[sizes[0]], thumbnails[sizes[-1]]
+
+
+def _build_message_response(
+    message: ChatMessage,
+    attachment_urls: Mapping[str, str | None],
+    receipts: _ReceiptIndex,
+) -> ChatMessageResponse:
+    delivered_count, read_count = receipts.counts(message)
+    delivered_to, read_by = receipts.members(message)
+    metadata = message.attachment_metadata or {}
+    thumbnail_key, preview_key = _thumbnail_keys(message)
     return ChatMessageResponse(
         id=message.id,
         conversation_id=message.conversation_id,
@@ -115,67 +336,106 @@ async def _serialize_message(message: ChatMessage) -> ChatMessageResponse:
         content=message.content,
         created_at=message.create_at,
         attachment_name=message.attachment_name,
-        attachment_url=attachment_url,
+        attachment_url=attachment_urls.get(message.attachment_key),
         attachment_content_type=message.attachment_content_type,
         attachment_size=message.attachment_size,
+        attachment_thumbnail_url=attachment_urls.get(thumbnail_key),
+        attachment_preview_url=attachment_urls.get(preview_key),
+        attachment_width=metadata.get("width"),
+        attachment_height=metadata.get("height"),
+        attachment_blurhash=metadata.get("blurhash"),
+        seq=message.seq,
+        delivered_count=delivered_count,
+        read_count=read_count,
         delivered_to=delivered_to,
         read_by=read_by,
     )
 
 
-async def _serialize_conversation(
-    db: SessionDep,
-    conversation: ChatConversation,
-) -> ChatConversationResponse:
-    participants_result = await db.execute(
-        select(ChatParticipant)
-        .options(selectinload(ChatParticipant.user))
-        .where(ChatParticipant.conversation_id == conversation.id)
-        .order_by(ChatParticipant.create_at.asc())
-    )
-    participants = [
-        await _serialize_participant(participant)
-        for participant in participants_result.scalars().all()
+async def _serialize_messages(
+    messages: Sequence[ChatMessage],
+    participants_by_conversation: Mapping[uuid.UUID, Sequence[ChatParticipant]],
+) -> list[ChatMessageResponse]:
+    attachment_urls = await generate_attachment_urls(
+        key
+        for message in messages
+        if message.attachment_key
+        for key in (message.attachment_key, *_thumbnail_keys(message))
+    )
+    receipts = {
+        conversation_id: _ReceiptIndex(participants_by_conversation.get(conversation_id, ()))
+        for conversation_id in {message.conversation_id for message in messages}
+    }
+    return [
+        _build_message_response(
+            message,
+            attachment_urls,
+            receipts[message.conversation_id],
+        )
+        for message in messages
     ]
 
-    last_message = None
-    if conversation.last_message_at:
-        result = await db.execute(
-            select(ChatMessage)
-            .options(selectinload(ChatMessage.receipts))
-            .where(ChatMessage.conversation_id == conversation.id)
-            .order_by(ChatMessage.create_at.desc())
-            .limit(1)
-        )
-        message = result.scalar_one_or_none()
-        if message:
-            last_message = await _serialize_message(message)
 
-    return ChatConversationResponse(
-        id=conversation.id,
-        created_at=conversation.create_at,
-        updated_at=conversation.updated_at,
-        last_message_at=conversation.last_message_at,
-        participants=participants,
-        last_message=last_message,
-    )
+async def _serialize_message(
+    message: ChatMessage,
+    participants: Sequence[ChatParticipant],
+) -> ChatMessageResponse:
+    serialized = await _serialize_messages([message], {message.conversation_id: participants})
+    return serialized[0]
 
 
-async def _user_contact_ids(db: SessionDep, user_id: uuid.UUID) -> set[uuid.UUID]:
-    conversation_stmt = select(ChatParticipant.conversation_id).where(
-        ChatParticipant.user_id == user_id
+async def _serialize_inbox(rows: Sequence[InboxRow]) -> list[ChatConversationResponse]:
+    avatar_urls = await resolve_avatar_urls(
+        participant.user.avatar_url
+        for conversation, _, _ in rows
+        for participant in conversation.participants
+    )
+    last_messages = await _serialize_messages(
+        [message for _, message, _ in rows if message is not None],
+        {conversation.id: conversation.participants for conversation, _, _ in rows},
+    )
+    # One MGET for every participant on the page.
+    presence = await presence_service.get_statuses(
+        participant.user_id
+        for conversation, _, _ in rows
+        for participant in conversation.participants
     )
-    conversation_result = await db.execute(conversation_stmt)
-    conversation_ids = [row[0] for row in conversation_result.all()]
-    if not conversation_ids:
-        return set()
+    last_message_by_conversation = {
+        message.conversation_id: message for message in last_messages
+    }
+
+    serialized: list[ChatConversationResponse] = []
+    for conversation, _, unread_count in rows:
+        participants = sorted(conversation.participants, key=lambda item: item.create_at)
+        serialized.append(
+            ChatConversationResponse(
+                id=conversation.id,
+                is_group=conversation.is_group,
+                title=conversation.title,
+                created_at=conversation.create_at,
+                updated_at=conversation.updated_at,
+                last_message_at=conversation.last_message_at,
+                participants=[
+                    _build_participant_response(
+                        participant,
+                        avatar_urls.get(participant.user.avatar_url),
+                        presence.get(participant.user_id),
+                    )
+                    for participant in participants
+                ],
+                last_message=last_message_by_conversation.get(conversation.id),
+                unread_count=unread_count,
+            )
+        )
+    return serialized
 
-    contacts_stmt = select(ChatParticipant.user_id).where(
-        ChatParticipant.conversation_id.in_(conversation_ids),
-        ChatParticipant.user_id != user_id,
+
+def _render_snippet(raw: str) -> str:
+    return (
+        html.escape(raw)
+        .replace(_SNIPPET_START, "<mark>")
+        .replace(_SNIPPET_STOP, "</mark>")
     )
-    contacts_result = await db.execute(contacts_stmt)
-    return {row[0] for row in contacts_result.all()}
 
 
 @chat_route.post("/conversations", response_model=ChatConversationResponse, status_code=201)
@@ -194,110 +454,457 @@ async def create_conversation(
     if not recipient:
         raise HTTPException(status_code=404, detail="Recipient not found.")
 
-    participant_a = aliased(ChatParticipant)
-    participant_b = aliased(ChatParticipant)
+    service = _chat_service(db)
+    conversation_id, created = await service.get_or_create_direct_conversation(
+        current_user.id,
+        payload.recipient_id,
+    )
+    await db.commit()
+    if created:
+        member_ids = (current_user.id, payload.recipient_id)
+        await membership_broadcast.changed(conversation_id, member_ids, added_ids=member_ids)
+
+    row = await service.get_inbox_entry(current_user.id, conversation_id)
+    return (await _serialize_inbox([row]))[0]
+
+
+async def _ensure_users_exist(db: SessionDep, user_ids: Iterable[uuid.UUID]) -> None:
+    user_ids = set(user_ids)
+    result = await db.execute(select(User.id).where(User.id.in_(user_ids)))
+    if len(result.all()) != len(user_ids):
+        raise UserNotFound()
 
-    existing_stmt = (
-        select(ChatConversation)
-        .join(participant_a, participant_a.conversation_id == ChatConversation.id)
-        .join(participant_b, participant_b.conversation_id == ChatConversation.id)
-        .where(participant_a.user_id == current_user.id)
-        .where(participant_b.user_id == payload.recipient_id)
+
+async def _serialize_participants(
+    participants: Sequence[ChatParticipant],
+) -> list[ChatParticipantResponse]:
+    avatar_urls = await resolve_avatar_urls(
+        participant.user.avatar_url for participant in participants
+    )
+    presence = await presence_service.get_statuses(
+        participant.user_id for participant in participants
     )
-    existing_result = await db.execute(existing_stmt)
-    conversation = existing_result.scalar_one_or_none()
+    return [
+        _build_participant_response(
+            participant,
+            avatar_urls.get(participant.user.avatar_url),
+            presence.get(participant.user_id),
+        )
+        for participant in participants
+    ]
 
-    if conversation:
-        return await _serialize_conversation(db, conversation)
 
-    conversation = ChatConversation()
-    db.add(conversation)
-    await db.flush()
+def _participant_page(
+    participants: Sequence[ChatParticipant],
+    items: list[ChatParticipantResponse],
+    has_more: bool,
+) -> ChatParticipantPage:
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(participants[-1].create_at, participants[-1].id)
+    return ChatParticipantPage(items=items, next_cursor=next_cursor)
 
-    db.add_all(
-        [
-            ChatParticipant(conversation_id=conversation.id, user_id=current_user.id),
-            ChatParticipant(conversation_id=conversation.id, user_id=payload.recipient_id),
-        ]
+
+@chat_route.post("/groups", response_model=ChatConversationResponse, status_code=201)
+async def create_group(
+    payload: ChatGroupCreate,
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+) -> ChatConversationResponse:
+    member_ids = set(payload.member_ids) - {current_user.id}
+    await _ensure_users_exist(db, member_ids)
+
+    service = _chat_service(db)
+    conversation_id = await service.create_group(
+        current_user.id,
+        payload.title.strip(),
+        member_ids,
     )
+    await db.commit()
+
+    member_ids.add(current_user.id)
+    await membership_broadcast.changed(conversation_id, member_ids, added_ids=member_ids)
 
+    row = await service.get_inbox_entry(current_user.id, conversation_id)
+    return (await _serialize_inbox([row]))[0]
+
+
+@chat_route.get(
+    "/conversations/{conversation_id}/participants",
+    response_model=ChatParticipantPage,
+)
+async def list_participants(
+    conversation_id: uuid.UUID,
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+) -> ChatParticipantPage:
+    service = _chat_service(db)
+    await service.ensure_member(conversation_id, current_user.id)
+    participants, has_more = await service.list_participants(
+        conversation_id,
+        limit=limit,
+        after=decode_cursor(cursor) if cursor else None,
+    )
+    return _participant_page(
+        participants,
+        await _serialize_participants(participants),
+        has_more,
+    )
+
+
+@chat_route.post(
+    "/conversations/{conversation_id}/participants",
+    response_model=list[ChatParticipantResponse],
+)
+async def add_participants(
+    conversation_id: uuid.UUID,
+    payload: ChatGroupMembersAdd,
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+) -> list[ChatParticipantResponse]:
+    service = _chat_service(db)
+    await service.ensure_group_admin(conversation_id, current_user.id)
+    await _ensure_users_exist(db, payload.user_ids)
+
+    member_ids = await service.get_participant_ids(conversation_id)
+    participant_ids = await service.add_members(conversation_id, payload.user_ids)
     await db.commit()
-    await db.refresh(conversation)
+    if not participant_ids:
+        return []
+
+    participants = await service.load_participants(participant_ids)
+    added_ids = [participant.user_id for participant in participants]
+    await membership_broadcast.changed(conversation_id, member_ids, added_ids=added_ids)
+    await manager.publish(
+        conversation_id,
+        {
+            "type": "members",
+            "data": {
+                "conversation_id": str(conversation_id),
+                "action": "added",
+                "user_ids": [str(user_id) for user_id in added_ids],
+            },
+        },
+    )
+    logger.info(
+        "chat.group.members_added",
+        extra={
+            "conversation_id": str(conversation_id),
+            "user_id": str(current_user.id),
+            "member_count": len(added_ids),
+        },
+    )
+    return await _serialize_participants(participants)
 
-    return await _serialize_conversation(db, conversation)
 
+@chat_route.delete(
+    "/conversations/{conversation_id}/participants/{user_id}",
+    status_code=204,
+)
+async def remove_participant(
+    conversation_id: uuid.UUID,
+    user_id: uuid.UUID,
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+) -> None:
+    service = _chat_service(db)
+    # Members may always leave; removing someone else takes an admin.
+    if user_id == current_user.id:
+        await service.ensure_member(conversation_id, current_user.id)
+    else:
+        await service.ensure_group_admin(conversation_id, current_user.id)
+
+    member_ids = await service.get_participant_ids(conversation_id)
+    if not await service.remove_member(conversation_id, user_id):
+        raise HTTPException(status_code=404, detail="Participant not found.")
+    await db.commit()
 
-@chat_route.get("/conversations", response_model=list[ChatConversationResponse])
+    # Published before unsubscribing, so the removed user hears it too.
+    await manager.publish(
+        conversation_id,
+        {
+            "type": "members",
+            "data": {
+                "conversation_id": str(conversation_id),
+                "action": "removed",
+                "user_ids": [str(user_id)],
+            },
+        },
+    )
+    await membership_broadcast.changed(conversation_id, member_ids, removed_ids=(user_id,))
+    logger.info(
+        "chat.group.member_removed",
+        extra={
+            "conversation_id": str(conversation_id),
+            "user_id": str(current_user.id),
+            "removed_user_id": str(user_id),
+        },
+    )
+
+
+@chat_route.get("/conversations", response_model=ChatConversationPage)
 async def list_conversations(
     db: SessionDep,
     current_user: User = Depends(get_current_user),
-) -> list[ChatConversationResponse]:
-    stmt = (
-        select(ChatConversation)
-        .join(ChatParticipant)
-        .where(ChatParticipant.user_id == current_user.id)
-        .options(
-            selectinload(ChatConversation.participants).selectinload(ChatParticipant.user)
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+) -> ChatConversationPage:
+    service = _chat_service(db)
+    rows = await service.list_inbox(
+        current_user.id,
+        limit=limit,
+        after=decode_cursor(cursor) if cursor else None,
+    )
+
+    next_cursor = None
+    if len(rows) == limit:
+        last_conversation = rows[-1][0]
+        next_cursor = encode_cursor(
+            last_conversation.last_message_at or last_conversation.create_at,
+            last_conversation.id,
         )
-        .order_by(ChatConversation.last_message_at.desc(), ChatConversation.create_at.desc())
+
+    return ChatConversationPage(
+        items=await _serialize_inbox(rows),
+        next_cursor=next_cursor,
+    )
+
+
+@chat_route.get("/sync", response_model=ChatSyncResponse)
+async def sync_changes(
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=500),
+) -> ChatSyncResponse:
+    # Changes newer than `until` may still belong to open transactions (or to
+    # the write-behind buffer), so the feed only hands out settled history.
+    until = time_now() - timedelta(milliseconds=settings.CHAT_SYNC_SETTLE_MS)
+    settled_cursor = encode_cursor(
+        until,
+        uuid.UUID(int=0),
+        SyncChangeKind.CONVERSATION.value,
+    )
+    if not cursor:
+        return ChatSyncResponse(next_cursor=settled_cursor)
+
+    kind_raw, after_at, after_id = decode_directional_cursor(cursor)
+    try:
+        after_kind = SyncChangeKind(kind_raw)
+    except ValueError:
+        raise InvalidCursor()
+    if after_at >= until:
+        return ChatSyncResponse(next_cursor=cursor)
+
+    service = _chat_service(db)
+    changes, has_more = await service.list_changes(
+        current_user.id,
+        after=(after_at, after_kind, after_id),
+        until=until,
+        limit=limit,
+    )
+
+    ids_by_kind: dict[SyncChangeKind, list[uuid.UUID]] = {kind: [] for kind in SyncChangeKind}
+    for _, kind, entity_id in changes:
+        ids_by_kind[kind].append(entity_id)
+
+    inbox_rows = await service.get_inbox_entries(
+        current_user.id,
+        ids_by_kind[SyncChangeKind.CONVERSATION],
+    )
+    messages = await service.load_messages(ids_by_kind[SyncChangeKind.MESSAGE])
+    participants_by_conversation = await service.get_participants_by_conversation(
+        message.conversation_id for message in messages
+    )
+    participants = await service.load_participants(ids_by_kind[SyncChangeKind.PARTICIPANT])
+    removals = await service.load_removals(ids_by_kind[SyncChangeKind.REMOVAL])
+    avatar_urls = await resolve_avatar_urls(
+        participant.user.avatar_url for participant in participants
+    )
+    presence = await presence_service.get_statuses(
+        participant.user_id for participant in participants
+    )
+
+    if has_more:
+        last_at, last_kind, last_id = changes[-1]
+        next_cursor = encode_cursor(last_at, last_id, last_kind.value)
+    else:
+        next_cursor = settled_cursor
+
+    return ChatSyncResponse(
+        conversations=await _serialize_inbox(inbox_rows),
+        messages=await _serialize_messages(messages, participants_by_conversation),
+        participants=[
+            _build_participant_response(
+                participant,
+                avatar_urls.get(participant.user.avatar_url),
+                presence.get(participant.user_id),
+            )
+            for participant in participants
+        ],
+        removals=[
+            ChatParticipantRemovalResponse(
+                conversation_id=removal.conversation_id,
+                user_id=removal.user_id,
+                removed_at=removal.create_at,
+            )
+            for removal in removals
+        ],
+        next_cursor=next_cursor,
+        has_more=has_more,
+    )
+
+
+@chat_route.get("/search", response_model=ChatMessageSearchPage)
+async def search_messages(
+    db: SessionDep,
+    q: str = Query(..., min_length=1, max_length=200),
+    current_user: User = Depends(get_current_user),
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=50),
+) -> ChatMessageSearchPage:
+    term = q.strip()
+    if not term:
+        return ChatMessageSearchPage(items=[])
+
+    after = None
+    if cursor:
+        rank_raw, cursor_at, cursor_id = decode_directional_cursor(cursor)
+        try:
+            cursor_rank = float(rank_raw)
+        except ValueError:
+            raise InvalidCursor()
+        if not math.isfinite(cursor_rank):
+            raise InvalidCursor()
+        after = (cursor_rank, cursor_at, cursor_id)
+
+    service = _chat_service(db)
+    hits, has_more = await service.search_messages(
+        current_user.id,
+        term,
+        limit=limit,
+        after=after,
+        highlight=(_SNIPPET_START, _SNIPPET_STOP),
+    )
+
+    messages = [message for message, _, _ in hits]
+    participants_by_conversation = await service.get_participants_by_conversation(
+        message.conversation_id for message in messages
+    )
+    serialized = await _serialize_messages(messages, participants_by_conversation)
+
+    next_cursor = None
+    if has_more:
+        last_message, last_rank, _ = hits[-1]
+        next_cursor = encode_cursor(last_message.create_at, last_message.id, repr(last_rank))
+
+    return ChatMessageSearchPage(
+        items=[
+            ChatMessageSearchHit(
+                message=response,
+                snippet=_render_snippet(snippet or ""),
+                rank=rank,
+            )
+            for response, (_, rank, snippet) in zip(serialized, hits)
+        ],
+        next_cursor=next_cursor,
     )
-    result = await db.execute(stmt)
-    conversations = result.scalars().unique().all()
-    serialized = []
-    for conversation in conversations:
-        serialized.append(await _serialize_conversation(db, conversation))
-    return serialized
 
 
 @chat_route.get(
     "/conversations/{conversation_id}/messages",
-    response_model=list[ChatMessageResponse],
+    response_model=ChatMessagePage,
 )
 async def list_messages(
     conversation_id: uuid.UUID,
     db: SessionDep,
     current_user: User = Depends(get_current_user),
-    before: datetime | None = None,
+    cursor: str | None = None,
+    after_seq: int | None = Query(None, ge=0),
     limit: int = 50,
-) -> list[ChatMessageResponse]:
+) -> ChatMessagePage:
     if limit > 100:
         raise HTTPException(status_code=400, detail="Limit cannot exceed 100.")
+    if cursor and after_seq is not None:
+        raise HTTPException(status_code=400, detail="Use either cursor or after_seq, not both.")
+
+    direction = MessagePageDirection.OLDER
+    position = None
+    if cursor:
+        direction_raw, cursor_at, cursor_id = decode_directional_cursor(cursor)
+        try:
+            direction = MessagePageDirection(direction_raw)
+        except ValueError:
+            raise InvalidCursor()
+        position = (cursor_at, cursor_id)
 
     service = _chat_service(db)
-    await service.get_conversation(conversation_id)
-    await service.ensure_participant(conversation_id, current_user.id)
-
-    stmt = (
-        select(ChatMessage)
-        .options(selectinload(ChatMessage.receipts))
-        .where(ChatMessage.conversation_id == conversation_id)
-        .order_by(ChatMessage.create_at.desc())
-        .limit(limit)
-    )
-    if before:
-        stmt = stmt.where(ChatMessage.create_at < before)
-
-    result = await db.execute(stmt)
-    messages = list(result.scalars().all())
-    messages.reverse()
-    updated_ids = await service.mark_messages_delivered(messages, current_user.id)
+    conversation = await service.get_conversation(conversation_id)
+    participant = await service.ensure_participant(conversation_id, current_user.id)
+
+    next_cursor = None
+    prev_cursor = None
+    if after_seq is not None:
+        # Gap-fill: everything after the last seq the client has, oldest first.
+        messages, has_more = await service.list_messages_after_seq(
+            conversation_id,
+            after_seq,
+            limit=limit,
+        )
+        if has_more:
+            prev_cursor = encode_cursor(
+                messages[-1].create_at,
+                messages[-1].id,
+                MessagePageDirection.NEWER.value,
+            )
+    else:
+        messages, has_more = await service.list_messages(
+            conversation_id,
+            limit=limit,
+            direction=direction,
+            position=position,
+        )
+
+    if after_seq is None and messages:
+        older_available = has_more if direction is MessagePageDirection.OLDER else True
+        newer_available = has_more if direction is MessagePageDirection.NEWER else bool(cursor)
+        if older_available:
+            next_cursor = encode_cursor(
+                messages[0].create_at,
+                messages[0].id,
+                MessagePageDirection.OLDER.value,
+            )
+        if newer_available:
+            prev_cursor = encode_cursor(
+                messages[-1].create_at,
+                messages[-1].id,
+                MessagePageDirection.NEWER.value,
+            )
+
+    updated_ids = await service.mark_messages_delivered(participant, messages)
     if updated_ids:
         await db.commit()
-        participant_ids = await service.get_participant_ids(conversation_id)
         receipt_payload = {
             "type": "receipt",
             "data": {
+                "conversation_id": str(conversation_id),
                 "message_ids": [str(mid) for mid in updated_ids],
                 "status": MessageDeliveryStatus.DELIVERED.value,
                 "user_id": str(current_user.id),
             },
         }
-        await manager.broadcast(participant_ids, receipt_payload)
+        await manager.publish(conversation_id, receipt_payload)
 
-    serialized: list[ChatMessageResponse] = []
-    for message in messages:
-        serialized.append(await _serialize_message(message))
-    return serialized
+    return ChatMessagePage(
+        items=await _serialize_messages(
+            messages,
+            {conversation_id: conversation.participants},
+        ),
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+    )
 
 
 @chat_route.post(
@@ -308,6 +915,7 @@ async def list_messages(
 async def send_message(
     conversation_id: uuid.UUID,
     payload: ChatMessageCreate,
+    request: Request,
     db: SessionDep,
     current_user: User = Depends(get_current_user),
 ) -> ChatMessageResponse:
@@ -315,27 +923,28 @@ async def send_message(
     await rate_limiter.hit(current_user.id)
 
     service = _chat_service(db)
-    conversation = await service.get_conversation(conversation_id)
-    await service.ensure_participant(conversation_id, current_user.id)
-    participant_ids = await service.get_participant_ids(conversation_id)
+    participant_ids = await service.ensure_member(conversation_id, current_user.id)
 
-    message = await service.create_message(
-        conversation,
+    message, created = await _persist_message(
+        service,
+        conversation_id,
         current_user.id,
         content=payload.content.strip(),
-        recipient_ids=participant_ids,
+        client_message_id=payload.client_message_id,
     )
 
-    await db.commit()
-    await db.refresh(message, attribute_names=["receipts"])
+    # A freshly inserted message has no delivery/read state yet.
+    response = await _serialize_message(message, ())
+    response.client_message_id = payload.client_message_id
+    if not created:
+        return response
 
-    response = await _serialize_message(message)
-    await manager.broadcast(
+    await _fan_out_message(
+        request.app.state.arq_pool,
         participant_ids,
-        {
-            "type": "message",
-            "data": response.model_dump(),
-        },
+        current_user,
+        message,
+        response,
     )
     logger.info(
         "chat.message.sent",
@@ -360,103 +969,185 @@ async def acknowledge_message(
     current_user: User = Depends(get_current_user),
 ) -> ChatMessageResponse:
     service = _chat_service(db)
-    message = await service.acknowledge_message(
-        message_id,
+    conversation_id, _, message_ids = await service.resolve_ack_target(
         current_user.id,
+        [message_id],
+    )
+    await ack_coalescer.submit(
+        current_user.id,
+        conversation_id,
         payload.status,
+        message_ids,
+        wait=True,
+    )
+
+    message = await service.load_message(message_id)
+    participants = await service.get_participants(conversation_id)
+    return await _serialize_message(message, participants)
+
+
+@chat_route.get(
+    "/messages/{message_id}/receipts",
+    response_model=ChatParticipantPage,
+)
+async def list_message_receipts(
+    message_id: uuid.UUID,
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+    status: MessageDeliveryStatus = MessageDeliveryStatus.READ,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+) -> ChatParticipantPage:
+    """Members who received / read a message, in join order."""
+    service = _chat_service(db)
+    message = await service.load_message(message_id)
+    await service.ensure_member(message.conversation_id, current_user.id)
+    participants, has_more = await service.list_participants(
+        message.conversation_id,
+        limit=limit,
+        after=decode_cursor(cursor) if cursor else None,
+        receipts_for=message,
+        status=status,
     )
+    return _participant_page(
+        participants,
+        await _serialize_participants(participants),
+        has_more,
+    )
+
 
+@chat_route.post(
+    "/conversations/{conversation_id}/ack",
+    response_model=ChatAcknowledgeAccepted,
+    status_code=202,
+)
+async def acknowledge_conversation(
+    conversation_id: uuid.UUID,
+    payload: ChatConversationAcknowledge,
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+) -> ChatAcknowledgeAccepted:
+    # Served from the membership cache; the message ids are resolved in
+    # bulk when the coalescer flushes.
+    await _chat_service(db).ensure_member(conversation_id, current_user.id)
+    message_ids = payload.target_message_ids
+    await ack_coalescer.submit(
+        current_user.id,
+        conversation_id,
+        payload.status,
+        message_ids,
+    )
+    return ChatAcknowledgeAccepted(
+        conversation_id=conversation_id,
+        status=payload.status,
+        message_ids=message_ids,
+    )
+
+
+@chat_route.post(
+    "/conversations/{conversation_id}/attachments/intent",
+    response_model=ChatAttachmentIntentResponse,
+    status_code=201,
+)
+async def create_attachment_intent(
+    conversation_id: uuid.UUID,
+    payload: ChatAttachmentIntentCreate,
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+) -> ChatAttachmentIntentResponse:
+    service = _chat_service(db)
+    await service.ensure_member(conversation_id, current_user.id)
     await db.commit()
-    await db.refresh(message, attribute_names=["receipts"])
 
-    response = await _serialize_message(message)
-    participant_ids = await service.get_participant_ids(message.conversation_id)
-    await manager.broadcast(
-        participant_ids,
-        {
-            "type": "receipt",
-            "data": {
-                "message_ids": [str(message.id)],
-                "status": payload.status.value,
-                "user_id": str(current_user.id),
-            },
-        },
+    max_bytes = settings.CHAT_ATTACHMENT_MAX_BYTES
+    if payload.size > max_bytes:
+        raise AttachmentTooLarge(max_bytes)
+
+    validate_attachment_content_type(
+        payload.content_type,
+        settings.CHAT_ATTACHMENT_ALLOWED_CONTENT_TYPES,
     )
-    logger.info(
-        "chat.message.acknowledged",
-        extra={
-            "message_id": str(message.id),
-            "conversation_id": str(message.conversation_id),
-            "user_id": str(current_user.id),
-            "status": payload.status.value,
-        },
+
+    attachment_key = build_chat_attachment_key(conversation_id, payload.filename)
+    expires_in = settings.CHAT_ATTACHMENT_UPLOAD_EXPIRES_SECONDS
+    upload = await generate_attachment_upload(
+        attachment_key,
+        payload.content_type,
+        max_bytes,
+        expires_in,
+    )
+    return ChatAttachmentIntentResponse(
+        upload_url=upload["url"],
+        fields=upload["fields"],
+        attachment_key=attachment_key,
+        max_bytes=max_bytes,
+        expires_at=time_now() + timedelta(seconds=expires_in),
     )
-    return response
 
 
 @chat_route.post(
-    "/conversations/{conversation_id}/attachments",
+    "/conversations/{conversation_id}/attachments/complete",
     response_model=ChatMessageResponse,
     status_code=201,
 )
-async def upload_attachment(
+async def complete_attachment(
     conversation_id: uuid.UUID,
+    payload: ChatAttachmentComplete,
+    request: Request,
     db: SessionDep,
     current_user: User = Depends(get_current_user),
-    file: UploadFile = File(...),
-    caption: str | None = Form(None),
 ) -> ChatMessageResponse:
     await rate_limiter.hit(current_user.id)
 
     service = _chat_service(db)
-    conversation = await service.get_conversation(conversation_id)
-    await service.ensure_participant(conversation_id, current_user.id)
+    participant_ids = await service.ensure_member(conversation_id, current_user.id)
+    await db.commit()
 
-    file_bytes = await file.read()
-    if not file_bytes:
-        raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+    if not attachment_key_belongs_to(payload.attachment_key, conversation_id):
+        raise InvalidAttachmentKey()
 
-    if len(file_bytes) > settings.CHAT_ATTACHMENT_MAX_BYTES:
-        raise AttachmentTooLarge(settings.CHAT_ATTACHMENT_MAX_BYTES)
+    caption_text = payload.caption.strip() if payload.caption else None
+    if caption_text:
+        validate_message_content(caption_text)
 
+    # The POST policy already bounded size and type; re-check what S3 stored.
+    uploaded = await head_attachment(payload.attachment_key)
+    if uploaded is None:
+        raise AttachmentNotUploaded()
+    size, content_type = uploaded
+    if size > settings.CHAT_ATTACHMENT_MAX_BYTES:
+        raise AttachmentTooLarge(settings.CHAT_ATTACHMENT_MAX_BYTES)
     validate_attachment_content_type(
-        file.content_type,
+        content_type,
         settings.CHAT_ATTACHMENT_ALLOWED_CONTENT_TYPES,
     )
 
-    caption_text = caption.strip() if caption else None
-    if caption_text:
-        validate_message_content(caption_text)
-
-    attachment_key = build_chat_attachment_key(conversation_id, file.filename)
-    uploaded_key = await upload_attachment_to_s3(file_bytes, attachment_key, file.content_type)
-
-    if not uploaded_key:
-        raise AttachmentUploadFailed()
-
-    participant_ids = await service.get_participant_ids(conversation_id)
-
-    message = await service.create_message(
-        conversation,
+    message, _ = await _persist_message(
+        service,
+        conversation_id,
         current_user.id,
         content=caption_text,
-        attachment_name=file.filename,
-        attachment_key=uploaded_key,
-        attachment_content_type=file.content_type,
-        attachment_size=len(file_bytes),
-        recipient_ids=participant_ids,
+        attachment_name=payload.filename,
+        attachment_key=payload.attachment_key,
+        attachment_content_type=content_type,
+        attachment_size=size,
     )
 
-    await db.commit()
-    await db.refresh(message, attribute_names=["receipts"])
+    if content_type and content_type.startswith("image/"):
+        await request.app.state.arq_pool.enqueue_job(
+            "generate_attachment_thumbnails",
+            str(message.id),
+            message.create_at.isoformat(),
+            _job_id=f"chat-thumbnails:{message.id}",
+        )
 
-    response = await _serialize_message(message)
-    await manager.broadcast(
+    response = await _serialize_message(message, ())
+    await _fan_out_message(
+        request.app.state.arq_pool,
         participant_ids,
-        {
-            "type": "message",
-            "data": response.model_dump(),
-        },
+        current_user,
+        message,
+        response,
     )
     logger.info(
         "chat.attachment.uploaded",
@@ -464,14 +1155,108 @@ async def upload_attachment(
             "conversation_id": str(conversation_id),
             "message_id": str(message.id),
             "sender_id": str(current_user.id),
-            "filename": file.filename,
-            "content_type": file.content_type,
-            "size": len(file_bytes),
+            "filename": payload.filename,
+            "content_type": content_type,
+            "size": size,
         },
     )
     return response
 
 
+def _ensure_admin(user: User) -> None:
+    if user.role != UserRole.ADMIN.value:
+        raise ModerationAdminRequired()
+
+
+def _build_moderation_rule_response(rule: ChatModerationRule) -> ChatModerationRuleResponse:
+    return ChatModerationRuleResponse(
+        id=rule.id,
+        kind=ModerationRuleKind(rule.kind),
+        pattern=rule.pattern,
+        reason=rule.reason,
+        is_active=rule.is_active,
+        created_at=rule.create_at,
+    )
+
+
+@chat_route.get(
+    "/moderation/rules",
+    response_model=list[ChatModerationRuleResponse],
+)
+async def list_moderation_rules(
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+) -> list[ChatModerationRuleResponse]:
+    _ensure_admin(current_user)
+    result = await db.execute(
+        select(ChatModerationRule).order_by(ChatModerationRule.create_at.asc())
+    )
+    return [_build_moderation_rule_response(rule) for rule in result.scalars().all()]
+
+
+@chat_route.post(
+    "/moderation/rules",
+    response_model=ChatModerationRuleResponse,
+    status_code=201,
+)
+async def create_moderation_rule(
+    payload: ChatModerationRuleCreate,
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+) -> ChatModerationRuleResponse:
+    _ensure_admin(current_user)
+    pattern = payload.pattern.strip()
+    if payload.kind is ModerationRuleKind.REGEX:
+        try:
+            validate_regex_rule(pattern)
+        except re.error as exc:
+            raise InvalidModerationRule(str(exc))
+    elif not normalize_text(pattern):
+        raise InvalidModerationRule("term is empty")
+
+    result = await db.execute(
+        select(ChatModerationRule).where(
+            ChatModerationRule.kind == payload.kind.value,
+            ChatModerationRule.pattern == pattern,
+        )
+    )
+    rule = result.scalar_one_or_none()
+    if rule is None:
+        rule = ChatModerationRule(kind=payload.kind.value, pattern=pattern)
+        db.add(rule)
+    rule.reason = payload.reason
+    rule.is_active = True
+    await db.commit()
+    await db.refresh(rule)
+
+    # Recompile here; other workers pick it up on their next poll.
+    await moderation_engine.publish_change()
+    logger.info(
+        "chat.moderation.rule_saved",
+        extra={"rule_id": str(rule.id), "kind": rule.kind, "user_id": str(current_user.id)},
+    )
+    return _build_moderation_rule_response(rule)
+
+
+@chat_route.delete("/moderation/rules/{rule_id}", status_code=204)
+async def delete_moderation_rule(
+    rule_id: uuid.UUID,
+    db: SessionDep,
+    current_user: User = Depends(get_current_user),
+) -> None:
+    _ensure_admin(current_user)
+    rule = await db.get(ChatModerationRule, rule_id)
+    if rule is None:
+        raise ModerationRuleNotFound()
+    await db.delete(rule)
+    await db.commit()
+    await moderation_engine.publish_change()
+    logger.info(
+        "chat.moderation.rule_deleted",
+        extra={"rule_id": str(rule_id), "user_id": str(current_user.id)},
+    )
+
+
 @chat_route.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket, token: str | None = None) -> None:
     if not token:
@@ -500,14 +1285,19 @@ async def websocket_endpoint(websocket: WebSocket, token: str | None = None) ->
             await websocket.close(code=4403)
             return
 
-        await websocket.accept()
-        await manager.connect(user.id, websocket)
+        subprotocol = negotiate_subprotocol(websocket.scope.get("subprotocols", ()))
+        await websocket.accept(subprotocol=subprotocol)
+        await manager.connect(user.id, websocket, subprotocol)
+        await presence_service.mark_online(user.id)
 
         service = _chat_service(db)
-        contacts = await _user_contact_ids(db, user.id)
+        # Cached across reconnects; a miss also primes the membership cache.
+        contacts = set(await service.get_contact_ids(user.id))
+        await manager.subscribe(user.id, await service.get_conversation_ids(user.id))
+        await db.commit()
         now = time_now()
         await manager.broadcast(
-            contacts,
+            await manager.get_online_user_ids(contacts),
             {
                 "type": "presence",
                 "data": {
@@ -520,205 +1310,249 @@ async def websocket_endpoint(websocket: WebSocket, token: str | None = None) ->
 
         try:
             while True:
-                data = await websocket.receive_text()
                 try:
-                    message_payload = json.loads(data)
-                except json.JSONDecodeError:
-                    await websocket.send_text(
-                        json.dumps(
-                            {
-                                "type": "error",
-                                "message": "Invalid JSON payload.",
-                            }
-                        )
+                    # Backstop for half-open sockets whose close never completes.
+                    frame = await asyncio.wait_for(
+                        websocket.receive(),
+                        timeout=manager.idle_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    await websocket.close(code=CLOSE_IDLE_TIMEOUT)
+                    break
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+                received_at = time.perf_counter()
+                manager.touch(websocket)
+                # JSON text frames, or MessagePack binary frames when negotiated.
+                message_payload = decode_frame(frame)
+                if message_payload is None:
+                    events_received.labels("invalid").inc()
+                    await manager.send_to_socket(
+                        websocket,
+                        {
+                            "type": "error",
+                            "message": "Invalid payload.",
+                        },
                     )
                     continue
 
                 event_type = message_payload.get("type")
-                if event_type == "message":
-                    conversation_id_raw = message_payload.get("conversation_id")
-                    content = (message_payload.get("content") or "").strip()
-
-                    try:
-                        conversation_uuid = uuid.UUID(conversation_id_raw)
-                    except (ValueError, TypeError):
-                        await websocket.send_text(
-                            json.dumps(
+                with track_event(event_type):
+                    if event_type == "pong":
+                        continue
+                    if event_type == "ping":
+                        await manager.send_to_socket(websocket, {"type": "pong"})
+                        continue
+                    if event_type == "message":
+                        conversation_id_raw = message_payload.get("conversation_id")
+                        content = (message_payload.get("content") or "").strip()
+
+                        try:
+                            conversation_uuid = uuid.UUID(conversation_id_raw)
+                        except (ValueError, TypeError):
+                            await manager.send_to_socket(
+                                websocket,
                                 {
                                     "type": "error",
                                     "message": "Invalid conversation id.",
-                                }
+                                },
                             )
-                        )
-                        continue
+                            continue
 
-                    try:
-                        validate_message_content(content)
-                    except HTTPException as exc:
-                        await websocket.send_text(
-                            json.dumps(
+                        try:
+                            validate_message_content(content)
+                        except HTTPException as exc:
+                            await manager.send_to_socket(
+                                websocket,
                                 {
                                     "type": "error",
                                     "message": exc.detail,
-                                }
+                                },
                             )
-                        )
-                        continue
+                            continue
 
-                    await rate_limiter.hit(user.id)
+                        await rate_limiter.hit(user.id)
 
-                    try:
-                        conversation = await service.get_conversation(conversation_uuid)
-                        await service.ensure_participant(conversation_uuid, user.id)
-                    except ConversationAccessForbidden:
-                        await websocket.send_text(
-                            json.dumps(
+                        try:
+                            participant_ids = await service.ensure_member(conversation_uuid, user.id)
+                        except (ConversationAccessForbidden, ConversationNotFound):
+                            await db.commit()
+                            await manager.send_to_socket(
+                                websocket,
                                 {
                                     "type": "error",
                                     "message": "You are not a member of this conversation.",
-                                }
+                                },
                             )
-                        )
-                        continue
+                            continue
 
-                    participant_ids = await service.get_participant_ids(conversation_uuid)
-                    contacts.update(pid for pid in participant_ids if pid != user.id)
+                        contacts.update(pid for pid in participant_ids if pid != user.id)
 
-                    message = await service.create_message(
-                        conversation,
-                        user.id,
-                        content=content,
-                        recipient_ids=participant_ids,
-                    )
-
-                    await db.commit()
-                    await db.refresh(message, attribute_names=["receipts"])
-
-                    response = await _serialize_message(message)
-                    await manager.broadcast(
-                        participant_ids,
-                        {
-                            "type": "message",
-                            "data": response.model_dump(),
-                        },
-                    )
-                    logger.info(
-                        "chat.message.sent",
-                        extra={
-                            "conversation_id": str(conversation_uuid),
-                            "message_id": str(message.id),
-                            "sender_id": str(user.id),
-                            "has_attachment": bool(message.attachment_key),
-                        },
-                    )
-                elif event_type == "typing":
-                    conversation_id_raw = message_payload.get("conversation_id")
-                    is_typing = bool(message_payload.get("is_typing", True))
-                    try:
-                        conversation_uuid = uuid.UUID(conversation_id_raw)
-                    except (ValueError, TypeError):
-                        await websocket.send_text(
-                            json.dumps(
+                        client_message_id = message_payload.get("client_message_id")
+                        if client_message_id is not None and not (
+                            isinstance(client_message_id, str) and 0 < len(client_message_id) <= 64
+                        ):
+                            await manager.send_to_socket(
+                                websocket,
                                 {
                                     "type": "error",
-                                    "message": "Invalid conversation id.",
-                                }
+                                    "message": "Invalid client message id.",
+                                },
                             )
+                            continue
+
+                        try:
+                            message, created = await _persist_message(
+                                service,
+                                conversation_uuid,
+                                user.id,
+                                content=content,
+                                client_message_id=client_message_id,
+                            )
+                        except HTTPException as exc:
+                            await manager.send_to_socket(
+                                websocket,
+                                {
+                                    "type": "error",
+                                    "message": exc.detail,
+                                },
+                            )
+                            continue
+
+                        response = await _serialize_message(message, ())
+                        response.client_message_id = client_message_id
+                        if not created:
+                            # A retry: only the sender's socket hears about it again.
+                            await manager.send_to_socket(
+                                websocket,
+                                {
+                                    "type": "message",
+                                    "data": response.model_dump(),
+                                },
+                            )
+                            continue
+
+                        await _fan_out_message(
+                            websocket.app.state.arq_pool,
+                            participant_ids,
+                            user,
+                            message,
+                            response,
+                            received_at,
                         )
-                        continue
+                        logger.info(
+                            "chat.message.sent",
+                            extra={
+                                "conversation_id": str(conversation_uuid),
+                                "message_id": str(message.id),
+                                "sender_id": str(user.id),
+                                "has_attachment": bool(message.attachment_key),
+                            },
+                        )
+                    elif event_type == "typing":
+                        conversation_id_raw = message_payload.get("conversation_id")
+                        is_typing = bool(message_payload.get("is_typing", True))
+                        try:
+                            conversation_uuid = uuid.UUID(conversation_id_raw)
+                        except (ValueError, TypeError):
+                            await manager.send_to_socket(
+                                websocket,
+                                {
+                                    "type": "error",
+                                    "message": "Invalid conversation id.",
+                                },
+                            )
+                            continue
 
-                    try:
-                        await service.ensure_participant(conversation_uuid, user.id)
-                    except ConversationAccessForbidden:
-                        await websocket.send_text(
-                            json.dumps(
+                        # The user's conversation topics double as their membership
+                        # set, kept current by the group membership endpoints.
+                        if not manager.is_subscribed(user.id, conversation_uuid):
+                            await manager.send_to_socket(
+                                websocket,
                                 {
                                     "type": "error",
                                     "message": "You are not a member of this conversation.",
+                                },
+                            )
+                            continue
+
+                        await typing_throttle.update(user.id, conversation_uuid, is_typing)
+                    elif event_type == "ack":
+                        legacy_message_id = message_payload.get("message_id")
+                        conversation_id_raw = message_payload.get("conversation_id")
+                        try:
+                            ack = ChatConversationAcknowledge.model_validate(
+                                {
+                                    "status": message_payload.get("status"),
+                                    "message_ids": message_payload.get("message_ids")
+                                    or ([legacy_message_id] if legacy_message_id else []),
+                                    "up_to_message_id": message_payload.get("up_to_message_id"),
                                 }
                             )
-                        )
-                        continue
-
-                    participant_ids = await service.get_participant_ids(conversation_uuid)
-                    await manager.broadcast(
-                        participant_ids,
-                        {
-                            "type": "typing",
-                            "data": {
-                                "conversation_id": str(conversation_uuid),
-                                "user_id": str(user.id),
-                                "is_typing": is_typing,
-                            },
-                        },
-                    )
-                elif event_type == "ack":
-                    message_id_raw = message_payload.get("message_id")
-                    status_raw = message_payload.get("status")
-                    try:
-                        message_uuid = uuid.UUID(message_id_raw)
-                        status = MessageDeliveryStatus(status_raw)
-                    except (ValueError, TypeError):
-                        await websocket.send_text(
-                            json.dumps(
+                            conversation_uuid = (
+                                uuid.UUID(conversation_id_raw) if conversation_id_raw else None
+                            )
+                        except (ValueError, TypeError):
+                            await manager.send_to_socket(
+                                websocket,
                                 {
                                     "type": "error",
                                     "message": "Invalid acknowledgement payload.",
-                                }
+                                },
                             )
+                            continue
+
+                        message_ids = ack.target_message_ids
+                        if conversation_uuid is None:
+                            # Legacy single-message ack: look up its conversation.
+                            try:
+                                conversation_uuid, _, message_ids = await service.resolve_ack_target(
+                                    user.id,
+                                    message_ids,
+                                )
+                            except HTTPException as exc:
+                                await manager.send_to_socket(
+                                    websocket,
+                                    {
+                                        "type": "error",
+                                        "message": exc.detail,
+                                    },
+                                )
+                                continue
+                            finally:
+                                # Release the pooled connection between socket events.
+                                await db.commit()
+
+                        # Resolved in bulk, once per (user, conversation) flush.
+                        await ack_coalescer.submit(
+                            user.id,
+                            conversation_uuid,
+                            ack.status,
+                            message_ids,
                         )
-                        continue
-
-                    message = await service.acknowledge_message(
-                        message_uuid,
-                        user.id,
-                        status,
-                    )
-                    await db.commit()
-                    await db.refresh(message, attribute_names=["receipts"])
-                    participant_ids = await service.get_participant_ids(message.conversation_id)
-                    await manager.broadcast(
-                        participant_ids,
-                        {
-                            "type": "receipt",
-                            "data": {
-                                "message_ids": [str(message.id)],
-                                "status": status.value,
-                                "user_id": str(user.id),
-                            },
-                        },
-                    )
-                    logger.info(
-                        "chat.message.acknowledged",
-                        extra={
-                            "message_id": str(message.id),
-                            "conversation_id": str(message.conversation_id),
-                            "user_id": str(user.id),
-                            "status": status.value,
-                        },
-                    )
-                else:
-                    await websocket.send_text(
-                        json.dumps(
+                    else:
+                        await manager.send_to_socket(
+                            websocket,
                             {
                                 "type": "error",
                                 "message": "Unsupported event type.",
-                            }
+                            },
                         )
-                    )
         except WebSocketDisconnect:
             pass
         finally:
-            await manager.disconnect(user.id, websocket)
-            last_seen = await manager.get_last_seen(user.id)
-            await manager.broadcast(
-                contacts,
-                {
-                    "type": "presence",
-                    "data": {
-                        "user_id": str(user.id),
-                        "status": "offline",
-                        "last_seen_at": (last_seen or time_now()).isoformat(),
+            # Other tabs/devices may still be connected.
+            if await manager.disconnect(user.id, websocket):
+                await typing_throttle.clear_user(user.id)
+                last_seen = await presence_service.mark_offline(user.id)
+                await manager.broadcast(
+                    await manager.get_online_user_ids(contacts),
+                    {
+                        "type": "presence",
+                        "data": {
+                            "user_id": str(user.id),
+                            "status": "offline",
+                            "last_seen_at": last_seen.isoformat(),
+                        },
                     },
-                },
-            )
\ No newline at end of file
+                )
\ No newline at end of file
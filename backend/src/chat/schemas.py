@@ -3,7 +3,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 
 
 class ChatUserSummary(BaseModel):
@@ -14,15 +14,31 @@ class ChatUserSummary(BaseModel):
         default=None,
         json_schema_extra={"format": "binary"},
     )
+    is_online: bool = False
+    last_seen_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class ModerationRuleKind(str, Enum):
+    TERM = "term"
+    REGEX = "regex"
+
+
+class ChatParticipantRole(str, Enum):
+    ADMIN = "admin"
+    MEMBER = "member"
+
+
 class ChatParticipantResponse(BaseModel):
     conversation_id: uuid.UUID
     user: ChatUserSummary
+    role: ChatParticipantRole = ChatParticipantRole.MEMBER
     joined_at: datetime
+    last_delivered_seq: int = 0
+    last_read_seq: int = 0
+    last_delivered_at: Optional[datetime] = None
     last_read_at: Optional[datetime] = None
 
     class Config:
@@ -35,10 +51,21 @@ class ChatMessageResponse(BaseModel):
     sender_id: uuid.UUID
     content: Optional[str] = None
     created_at: datetime
+    seq: int
+    client_message_id: Optional[str] = None
     attachment_name: Optional[str] = None
     attachment_url: Optional[str] = None
     attachment_content_type: Optional[str] = None
     attachment_size: Optional[int] = None
+    attachment_thumbnail_url: Optional[str] = None
+    attachment_preview_url: Optional[str] = None
+    attachment_width: Optional[int] = None
+    attachment_height: Optional[int] = None
+    attachment_blurhash: Optional[str] = None
+    delivered_count: int = 0
+    read_count: int = 0
+    # Only listed for 1:1 conversations; group receipts are paged through
+    # `GET /chat/messages/{id}/receipts`.
     delivered_to: list[uuid.UUID] = Field(default_factory=list)
     read_by: list[uuid.UUID] = Field(default_factory=list)
 
@@ -46,24 +73,115 @@ class ChatMessageResponse(BaseModel):
         from_attributes = True
 
 
+class ChatMessagePage(BaseModel):
+    items: list[ChatMessageResponse]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class ChatMessageSearchHit(BaseModel):
+    message: ChatMessageResponse
+    snippet: str
+    rank: float
+
+
+class ChatMessageSearchPage(BaseModel):
+    items: list[ChatMessageSearchHit]
+    next_cursor: Optional[str] = None
+
+
+class ChatParticipantPage(BaseModel):
+    items: list[ChatParticipantResponse]
+    next_cursor: Optional[str] = None
+
+
 class ChatConversationResponse(BaseModel):
     id: uuid.UUID
+    is_group: bool = False
+    title: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     last_message_at: Optional[datetime] = None
     participants: list[ChatParticipantResponse]
     last_message: Optional[ChatMessageResponse] = None
+    unread_count: int = 0
 
     class Config:
         from_attributes = True
 
 
+class ChatConversationPage(BaseModel):
+    items: list[ChatConversationResponse]
+    next_cursor: Optional[str] = None
+
+
+class ChatAttachmentIntentCreate(BaseModel):
+    filename: str = Field(min_length=1, max_length=255)
+    content_type: str = Field(min_length=1, max_length=100)
+    size: int = Field(gt=0)
+
+
+class ChatAttachmentIntentResponse(BaseModel):
+    upload_url: str
+    fields: dict[str, str]
+    attachment_key: str
+    max_bytes: int
+    expires_at: datetime
+
+
+class ChatAttachmentComplete(BaseModel):
+    attachment_key: str = Field(max_length=512)
+    filename: str = Field(min_length=1, max_length=255)
+    caption: Optional[str] = None
+
+
+class ChatModerationRuleCreate(BaseModel):
+    kind: ModerationRuleKind
+    pattern: str = Field(min_length=1, max_length=512)
+    # Shown to the sender when the rule blocks a message.
+    reason: Optional[str] = Field(default=None, max_length=255)
+
+
+class ChatModerationRuleResponse(BaseModel):
+    id: uuid.UUID
+    kind: ModerationRuleKind
+    pattern: str
+    reason: Optional[str] = None
+    is_active: bool
+    created_at: datetime
+
+
 class ChatConversationCreate(BaseModel):
     recipient_id: uuid.UUID
 
 
+class ChatGroupCreate(BaseModel):
+    title: str = Field(min_length=1, max_length=255)
+    member_ids: list[uuid.UUID] = Field(min_length=1, max_length=500)
+
+
+class ChatGroupMembersAdd(BaseModel):
+    user_ids: list[uuid.UUID] = Field(min_length=1, max_length=500)
+
+
 class ChatMessageCreate(BaseModel):
     content: str
+    # Client-generated idempotency key; retries with the same key return
+    # the original message.
+    client_message_id: Optional[str] = Field(default=None, min_length=1, max_length=64)
+
+
+class MessagePageDirection(str, Enum):
+    OLDER = "older"
+    NEWER = "newer"
+
+
+class SyncChangeKind(str, Enum):
+    # Declared in the sort order the sync feed uses to break timestamp ties.
+    CONVERSATION = "conversation"
+    MESSAGE = "message"
+    PARTICIPANT = "participant"
+    REMOVAL = "removal"
 
 
 class MessageDeliveryStatus(str, Enum):
@@ -72,4 +190,43 @@ class MessageDeliveryStatus(str, Enum):
 
 
 class ChatMessageAcknowledge(BaseModel):
-    status: MessageDeliveryStatus
\ No newline at end of file
+    status: MessageDeliveryStatus
+
+
+class ChatConversationAcknowledge(BaseModel):
+    status: MessageDeliveryStatus
+    message_ids: list[uuid.UUID] = Field(default_factory=list, max_length=200)
+    up_to_message_id: Optional[uuid.UUID] = None
+
+    @model_validator(mode="after")
+    def _require_target(self) -> "ChatConversationAcknowledge":
+        if not self.message_ids and self.up_to_message_id is None:
+            raise ValueError("Either message_ids or up_to_message_id is required")
+        return self
+
+    @property
+    def target_message_ids(self) -> list[uuid.UUID]:
+        if self.up_to_message_id is not None:
+            return [*self.message_ids, self.up_to_message_id]
+        return list(self.message_ids)
+
+
+class ChatAcknowledgeAccepted(BaseModel):
+    conversation_id: uuid.UUID
+    status: MessageDeliveryStatus
+    message_ids: list[uuid.UUID]
+
+
+class ChatParticipantRemovalResponse(BaseModel):
+    conversation_id: uuid.UUID
+    user_id: uuid.UUID
+    removed_at: datetime
+
+
+class ChatSyncResponse(BaseModel):
+    conversations: list[ChatConversationResponse] = Field(default_factory=list)
+    messages: list[ChatMessageResponse] = Field(default_factory=list)
+    participants: list[ChatParticipantResponse] = Field(default_factory=list)
+    removals: list[ChatParticipantRemovalResponse] = Field(default_factory=list)
+    next_cursor: str
+    has_more: bool = False
@@ -1,26 +1,67 @@
 from __future__ import annotations
 
 import uuid
-from collections.abc import Iterable
+from collections.abc import Iterable, Sequence
+from datetime import datetime
 
-from sqlalchemy import select
+from sqlalchemy import (
+    Select,
+    String,
+    and_,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    true,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
+from src.chat.archive import load_archived_messages
+from src.chat.cache import contact_cache, conversation_cache, membership_cache
 from src.chat.exceptions import (
     ConversationAccessForbidden,
     ConversationNotFound,
+    GroupAdminRequired,
+    GroupMemberLimitExceeded,
     MessageAcknowledgeForbidden,
     MessageNotFound,
+    NotAGroupConversation,
 )
 from src.chat.models import (
+    CHAT_SEARCH_CONFIG,
     ChatConversation,
     ChatMessage,
-    ChatMessageReceipt,
+    ChatMessageKey,
     ChatParticipant,
+    ChatParticipantRemoval,
+    direct_pair_key,
+)
+from src.chat.schemas import (
+    ChatParticipantRole,
+    MessageDeliveryStatus,
+    MessagePageDirection,
+    SyncChangeKind,
 )
-from src.chat.schemas import MessageDeliveryStatus
 from src.core.base_model import time_now
+from src.core.config import settings
+
+
+InboxRow = tuple[ChatConversation, ChatMessage | None, int]
+SearchHit = tuple[ChatMessage, float, str]
+SyncChange = tuple[datetime, SyncChangeKind, uuid.UUID]
+# (seq, create_at) of the newest message a receipt watermark covers.
+Watermark = tuple[int, datetime]
+
+
+def conversation_activity_at():
+    return func.coalesce(ChatConversation.last_message_at, ChatConversation.create_at)
 
 
 class ChatService:
@@ -53,16 +94,346 @@ class ChatService:
         return participant
 
 
-    async def get_participant_ids(self, conversation_id: uuid.UUID) -> list[uuid.UUID]:
+    async def get_participant_ids(self, conversation_id: uuid.UUID) -> frozenset[uuid.UUID]:
+        cached = await membership_cache.get(conversation_id)
+        if cached is not None:
+            return cached
+
         stmt = select(ChatParticipant.user_id).where(
             ChatParticipant.conversation_id == conversation_id
         )
         result = await self.db.execute(stmt)
-        return [row[0] for row in result.all()]
+        participant_ids = frozenset(row[0] for row in result.all())
+        await membership_cache.set(conversation_id, participant_ids)
+        return participant_ids
+
+
+    async def ensure_member(self,
+                            conversation_id: uuid.UUID,
+                            user_id: uuid.UUID
+                            ) -> frozenset[uuid.UUID]:
+        participant_ids = await self.get_participant_ids(conversation_id)
+        if not participant_ids:
+            raise ConversationNotFound()
+        if user_id not in participant_ids:
+            raise ConversationAccessForbidden()
+        return participant_ids
+
+
+    async def get_user_memberships(self,
+                                   user_id: uuid.UUID
+                                   ) -> dict[uuid.UUID, frozenset[uuid.UUID]]:
+        own_conversations = select(ChatParticipant.conversation_id).where(
+            ChatParticipant.user_id == user_id
+        )
+        stmt = select(ChatParticipant.conversation_id, ChatParticipant.user_id).where(
+            ChatParticipant.conversation_id.in_(own_conversations)
+        )
+        result = await self.db.execute(stmt)
+        memberships: dict[uuid.UUID, set[uuid.UUID]] = {}
+        for conversation_id, member_id in result.all():
+            memberships.setdefault(conversation_id, set()).add(member_id)
+
+        frozen = {
+            conversation_id: frozenset(member_ids)
+            for conversation_id, member_ids in memberships.items()
+        }
+        for conversation_id, member_ids in frozen.items():
+            await membership_cache.set(conversation_id, member_ids)
+        return frozen
+
+
+    async def get_contact_ids(self, user_id: uuid.UUID) -> frozenset[uuid.UUID]:
+        """Everyone the user shares a conversation with, served from the contact cache."""
+        cached = await contact_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        memberships = await self.get_user_memberships(user_id)
+        contact_ids = frozenset(
+            member_id
+            for member_ids in memberships.values()
+            for member_id in member_ids
+            if member_id != user_id
+        )
+        await contact_cache.set(user_id, contact_ids)
+        await conversation_cache.set(user_id, memberships.keys())
+        return contact_ids
+
+
+    async def get_conversation_ids(self, user_id: uuid.UUID) -> frozenset[uuid.UUID]:
+        """Conversations the user belongs to, served from the conversation cache."""
+        cached = await conversation_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        result = await self.db.execute(
+            select(ChatParticipant.conversation_id).where(ChatParticipant.user_id == user_id)
+        )
+        conversation_ids = frozenset(result.scalars().all())
+        await conversation_cache.set(user_id, conversation_ids)
+        return conversation_ids
+
+
+    async def get_participants_by_conversation(self,
+                                               conversation_ids: Iterable[uuid.UUID]
+                                               ) -> dict[uuid.UUID, list[ChatParticipant]]:
+        conversation_ids = set(conversation_ids)
+        if not conversation_ids:
+            return {}
+        stmt = (
+            select(ChatParticipant)
+            .where(ChatParticipant.conversation_id.in_(conversation_ids))
+            .order_by(ChatParticipant.create_at.asc())
+            .execution_options(populate_existing=True)
+        )
+        result = await self.db.execute(stmt)
+        grouped: dict[uuid.UUID, list[ChatParticipant]] = {}
+        for participant in result.scalars().all():
+            grouped.setdefault(participant.conversation_id, []).append(participant)
+        return grouped
+
+
+    async def get_participants(self, conversation_id: uuid.UUID) -> list[ChatParticipant]:
+        stmt = (
+            select(ChatParticipant)
+            .where(ChatParticipant.conversation_id == conversation_id)
+            .order_by(ChatParticipant.create_at.asc())
+            .execution_options(populate_existing=True)
+        )
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+
+
+    async def get_or_create_direct_conversation(self,
+                                                user_id: uuid.UUID,
+                                                other_user_id: uuid.UUID
+                                                ) -> tuple[uuid.UUID, bool]:
+        """Return the 1:1 conversation of two users and whether it was created.
+
+        Concurrent calls for the same pair race on the unique pair key: the
+        loser's insert waits for the winner to commit, then falls back to
+        reading the winner's row. Participants are added in the caller's
+        transaction.
+        """
+        pair_key = direct_pair_key(user_id, other_user_id)
+        now = time_now()
+        conversation_id = await self.db.scalar(
+            pg_insert(ChatConversation)
+            .values(
+                id=uuid.uuid4(),
+                direct_pair_key=pair_key,
+                last_seq=0,
+                create_at=now,
+                updated_at=now,
+            )
+            .on_conflict_do_nothing(constraint="uq_chat_conversation_direct_pair")
+            .returning(ChatConversation.id)
+        )
+        if conversation_id is None:
+            conversation_id = await self.db.scalar(
+                select(ChatConversation.id).where(ChatConversation.direct_pair_key == pair_key)
+            )
+            return conversation_id, False
+
+        self.db.add_all(
+            [
+                ChatParticipant(conversation_id=conversation_id, user_id=user_id),
+                ChatParticipant(conversation_id=conversation_id, user_id=other_user_id),
+            ]
+        )
+        await self.db.flush()
+        return conversation_id, True
+
+
+    async def create_group(self,
+                           owner_id: uuid.UUID,
+                           title: str,
+                           member_ids: Iterable[uuid.UUID]
+                           ) -> uuid.UUID:
+        """Create a group conversation; the creator becomes its first admin."""
+        member_ids = set(member_ids) - {owner_id}
+        if len(member_ids) + 1 > settings.CHAT_GROUP_MAX_MEMBERS:
+            raise GroupMemberLimitExceeded(settings.CHAT_GROUP_MAX_MEMBERS)
+
+        conversation = ChatConversation(is_group=True, title=title)
+        self.db.add(conversation)
+        await self.db.flush()
+        self.db.add_all(
+            [
+                ChatParticipant(
+                    conversation_id=conversation.id,
+                    user_id=owner_id,
+                    role=ChatParticipantRole.ADMIN.value,
+                ),
+                *(
+                    ChatParticipant(conversation_id=conversation.id, user_id=member_id)
+                    for member_id in member_ids
+                ),
+            ]
+        )
+        await self.db.flush()
+        return conversation.id
+
+
+    async def _lock_group(self, conversation_id: uuid.UUID) -> None:
+        # Row lock on the conversation serializes membership changes, so
+        # concurrent adds cannot overshoot the member limit.
+        is_group = await self.db.scalar(
+            select(ChatConversation.is_group)
+            .where(ChatConversation.id == conversation_id)
+            .with_for_update()
+        )
+        if is_group is None:
+            raise ConversationNotFound()
+        if not is_group:
+            raise NotAGroupConversation()
+
+
+    async def ensure_group_admin(self, conversation_id: uuid.UUID, user_id: uuid.UUID) -> None:
+        role = await self.db.scalar(
+            select(ChatParticipant.role).where(
+                ChatParticipant.conversation_id == conversation_id,
+                ChatParticipant.user_id == user_id,
+            )
+        )
+        if role is None:
+            raise ConversationAccessForbidden()
+        if role != ChatParticipantRole.ADMIN.value:
+            raise GroupAdminRequired()
+
+
+    async def add_members(self,
+                          conversation_id: uuid.UUID,
+                          user_ids: Iterable[uuid.UUID]
+                          ) -> list[uuid.UUID]:
+        """Add users to a group; returns the participant ids of the new members."""
+        await self._lock_group(conversation_id)
+        user_ids = set(user_ids)
+        existing = await self.db.scalars(
+            select(ChatParticipant.user_id).where(
+                ChatParticipant.conversation_id == conversation_id,
+                ChatParticipant.user_id.in_(user_ids),
+            )
+        )
+        new_ids = user_ids - set(existing.all())
+        if not new_ids:
+            return []
+
+        member_count = await self.db.scalar(
+            select(func.count(ChatParticipant.id)).where(
+                ChatParticipant.conversation_id == conversation_id
+            )
+        )
+        if member_count + len(new_ids) > settings.CHAT_GROUP_MAX_MEMBERS:
+            raise GroupMemberLimitExceeded(settings.CHAT_GROUP_MAX_MEMBERS)
+
+        now = time_now()
+        result = await self.db.execute(
+            pg_insert(ChatParticipant)
+            .values(
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "conversation_id": conversation_id,
+                        "user_id": user_id,
+                        "role": ChatParticipantRole.MEMBER.value,
+                        "create_at": now,
+                        "updated_at": now,
+                    }
+                    for user_id in new_ids
+                ]
+            )
+            .on_conflict_do_nothing(constraint="uq_chat_participant_membership")
+            .returning(ChatParticipant.id)
+        )
+        return list(result.scalars().all())
+
+
+    async def remove_member(self, conversation_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """Remove a user from a group; the oldest member is promoted when the
+        last admin leaves."""
+        await self._lock_group(conversation_id)
+        removed_role = await self.db.scalar(
+            delete(ChatParticipant)
+            .where(
+                ChatParticipant.conversation_id == conversation_id,
+                ChatParticipant.user_id == user_id,
+            )
+            .returning(ChatParticipant.role)
+        )
+        if removed_role is None:
+            return False
+        # The row is gone; the tombstone is what `/sync` reports.
+        await self.db.execute(
+            insert(ChatParticipantRemoval).values(
+                id=uuid.uuid4(),
+                conversation_id=conversation_id,
+                user_id=user_id,
+                create_at=time_now(),
+                updated_at=time_now(),
+            )
+        )
+        if removed_role != ChatParticipantRole.ADMIN.value:
+            return True
+
+        admins = await self.db.scalar(
+            select(func.count(ChatParticipant.id)).where(
+                ChatParticipant.conversation_id == conversation_id,
+                ChatParticipant.role == ChatParticipantRole.ADMIN.value,
+            )
+        )
+        if not admins:
+            successor = (
+                select(ChatParticipant.id)
+                .where(ChatParticipant.conversation_id == conversation_id)
+                .order_by(ChatParticipant.create_at.asc(), ChatParticipant.id.asc())
+                .limit(1)
+                .scalar_subquery()
+            )
+            await self.db.execute(
+                update(ChatParticipant)
+                .where(ChatParticipant.id == successor)
+                .values(role=ChatParticipantRole.ADMIN.value, updated_at=time_now())
+            )
+        return True
+
+
+    async def list_participants(self,
+                                conversation_id: uuid.UUID,
+                                *,
+                                limit: int,
+                                after: tuple[datetime, uuid.UUID] | None = None,
+                                receipts_for: ChatMessage | None = None,
+                                status: MessageDeliveryStatus = MessageDeliveryStatus.READ
+                                ) -> tuple[list[ChatParticipant], bool]:
+        """Page through members in join order.
+
+        With `receipts_for`, only recipients whose delivered / read watermark
+        covers that message are listed.
+        """
+        stmt = (
+            select(ChatParticipant)
+            .where(ChatParticipant.conversation_id == conversation_id)
+            .order_by(ChatParticipant.create_at.asc(), ChatParticipant.id.asc())
+            .limit(limit + 1)
+            .options(selectinload(ChatParticipant.user))
+        )
+        if after:
+            stmt = stmt.where(tuple_(ChatParticipant.create_at, ChatParticipant.id) > tuple_(*after))
+        if receipts_for is not None:
+            covered = ChatParticipant.last_read_seq >= receipts_for.seq
+            if status is MessageDeliveryStatus.DELIVERED:
+                covered = or_(covered, ChatParticipant.last_delivered_seq >= receipts_for.seq)
+            stmt = stmt.where(ChatParticipant.user_id != receipts_for.sender_id, covered)
+
+        result = await self.db.execute(stmt)
+        participants = list(result.scalars().all())
+        return participants[:limit], len(participants) > limit
 
 
     async def create_message(self,
-                             conversation: ChatConversation,
+                             conversation_id: uuid.UUID,
                              sender_id: uuid.UUID,
                              *,
                              content: str | None,
@@ -70,103 +441,569 @@ class ChatService:
                              attachment_key: str | None = None,
                              attachment_content_type: str | None = None,
                              attachment_size: int | None = None,
-                             recipient_ids: Iterable[uuid.UUID]
+                             message_id: uuid.UUID | None = None,
+                             sent_at: datetime | None = None
                              ) -> ChatMessage:
-        message = ChatMessage(
-            conversation_id=conversation.id,
-            sender_id=sender_id,
-            content=content,
-            attachment_name=attachment_name,
-            attachment_key=attachment_key,
-            attachment_content_type=attachment_content_type,
-            attachment_size=attachment_size,
-        )
-        conversation.last_message_at = time_now()
-        self.db.add(message)
-        await self.db.flush()
-        await self._create_receipts(message, recipient_ids)
+        now = sent_at or time_now()
+        seq = await self.allocate_seq(conversation_id, sent_at=now)
+        message = await self.db.scalar(
+            insert(ChatMessage)
+            .values(
+                id=message_id or uuid.uuid4(),
+                conversation_id=conversation_id,
+                sender_id=sender_id,
+                seq=seq,
+                content=content,
+                attachment_name=attachment_name,
+                attachment_key=attachment_key,
+                attachment_content_type=attachment_content_type,
+                attachment_size=attachment_size,
+                create_at=now,
+                updated_at=now,
+            )
+            .returning(ChatMessage)
+        )
         return message
 
 
-    async def _create_receipts(self,
-                               message: ChatMessage,
-                               recipient_ids: Iterable[uuid.UUID]
-                               ) -> None:
-        for user_id in recipient_ids:
-            if user_id == message.sender_id:
-                continue
-            receipt = ChatMessageReceipt(
-                message_id=message.id,
-                user_id=user_id,
+    async def claim_message_key(self,
+                                sender_id: uuid.UUID,
+                                client_message_id: str,
+                                *,
+                                message_id: uuid.UUID,
+                                sent_at: datetime
+                                ) -> bool:
+        """Record the idempotency key of a message about to be inserted.
+
+        False means the key is taken. A concurrent insert of the same key
+        blocks on the unique index until the other transaction ends.
+        """
+        claimed = await self.db.scalar(
+            pg_insert(ChatMessageKey)
+            .values(
+                id=uuid.uuid4(),
+                sender_id=sender_id,
+                client_message_id=client_message_id,
+                message_id=message_id,
+                message_created_at=sent_at,
+                create_at=time_now(),
+                updated_at=time_now(),
             )
-            self.db.add(receipt)
-        await self.db.flush()
+            .on_conflict_do_nothing(constraint="uq_chat_message_key_sender")
+            .returning(ChatMessageKey.id)
+        )
+        return claimed is not None
 
 
-    async def acknowledge_message(self,
-                                  message_id: uuid.UUID,
-                                  user_id: uuid.UUID,
-                                  status: MessageDeliveryStatus
-                                  ) -> ChatMessage:
+    async def get_message_by_key(self,
+                                 sender_id: uuid.UUID,
+                                 client_message_id: str
+                                 ) -> ChatMessage | None:
         stmt = (
-            select(ChatMessageReceipt)
-            .options(selectinload(ChatMessageReceipt.message).selectinload(ChatMessage.receipts))
+            select(ChatMessage)
+            .join(
+                ChatMessageKey,
+                and_(
+                    ChatMessageKey.message_id == ChatMessage.id,
+                    ChatMessageKey.message_created_at == ChatMessage.create_at,
+                ),
+            )
             .where(
-                ChatMessageReceipt.message_id == message_id,
-                ChatMessageReceipt.user_id == user_id,
+                ChatMessageKey.sender_id == sender_id,
+                ChatMessageKey.client_message_id == client_message_id,
+            )
+        )
+        return await self.db.scalar(stmt)
+
+
+    async def allocate_seq(self,
+                           conversation_id: uuid.UUID,
+                           *,
+                           sent_at: datetime
+                           ) -> int:
+        # The row lock taken here serializes senders of one conversation until
+        # commit, which is what keeps `seq` gap-free.
+        seq = await self.db.scalar(
+            update(ChatConversation)
+            .where(ChatConversation.id == conversation_id)
+            .values(
+                last_seq=ChatConversation.last_seq + 1,
+                last_message_at=func.greatest(ChatConversation.last_message_at, sent_at),
             )
+            .returning(ChatConversation.last_seq)
+            .execution_options(synchronize_session=False)
+        )
+        if seq is None:
+            raise ConversationNotFound()
+        return seq
+
+
+    async def get_last_seq(self, conversation_id: uuid.UUID) -> int:
+        last_seq = await self.db.scalar(
+            select(ChatConversation.last_seq).where(ChatConversation.id == conversation_id)
+        )
+        if last_seq is None:
+            raise ConversationNotFound()
+        return last_seq
+
+
+    async def advance_watermarks(self,
+                                 conversation_id: uuid.UUID,
+                                 user_id: uuid.UUID,
+                                 *,
+                                 delivered_up_to: Watermark | None = None,
+                                 read_up_to: Watermark | None = None
+                                 ) -> bool:
+        # Read implies delivered, so a read ack moves both watermarks at once.
+        # GREATEST ignores NULLs in Postgres, which keeps the UPDATE monotonic.
+        delivered_up_to = max(
+            (value for value in (delivered_up_to, read_up_to) if value is not None),
+            default=None,
+        )
+        if delivered_up_to is None:
+            return False
+
+        delivered_seq, delivered_at = delivered_up_to
+        values = {
+            "last_delivered_seq": func.greatest(ChatParticipant.last_delivered_seq, delivered_seq),
+            "last_delivered_at": func.greatest(ChatParticipant.last_delivered_at, delivered_at),
+        }
+        moved = ChatParticipant.last_delivered_seq < delivered_seq
+        if read_up_to is not None:
+            read_seq, read_at = read_up_to
+            values["last_read_seq"] = func.greatest(ChatParticipant.last_read_seq, read_seq)
+            values["last_read_at"] = func.greatest(ChatParticipant.last_read_at, read_at)
+            moved = or_(moved, ChatParticipant.last_read_seq < read_seq)
+
+        stmt = (
+            update(ChatParticipant)
+            .where(
+                ChatParticipant.conversation_id == conversation_id,
+                ChatParticipant.user_id == user_id,
+                moved,
+            )
+            .values(**values)
+            .returning(ChatParticipant.id)
+            .execution_options(synchronize_session="fetch")
         )
         result = await self.db.execute(stmt)
-        receipt = result.scalar_one_or_none()
-        if not receipt:
-            raise MessageAcknowledgeForbidden()
+        return result.first() is not None
 
-        now = time_now()
-        if status is MessageDeliveryStatus.DELIVERED:
-            if receipt.delivered_at is None:
-                receipt.delivered_at = now
-        elif status is MessageDeliveryStatus.READ:
-            if receipt.delivered_at is None:
-                receipt.delivered_at = now
-            receipt.read_at = now
-            participant = await self.ensure_participant(
-                receipt.message.conversation_id,
-                user_id,
-            )
-            if not participant.last_read_at or participant.last_read_at < now:
-                participant.last_read_at = now
-        else:
+
+    async def resolve_ack_target(self,
+                                 user_id: uuid.UUID,
+                                 message_ids: Sequence[uuid.UUID],
+                                 conversation_id: uuid.UUID | None = None
+                                 ) -> tuple[uuid.UUID, Watermark, list[uuid.UUID]]:
+        if not message_ids:
             raise MessageNotFound()
 
-        await self.db.flush()
-        await self.db.refresh(receipt.message)
-        return receipt.message
+        stmt = select(
+            ChatMessage.id,
+            ChatMessage.conversation_id,
+            ChatMessage.sender_id,
+            ChatMessage.seq,
+            ChatMessage.create_at,
+        ).where(ChatMessage.id.in_(set(message_ids)))
+        if conversation_id is not None:
+            stmt = stmt.where(ChatMessage.conversation_id == conversation_id)
+        result = await self.db.execute(stmt)
+        rows = result.all()
+        if not rows:
+            raise MessageNotFound()
+
+        conversation_ids = {row.conversation_id for row in rows}
+        if len(conversation_ids) != 1:
+            raise MessageAcknowledgeForbidden()
+        target_conversation_id = conversation_ids.pop()
+        try:
+            await self.ensure_participant(target_conversation_id, user_id)
+        except ConversationAccessForbidden:
+            raise MessageAcknowledgeForbidden()
+
+        acknowledged = [row for row in rows if row.sender_id != user_id]
+        if not acknowledged:
+            raise MessageAcknowledgeForbidden()
+        up_to = max((row.seq, row.create_at) for row in acknowledged)
+        return target_conversation_id, up_to, [row.id for row in acknowledged]
+
+
+    async def get_ack_watermarks(self,
+                                 conversation_id: uuid.UUID,
+                                 user_id: uuid.UUID,
+                                 message_ids: Iterable[uuid.UUID]
+                                 ) -> dict[uuid.UUID, Watermark]:
+        """`(seq, create_at)` of the given messages that `user_id` may acknowledge.
+
+        Ids from another conversation and the user's own messages are left
+        out; membership is enforced by the watermark UPDATE itself.
+        """
+        message_ids = set(message_ids)
+        if not message_ids:
+            return {}
+        result = await self.db.execute(
+            select(ChatMessage.id, ChatMessage.seq, ChatMessage.create_at).where(
+                ChatMessage.id.in_(message_ids),
+                ChatMessage.conversation_id == conversation_id,
+                ChatMessage.sender_id != user_id,
+            )
+        )
+        return {row.id: (row.seq, row.create_at) for row in result.all()}
 
 
     async def mark_messages_delivered(self,
-                                      messages: Iterable[ChatMessage],
-                                      recipient_id: uuid.UUID
+                                      participant: ChatParticipant,
+                                      messages: Sequence[ChatMessage]
                                       ) -> list[uuid.UUID]:
-        now = time_now()
-        updated: list[uuid.UUID] = []
-        for message in messages:
-            for receipt in message.receipts:
-                if receipt.user_id == recipient_id and receipt.delivered_at is None:
-                    receipt.delivered_at = now
-                    updated.append(message.id)
+        watermark = max(participant.last_delivered_seq, participant.last_read_seq)
+        updated = [
+            message.id
+            for message in messages
+            if message.sender_id != participant.user_id and message.seq > watermark
+        ]
         if updated:
-            await self.db.flush()
+            await self.advance_watermarks(
+                participant.conversation_id,
+                participant.user_id,
+                delivered_up_to=max((message.seq, message.create_at) for message in messages),
+            )
         return updated
 
 
-    async def load_message(self, message_id: uuid.UUID) -> ChatMessage:
+    async def list_messages(self,
+                            conversation_id: uuid.UUID,
+                            *,
+                            limit: int,
+                            direction: MessagePageDirection = MessagePageDirection.OLDER,
+                            position: tuple[datetime, uuid.UUID] | None = None
+                            ) -> tuple[list[ChatMessage], bool]:
+        timeline = tuple_(ChatMessage.create_at, ChatMessage.id)
+        stmt = (
+            select(ChatMessage)
+            .where(ChatMessage.conversation_id == conversation_id)
+            .limit(limit + 1)
+        )
+        if direction is MessagePageDirection.NEWER:
+            stmt = stmt.order_by(ChatMessage.create_at.asc(), ChatMessage.id.asc())
+            if position:
+                stmt = stmt.where(timeline > tuple_(*position))
+        else:
+            stmt = stmt.order_by(ChatMessage.create_at.desc(), ChatMessage.id.desc())
+            if position:
+                stmt = stmt.where(timeline < tuple_(*position))
+
+        result = await self.db.execute(stmt)
+        messages = list(result.scalars().all())
+
+        # Archived months are strictly older than every live partition.
+        if direction is MessagePageDirection.NEWER:
+            archived = await load_archived_messages(
+                self.db,
+                conversation_id,
+                direction=direction,
+                position=position,
+                limit=limit + 1,
+            )
+            messages = (archived + messages)[: limit + 1]
+        elif len(messages) <= limit:
+            boundary = (messages[-1].create_at, messages[-1].id) if messages else position
+            messages += await load_archived_messages(
+                self.db,
+                conversation_id,
+                direction=direction,
+                position=boundary,
+                limit=limit + 1 - len(messages),
+            )
+
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if direction is MessagePageDirection.OLDER:
+            messages.reverse()
+        return messages, has_more
+
+
+    async def list_messages_after_seq(self,
+                                      conversation_id: uuid.UUID,
+                                      after_seq: int,
+                                      *,
+                                      limit: int
+                                      ) -> tuple[list[ChatMessage], bool]:
+        stmt = (
+            select(ChatMessage)
+            .where(
+                ChatMessage.conversation_id == conversation_id,
+                ChatMessage.seq > after_seq,
+            )
+            .order_by(ChatMessage.seq.asc())
+            .limit(limit + 1)
+        )
+        result = await self.db.execute(stmt)
+        messages = list(result.scalars().all())
+        return messages[:limit], len(messages) > limit
+
+
+    async def search_messages(self,
+                              user_id: uuid.UUID,
+                              text: str,
+                              *,
+                              limit: int,
+                              after: tuple[float, datetime, uuid.UUID] | None = None,
+                              highlight: tuple[str, str] = ("<b>", "</b>")
+                              ) -> tuple[list[SearchHit], bool]:
+        query = func.websearch_to_tsquery(literal(CHAT_SEARCH_CONFIG).cast(REGCONFIG), text)
+        rank = func.ts_rank(ChatMessage.search_vector, query)
+        start_sel, stop_sel = highlight
+        snippet = func.ts_headline(
+            literal(CHAT_SEARCH_CONFIG).cast(REGCONFIG),
+            ChatMessage.content,
+            query,
+            f"StartSel={start_sel}, StopSel={stop_sel}, MaxWords=24, MinWords=8, MaxFragments=2",
+        )
+        user_conversations = select(ChatParticipant.conversation_id).where(
+            ChatParticipant.user_id == user_id
+        )
+        stmt = (
+            select(ChatMessage, rank.label("rank"), snippet.label("snippet"))
+            .where(
+                ChatMessage.conversation_id.in_(user_conversations),
+                ChatMessage.search_vector.bool_op("@@")(query),
+            )
+            .order_by(rank.desc(), ChatMessage.create_at.desc(), ChatMessage.id.desc())
+            .limit(limit + 1)
+        )
+        if after:
+            stmt = stmt.where(
+                tuple_(rank, ChatMessage.create_at, ChatMessage.id) < tuple_(*after)
+            )
+
+        result = await self.db.execute(stmt)
+        hits = [(message, float(score), headline) for message, score, headline in result.all()]
+        return hits[:limit], len(hits) > limit
+
+
+    async def load_messages(self, message_ids: Sequence[uuid.UUID]) -> list[ChatMessage]:
+        if not message_ids:
+            return []
         stmt = (
             select(ChatMessage)
-            .options(selectinload(ChatMessage.receipts))
-            .where(ChatMessage.id == message_id)
+            .where(ChatMessage.id.in_(message_ids))
+            .order_by(ChatMessage.create_at.asc(), ChatMessage.id.asc())
         )
         result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+
+
+    async def load_message(self, message_id: uuid.UUID) -> ChatMessage:
+        stmt = select(ChatMessage).where(ChatMessage.id == message_id)
+        result = await self.db.execute(stmt)
         message = result.scalar_one_or_none()
         if not message:
             raise MessageNotFound()
-        return message
\ No newline at end of file
+        return message
+
+
+    def _inbox_statement(self, user_id: uuid.UUID) -> Select:
+        membership = aliased(ChatParticipant)
+        last_message_subquery = (
+            select(ChatMessage)
+            .where(ChatMessage.conversation_id == ChatConversation.id)
+            .order_by(ChatMessage.create_at.desc(), ChatMessage.id.desc())
+            .limit(1)
+            .lateral("last_message")
+        )
+        last_message = aliased(ChatMessage, last_message_subquery)
+        unread_count = (
+            select(func.count(ChatMessage.id))
+            .where(
+                ChatMessage.conversation_id == ChatConversation.id,
+                ChatMessage.sender_id != user_id,
+                ChatMessage.seq > membership.last_read_seq,
+            )
+            .correlate(ChatConversation, membership)
+            .scalar_subquery()
+        )
+        return (
+            select(ChatConversation, last_message, unread_count.label("unread_count"))
+            .join(
+                membership,
+                and_(
+                    membership.conversation_id == ChatConversation.id,
+                    membership.user_id == user_id,
+                ),
+            )
+            .outerjoin(last_message, true())
+            .options(
+                selectinload(ChatConversation.participants).selectinload(ChatParticipant.user),
+            )
+        )
+
+
+    async def list_inbox(self,
+                         user_id: uuid.UUID,
+                         *,
+                         limit: int,
+                         after: tuple[datetime, uuid.UUID] | None = None
+                         ) -> Sequence[InboxRow]:
+        activity_at = conversation_activity_at()
+        stmt = (
+            self._inbox_statement(user_id)
+            .order_by(activity_at.desc(), ChatConversation.id.desc())
+            .limit(limit)
+        )
+        if after:
+            stmt = stmt.where(tuple_(activity_at, ChatConversation.id) < tuple_(*after))
+        result = await self.db.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+
+    async def get_inbox_entry(self,
+                              user_id: uuid.UUID,
+                              conversation_id: uuid.UUID
+                              ) -> InboxRow:
+        stmt = (
+            self._inbox_statement(user_id)
+            .where(ChatConversation.id == conversation_id)
+            .execution_options(populate_existing=True)
+        )
+        result = await self.db.execute(stmt)
+        row = result.first()
+        if not row:
+            raise ConversationNotFound()
+        return tuple(row)
+
+
+    async def get_inbox_entries(self,
+                                user_id: uuid.UUID,
+                                conversation_ids: Sequence[uuid.UUID]
+                                ) -> Sequence[InboxRow]:
+        if not conversation_ids:
+            return []
+        stmt = (
+            self._inbox_statement(user_id)
+            .where(ChatConversation.id.in_(conversation_ids))
+            .order_by(ChatConversation.create_at.asc(), ChatConversation.id.asc())
+            .execution_options(populate_existing=True)
+        )
+        result = await self.db.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+
+    async def list_changes(self,
+                           user_id: uuid.UUID,
+                           *,
+                           after: SyncChange,
+                           until: datetime,
+                           limit: int
+                           ) -> tuple[list[SyncChange], bool]:
+        after_at, after_kind, after_id = after
+
+        def window(kind: SyncChangeKind, changed_at, entity_id):
+            # Split the (changed_at, kind, id) keyset per branch so each one
+            # keeps a plain range predicate on its timestamp column.
+            if kind.value > after_kind.value:
+                lower = changed_at >= after_at
+            elif kind is after_kind:
+                lower = and_(
+                    changed_at >= after_at,
+                    tuple_(changed_at, entity_id) > tuple_(after_at, after_id),
+                )
+            else:
+                lower = changed_at > after_at
+            return and_(lower, changed_at <= until)
+
+        def tag(kind: SyncChangeKind):
+            return literal(kind.value, String).label("kind")
+
+        user_conversations = (
+            select(ChatParticipant.conversation_id)
+            .where(ChatParticipant.user_id == user_id)
+            .correlate(None)
+        )
+        changes = union_all(
+            select(
+                ChatParticipant.create_at.label("changed_at"),
+                tag(SyncChangeKind.CONVERSATION),
+                ChatParticipant.conversation_id.label("entity_id"),
+            ).where(
+                ChatParticipant.user_id == user_id,
+                window(
+                    SyncChangeKind.CONVERSATION,
+                    ChatParticipant.create_at,
+                    ChatParticipant.conversation_id,
+                ),
+            ),
+            select(
+                ChatMessage.create_at.label("changed_at"),
+                tag(SyncChangeKind.MESSAGE),
+                ChatMessage.id.label("entity_id"),
+            ).where(
+                ChatMessage.conversation_id.in_(user_conversations),
+                window(SyncChangeKind.MESSAGE, ChatMessage.create_at, ChatMessage.id),
+            ),
+            select(
+                ChatParticipant.updated_at.label("changed_at"),
+                tag(SyncChangeKind.PARTICIPANT),
+                ChatParticipant.id.label("entity_id"),
+            ).where(
+                ChatParticipant.conversation_id.in_(user_conversations),
+                window(
+                    SyncChangeKind.PARTICIPANT,
+                    ChatParticipant.updated_at,
+                    ChatParticipant.id,
+                ),
+            ),
+            # Members who left, seen by those who stay and by the user removed.
+            select(
+                ChatParticipantRemoval.create_at.label("changed_at"),
+                tag(SyncChangeKind.REMOVAL),
+                ChatParticipantRemoval.id.label("entity_id"),
+            ).where(
+                or_(
+                    ChatParticipantRemoval.conversation_id.in_(user_conversations),
+                    ChatParticipantRemoval.user_id == user_id,
+                ),
+                window(
+                    SyncChangeKind.REMOVAL,
+                    ChatParticipantRemoval.create_at,
+                    ChatParticipantRemoval.id,
+                ),
+            ),
+        ).subquery("changes")
+
+        stmt = (
+            select(changes.c.changed_at, changes.c.kind, changes.c.entity_id)
+            .order_by(changes.c.changed_at, changes.c.kind, changes.c.entity_id)
+            .limit(limit + 1)
+        )
+        result = await self.db.execute(stmt)
+        rows = [
+            (changed_at, SyncChangeKind(kind), entity_id)
+            for changed_at, kind, entity_id in result.all()
+        ]
+        return rows[:limit], len(rows) > limit
+
+
+    async def load_removals(self, removal_ids: Sequence[uuid.UUID]) -> list[ChatParticipantRemoval]:
+        if not removal_ids:
+            return []
+        stmt = (
+            select(ChatParticipantRemoval)
+            .where(ChatParticipantRemoval.id.in_(removal_ids))
+            .order_by(ChatParticipantRemoval.create_at.asc(), ChatParticipantRemoval.id.asc())
+        )
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+
+
+    async def load_participants(self, participant_ids: Sequence[uuid.UUID]) -> list[ChatParticipant]:
+        if not participant_ids:
+            return []
+        stmt = (
+            select(ChatParticipant)
+            .where(ChatParticipant.id.in_(participant_ids))
+            .order_by(ChatParticipant.updated_at.asc(), ChatParticipant.id.asc())
+            .options(selectinload(ChatParticipant.user))
+            .execution_options(populate_existing=True)
+        )
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from arq import Retry
+from sqlalchemy import delete, select, update
+
+from src.chat.archive import (
+    add_months,
+    archive_partition,
+    ensure_partitions,
+    list_partitions,
+    month_start,
+)
+from src.chat.models import ChatMessage, ChatMessageKey
+from src.chat.presence import presence_service
+from src.chat.push import (
+    buffer_notifications,
+    collapse_notifications,
+    get_push_provider,
+    pending_key,
+)
+from src.chat.thumbnails import THUMBNAIL_CONTENT_TYPE, render_thumbnails, thumbnail_key
+from src.chat.utils import download_attachment, store_attachment_objects
+from src.core.config import settings
+from src.core.database import SessionLocal
+
+logger = logging.getLogger("chat")
+
+# Attempts while a write-behind message is not yet visible in Postgres.
+THUMBNAIL_MAX_TRIES = 5
+PUSH_MAX_TRIES = 4
+
+
+async def maintain_chat_partitions(ctx) -> dict[str, list[str]]:
+    """Create upcoming `chat_messages` partitions, archive expired ones and
+    prune old message idempotency keys."""
+    now = datetime.now(timezone.utc)
+    cutoff = add_months(month_start(now), -settings.CHAT_ARCHIVE_RETENTION_MONTHS)
+
+    async with SessionLocal() as db:
+        created = await ensure_partitions(db, months_ahead=settings.CHAT_PARTITION_MONTHS_AHEAD, now=now)
+        await db.commit()
+
+        archived: list[str] = []
+        for name, start in await list_partitions(db):
+            if add_months(start, 1) > cutoff:
+                break
+            # One transaction per partition: export, record, detach, drop.
+            await archive_partition(db, name, start)
+            await db.commit()
+            archived.append(name)
+
+        # Idempotency keys only need to outlive client retries.
+        await db.execute(
+            delete(ChatMessageKey).where(
+                ChatMessageKey.create_at
+                < now - timedelta(days=settings.CHAT_MESSAGE_KEY_RETENTION_DAYS)
+            )
+        )
+        await db.commit()
+
+    logger.info(
+        "chat.partitions.maintained",
+        extra={"partitions": created, "archived": archived},
+    )
+    return {"partitions": created, "archived": archived}
+
+
+async def generate_attachment_thumbnails(ctx, message_id: str, created_at: str) -> dict | None:
+    """Render WebP thumbnails and a blurhash for an image attachment.
+
+    The results are stored next to the original object and recorded in
+    `ChatMessage.attachment_metadata`; clients keep using the original until
+    the metadata shows up.
+    """
+    message_key = (uuid.UUID(message_id), datetime.fromisoformat(created_at))
+    async with SessionLocal() as db:
+        message = await db.scalar(
+            select(ChatMessage).where(
+                ChatMessage.id == message_key[0],
+                ChatMessage.create_at == message_key[1],
+            )
+        )
+    if message is None:
+        # Messages sent through the write-behind buffer land a few ms later.
+        if ctx["job_try"] < THUMBNAIL_MAX_TRIES:
+            raise Retry(defer=ctx["job_try"] * 2)
+        logger.warning("chat.thumbnails.message_missing", extra={"message_id": message_id})
+        return None
+    if not (message.attachment_key and (message.attachment_content_type or "").startswith("image/")):
+        return None
+
+    data = await download_attachment(message.attachment_key)
+    if data is None:
+        logger.warning("chat.thumbnails.object_missing", extra={"message_id": message_id})
+        return None
+
+    rendered = await asyncio.to_thread(
+        render_thumbnails,
+        data,
+        settings.CHAT_ATTACHMENT_THUMBNAIL_SIZES,
+    )
+    if rendered is None:
+        logger.info("chat.thumbnails.skipped", extra={"message_id": message_id})
+        return None
+
+    objects = {
+        thumbnail_key(message.attachment_key, size): payload
+        for size, payload in rendered.thumbnails.items()
+    }
+    await store_attachment_objects(objects, THUMBNAIL_CONTENT_TYPE)
+
+    metadata = {
+        "width": rendered.width,
+        "height": rendered.height,
+        "blurhash": rendered.blurhash,
+        "thumbnails": {
+            str(size): thumbnail_key(message.attachment_key, size)
+            for size in rendered.thumbnails
+        },
+    }
+    async with SessionLocal() as db:
+        await db.execute(
+            update(ChatMessage)
+            .where(ChatMessage.id == message_key[0], ChatMessage.create_at == message_key[1])
+            .values(attachment_metadata=metadata)
+        )
+        await db.commit()
+
+    logger.info(
+        "chat.thumbnails.generated",
+        extra={"message_id": message_id, "sizes": sorted(rendered.thumbnails)},
+    )
+    return metadata
+
+
+async def fan_out_push_notifications(ctx, notification: dict, recipient_ids: list[str]) -> int:
+    """Buffer one message's notification for each offline recipient."""
+    online_ids = await presence_service.get_online(uuid.UUID(user_id) for user_id in recipient_ids)
+    offline_ids = [user_id for user_id in recipient_ids if uuid.UUID(user_id) not in online_ids]
+    if offline_ids:
+        await buffer_notifications(ctx["redis"], offline_ids, notification)
+    return len(offline_ids)
+
+
+async def deliver_push_notifications(ctx, user_id: str) -> int:
+    """Collapse and push the notifications buffered for an offline user."""
+    redis = ctx["redis"]
+    key = pending_key(user_id)
+    raw_entries = await redis.lrange(key, 0, -1)
+    if not raw_entries:
+        return 0
+
+    entries = [json.loads(raw) for raw in raw_entries]
+    notifications = collapse_notifications(entries)
+    provider = get_push_provider()
+    started = time.monotonic()
+    try:
+        await provider.send(uuid.UUID(user_id), notifications)
+    except Exception:
+        logger.warning(
+            "chat.push.delivery_failed",
+            exc_info=True,
+            extra={"user_id": user_id, "provider": provider.name, "attempt": ctx["job_try"]},
+        )
+        if ctx["job_try"] < PUSH_MAX_TRIES:
+            raise Retry(defer=ctx["job_try"] * 5)
+        await redis.ltrim(key, len(raw_entries), -1)
+        return 0
+
+    # Entries appended while sending stay queued for the next window's job.
+    await redis.ltrim(key, len(raw_entries), -1)
+    logger.info(
+        "chat.push.delivered",
+        extra={
+            "user_id": user_id,
+            "provider": provider.name,
+            "attempt": ctx["job_try"],
+            "message_count": len(entries),
+            "notification_count": len(notifications),
+            "send_ms": round((time.monotonic() - started) * 1000, 1),
+            "queue_latency_ms": round((time.time() - min(entry["queued_at"] for entry in entries)) * 1000, 1),
+        },
+    )
+    return len(notifications)
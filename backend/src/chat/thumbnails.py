@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+
+import blurhash
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+THUMBNAIL_CONTENT_TYPE = "image/webp"
+BLURHASH_COMPONENTS = (4, 3)
+
+
+@dataclass
+class RenderedImage:
+    width: int
+    height: int
+    blurhash: str | None = None
+    thumbnails: dict[int, bytes] = field(default_factory=dict)
+
+
+def thumbnail_key(attachment_key: str, size: int) -> str:
+    """`chat_attachments/<conv>/<id>.jpg` -> `chat_attachments/<conv>/<id>_w320.webp`."""
+    path = PurePosixPath(attachment_key)
+    return str(path.with_name(f"{path.stem}_w{size}.webp"))
+
+
+def _encode_blurhash(image: Image.Image) -> str:
+    sample = image.convert("RGB")
+    sample.thumbnail((32, 32))
+    pixels = list(sample.getdata())
+    rows = [
+        [list(pixels[y * sample.width + x]) for x in range(sample.width)]
+        for y in range(sample.height)
+    ]
+    return blurhash.encode(rows, *BLURHASH_COMPONENTS)
+
+
+def render_thumbnails(data: bytes, sizes: list[int]) -> RenderedImage | None:
+    """Decode an image and render WebP thumbnails bounded by each size.
+
+    Returns None when the bytes are not an image. Sizes that would not
+    shrink the image are skipped.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            image = ImageOps.exif_transpose(source)
+            image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    rendered = RenderedImage(
+        width=image.width,
+        height=image.height,
+        blurhash=_encode_blurhash(image),
+    )
+    for size in sorted(set(sizes)):
+        if size >= image.width and size >= image.height:
+            continue
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, format="WEBP", quality=80, method=4)
+        rendered.thumbnails[size] = buffer.getvalue()
+    return rendered
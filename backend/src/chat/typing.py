@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from src.chat.manager import manager
+from src.core.config import settings
+
+TypingKey = tuple[uuid.UUID, uuid.UUID]
+
+
+@dataclass
+class _TypingState:
+    last_sent_at: float
+    timer: asyncio.Task[None] | None = field(default=None, repr=False)
+
+
+class TypingThrottle:
+    """Server-side coalescing of typing indicators per (user, conversation).
+
+    The first keystroke is forwarded immediately, further `is_typing=true`
+    events are forwarded at most once per interval as a keep-alive, and a
+    trailing `is_typing=false` is emitted when the client stops or goes idle.
+    Events go to the conversation's topic; nothing here touches the database.
+    """
+
+    def __init__(self, interval_seconds: float, idle_timeout_seconds: float) -> None:
+        self._interval = interval_seconds
+        self._idle_timeout = idle_timeout_seconds
+        self._states: dict[TypingKey, _TypingState] = {}
+
+
+    async def update(self,
+                     user_id: uuid.UUID,
+                     conversation_id: uuid.UUID,
+                     is_typing: bool
+                     ) -> None:
+        key = (user_id, conversation_id)
+        state = self._states.get(key)
+        now = time.monotonic()
+
+        if not is_typing:
+            if state is not None:
+                delay = max(0.0, state.last_sent_at + self._interval - now)
+                self._schedule_stop(key, state, delay)
+            return
+
+        if state is None:
+            state = _TypingState(last_sent_at=now)
+            self._states[key] = state
+            await self._send(key, True)
+        elif now - state.last_sent_at >= self._interval:
+            state.last_sent_at = now
+            await self._send(key, True)
+        self._schedule_stop(key, state, self._idle_timeout)
+
+
+    async def clear_user(self, user_id: uuid.UUID) -> None:
+        keys = [key for key in self._states if key[0] == user_id]
+        for key in keys:
+            await self.clear(*key)
+
+
+    async def clear(self, user_id: uuid.UUID, conversation_id: uuid.UUID) -> None:
+        state = self._states.pop((user_id, conversation_id), None)
+        if state is None:
+            return
+        if state.timer is not None:
+            state.timer.cancel()
+        await self._send((user_id, conversation_id), False)
+
+
+    def _schedule_stop(self, key: TypingKey, state: _TypingState, delay: float) -> None:
+        if state.timer is not None:
+            state.timer.cancel()
+        state.timer = asyncio.create_task(self._stop_after(key, state, delay))
+
+
+    async def _stop_after(self, key: TypingKey, state: _TypingState, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if self._states.get(key) is not state:
+            return
+        self._states.pop(key, None)
+        await self._send(key, False)
+
+
+    async def _send(self, key: TypingKey, is_typing: bool) -> None:
+        user_id, conversation_id = key
+        await manager.publish(
+            conversation_id,
+            {
+                "type": "typing",
+                "data": {
+                    "conversation_id": str(conversation_id),
+                    "user_id": str(user_id),
+                    "is_typing": is_typing,
+                },
+            },
+            exclude=user_id,
+        )
+
+
+typing_throttle = TypingThrottle(
+    interval_seconds=settings.CHAT_TYPING_INTERVAL_MS / 1000,
+    idle_timeout_seconds=settings.CHAT_TYPING_IDLE_TIMEOUT_MS / 1000,
+)
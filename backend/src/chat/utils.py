@@ -1,15 +1,18 @@
 from __future__ import annotations
 
+import base64
+from collections.abc import Iterable
+from datetime import datetime
 from pathlib import Path
 from uuid import UUID, uuid4
 
 from aiobotocore.session import get_session
 from botocore.exceptions import ClientError
 
+from src.chat.exceptions import InvalidCursor
 from src.core.config import settings
 
 CHAT_ATTACHMENT_ROOT = "chat_attachments"
-DEFAULT_CONTENT_TYPE = "application/octet-stream"
 
 
 def build_chat_attachment_key(conversation_id: UUID, original_filename: str | None) -> str:
@@ -18,11 +21,58 @@ def build_chat_attachment_key(conversation_id: UUID, original_filename: str | No
     return f"{CHAT_ATTACHMENT_ROOT}/{conversation_id}/{unique_part}{suffix}"
 
 
-async def upload_attachment_to_s3(
-    data: bytes,
+def attachment_key_belongs_to(key: str, conversation_id: UUID) -> bool:
+    prefix = f"{CHAT_ATTACHMENT_ROOT}/{conversation_id}/"
+    return key.startswith(prefix) and "/" not in key[len(prefix):]
+
+
+async def generate_attachment_upload(
     key: str,
-    content_type: str | None,
-) -> str | None:
+    content_type: str,
+    max_bytes: int,
+    expires_in: int,
+) -> dict:
+    """Presigned POST policy: S3 itself enforces key, type and size."""
+    session = get_session()
+    async with session.create_client(
+        "s3",
+        region_name=settings.AWS_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+    ) as client:
+        return await client.generate_presigned_post(
+            Bucket=settings.S3_BUCKET,
+            Key=key,
+            Fields={
+                "Content-Type": content_type,
+                "Content-Disposition": "attachment",
+            },
+            Conditions=[
+                {"Content-Type": content_type},
+                {"Content-Disposition": "attachment"},
+                ["content-length-range", 1, max_bytes],
+            ],
+            ExpiresIn=expires_in,
+        )
+
+
+async def head_attachment(key: str) -> tuple[int, str | None] | None:
+    """(size, content type) of an uploaded attachment, or None if missing."""
+    session = get_session()
+    async with session.create_client(
+        "s3",
+        region_name=settings.AWS_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+    ) as client:
+        try:
+            response = await client.head_object(Bucket=settings.S3_BUCKET, Key=key)
+        except ClientError:
+            return None
+    return response["ContentLength"], response.get("ContentType")
+
+
+async def download_attachment(key: str) -> bytes | None:
     session = get_session()
     async with session.create_client(
         "s3",
@@ -31,20 +81,44 @@ async def upload_attachment_to_s3(
         aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
     ) as client:
         try:
-            await client.head_bucket(Bucket=settings.S3_BUCKET)
+            response = await client.get_object(Bucket=settings.S3_BUCKET, Key=key)
+        except ClientError:
+            return None
+        async with response["Body"] as body:
+            return await body.read()
+
+
+async def store_attachment_objects(objects: dict[str, bytes], content_type: str) -> None:
+    session = get_session()
+    async with session.create_client(
+        "s3",
+        region_name=settings.AWS_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+    ) as client:
+        for key, data in objects.items():
             await client.put_object(
                 Bucket=settings.S3_BUCKET,
                 Key=key,
                 Body=data,
-                ContentType=content_type or DEFAULT_CONTENT_TYPE,
-                ContentDisposition="attachment",
+                ContentType=content_type,
             )
-            return key
-        except ClientError:
-            return None
 
 
 async def generate_attachment_url(key: str, expires_in: int = 3600) -> str | None:
+    urls = await generate_attachment_urls([key], expires_in=expires_in)
+    return urls.get(key)
+
+
+async def generate_attachment_urls(
+    keys: Iterable[str],
+    expires_in: int = 3600,
+) -> dict[str, str | None]:
+    unique_keys = {key for key in keys if key}
+    if not unique_keys:
+        return {}
+
+    urls: dict[str, str | None] = {}
     session = get_session()
     async with session.create_client(
         "s3",
@@ -52,15 +126,54 @@ async def generate_attachment_url(key: str, expires_in: int = 3600) -> str | Non
         aws_access_key_id=settings.AWS_ACCESS_KEY,
         aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
     ) as client:
-        try:
-            url = await client.generate_presigned_url(
-                ClientMethod="get_object",
-                Params={
-                    "Bucket": settings.S3_BUCKET,
-                    "Key": key,
-                },
-                ExpiresIn=expires_in,
-            )
-            return url
-        except ClientError:
-            return None
\ No newline at end of file
+        for key in unique_keys:
+            try:
+                urls[key] = await client.generate_presigned_url(
+                    ClientMethod="get_object",
+                    Params={
+                        "Bucket": settings.S3_BUCKET,
+                        "Key": key,
+                    },
+                    ExpiresIn=expires_in,
+                )
+            except ClientError:
+                urls[key] = None
+    return urls
+
+
+def encode_cursor(timestamp: datetime, item_id: UUID, direction: str | None = None) -> str:
+    parts = [timestamp.isoformat(), str(item_id)]
+    if direction:
+        parts.insert(0, direction)
+    raw = "|".join(parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor_parts(cursor: str) -> list[str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor()
+
+
+def _parse_cursor_position(timestamp_raw: str, id_raw: str) -> tuple[datetime, UUID]:
+    try:
+        return datetime.fromisoformat(timestamp_raw), UUID(id_raw)
+    except ValueError:
+        raise InvalidCursor()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    parts = _decode_cursor_parts(cursor)
+    if len(parts) != 2:
+        raise InvalidCursor()
+    return _parse_cursor_position(*parts)
+
+
+def decode_directional_cursor(cursor: str) -> tuple[str, datetime, UUID]:
+    parts = _decode_cursor_parts(cursor)
+    if len(parts) != 3:
+        raise InvalidCursor()
+    direction, timestamp_raw, id_raw = parts
+    return direction, *_parse_cursor_position(timestamp_raw, id_raw)
@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Any
+
+from redis.exceptions import RedisError
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from src.chat.exceptions import MessageBacklogFull
+from src.chat.models import ChatConversation, ChatMessage
+from src.chat.services import ChatService
+from src.core.base_model import time_now
+from src.core.config import settings
+from src.core.database import SessionLocal
+
+logger = logging.getLogger("chat")
+
+_UUID_FIELDS = ("id", "conversation_id", "sender_id")
+_DATETIME_FIELDS = ("create_at", "updated_at")
+
+# Postgres rejected the row itself (FK to a deleted conversation, missing
+# partition, oversized value); retrying it can never succeed.
+_ROW_ERRORS = (IntegrityError, DataError)
+
+BufferedRow = tuple[str | None, dict[str, Any]]
+
+
+# INCR the conversation's seq counter, seeding it from Postgres (ARGV[1]) when
+# the key is missing. Returns nil if the key is missing and no seed was given.
+_NEXT_SEQ_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    if ARGV[1] == '' then
+        return false
+    end
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return redis.call('INCR', KEYS[1])
+"""
+
+
+def encode_message_row(row: dict[str, Any]) -> str:
+    encoded = dict(row)
+    for name in _UUID_FIELDS:
+        encoded[name] = str(row[name])
+    for name in _DATETIME_FIELDS:
+        encoded[name] = row[name].isoformat()
+    return json.dumps(encoded)
+
+
+def decode_message_row(raw: str | bytes) -> dict[str, Any]:
+    row = json.loads(raw)
+    for name in _UUID_FIELDS:
+        row[name] = uuid.UUID(row[name])
+    for name in _DATETIME_FIELDS:
+        row[name] = datetime.fromisoformat(row[name])
+    return row
+
+
+class MessageWriteBehind:
+    """Group-commits chat messages off the send path.
+
+    Messages get their id and timestamp up front, are broadcast immediately
+    and are bulk-inserted every `flush_interval`. With Redis attached each
+    row is first appended to a stream, so a crashed worker's backlog is
+    replayed on the next startup. Inserts are idempotent on the message id;
+    client idempotency keys are claimed in Postgres by the caller before
+    `submit`, so a retry never reaches the buffer twice.
+
+    `seq` must be known before the broadcast, so it is handed out by a Redis
+    counter per conversation (seeded from `last_seq`), or by a short
+    `last_seq` UPDATE when no Redis client is attached.
+
+    A batch Postgres rejects is bisected until the offending rows are
+    isolated; those go to a dead-letter stream and the rest are written.
+    Other failures (database down) keep the batch buffered for a retry, and
+    new sends are refused with 503 once `max_buffer` rows are waiting.
+    """
+
+    SEQ_KEY_PREFIX = "chat:seq:"
+    SEQ_KEY_TTL_SECONDS = 24 * 60 * 60
+    DEAD_LETTER_MAXLEN = 10_000
+
+    def __init__(self,
+                 *,
+                 enabled: bool,
+                 flush_interval: float,
+                 max_batch: int,
+                 max_buffer: int,
+                 stream_key: str
+                 ) -> None:
+        self.enabled = enabled
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._max_buffer = max_buffer
+        self._stream_key = stream_key
+        self._dead_letter_key = f"{stream_key}:dead"
+        self._buffer: list[BufferedRow] = []
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task[None] | None = None
+        self._redis: Any | None = None
+        self._next_seq_script: Any | None = None
+
+
+    def attach_redis(self, redis_client: Any) -> None:
+        self._redis = redis_client
+        self._next_seq_script = redis_client.register_script(_NEXT_SEQ_SCRIPT)
+
+
+    async def _next_seq(self, conversation_id: uuid.UUID, sent_at: datetime) -> int:
+        if self._redis is None:
+            async with SessionLocal() as db:
+                seq = await ChatService(db).allocate_seq(conversation_id, sent_at=sent_at)
+                await db.commit()
+            return seq
+
+        key = f"{self.SEQ_KEY_PREFIX}{conversation_id}"
+        seq = await self._next_seq_script(keys=[key], args=["", self.SEQ_KEY_TTL_SECONDS])
+        if seq is None:
+            async with SessionLocal() as db:
+                last_seq = await ChatService(db).get_last_seq(conversation_id)
+            seq = await self._next_seq_script(
+                keys=[key],
+                args=[last_seq, self.SEQ_KEY_TTL_SECONDS],
+            )
+        return int(seq)
+
+
+    async def submit(self,
+                     conversation_id: uuid.UUID,
+                     sender_id: uuid.UUID,
+                     *,
+                     content: str | None,
+                     attachment_name: str | None = None,
+                     attachment_key: str | None = None,
+                     attachment_content_type: str | None = None,
+                     attachment_size: int | None = None,
+                     message_id: uuid.UUID | None = None,
+                     sent_at: datetime | None = None
+                     ) -> ChatMessage:
+        if len(self._buffer) >= self._max_buffer:
+            logger.warning("chat.write_behind.backlog_full", extra={"message_count": len(self._buffer)})
+            raise MessageBacklogFull()
+
+        now = sent_at or time_now()
+        row = {
+            "id": message_id or uuid.uuid4(),
+            "conversation_id": conversation_id,
+            "sender_id": sender_id,
+            "seq": await self._next_seq(conversation_id, now),
+            "content": content,
+            "attachment_name": attachment_name,
+            "attachment_key": attachment_key,
+            "attachment_content_type": attachment_content_type,
+            "attachment_size": attachment_size,
+            "create_at": now,
+            "updated_at": now,
+        }
+        entry_id = None
+        if self._redis is not None:
+            try:
+                entry_id = await self._redis.xadd(self._stream_key, {"row": encode_message_row(row)})
+            except RedisError:
+                logger.warning(
+                    "chat.write_behind.stream_unavailable",
+                    extra={"message_id": str(row["id"])},
+                )
+
+        async with self._lock:
+            self._buffer.append((entry_id, row))
+            if len(self._buffer) >= self._max_batch:
+                self._schedule(0)
+            elif self._flush_task is None:
+                self._schedule(self._flush_interval)
+
+        # Transient instance: serialized and broadcast, never added to a session.
+        return ChatMessage(**row)
+
+
+    def _schedule(self, delay: float) -> None:
+        if self._flush_task is not None and delay > 0:
+            return
+        self._flush_task = asyncio.create_task(self._flush_later(delay))
+
+
+    async def _flush_later(self, delay: float) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        await self._flush()
+
+
+    async def _flush(self) -> bool:
+        async with self._lock:
+            if asyncio.current_task() is self._flush_task:
+                self._flush_task = None
+            batch = self._buffer[: self._max_batch]
+            del self._buffer[: self._max_batch]
+            if self._buffer:
+                self._schedule(0)
+        if not batch:
+            return True
+
+        try:
+            rejected = await self._write_isolating(batch)
+        except Exception:
+            logger.exception(
+                "chat.write_behind.flush_failed",
+                extra={"message_count": len(batch)},
+            )
+            async with self._lock:
+                self._buffer[:0] = batch
+                self._schedule(max(self._flush_interval, 1.0))
+            return False
+
+        await self._dead_letter(rejected)
+        await self._ack([entry_id for entry_id, _ in batch if entry_id is not None])
+        return True
+
+
+    async def _write_isolating(self,
+                               batch: list[BufferedRow]
+                               ) -> list[tuple[BufferedRow, Exception]]:
+        """Write `batch`, bisecting around rows Postgres rejects.
+
+        Returns the rejected rows. Any other error propagates so the caller
+        retries; halves already committed are skipped by the idempotent insert.
+        """
+        try:
+            await self._write([row for _, row in batch])
+            return []
+        except _ROW_ERRORS as exc:
+            if len(batch) == 1:
+                return [(batch[0], exc)]
+        middle = len(batch) // 2
+        return [
+            *await self._write_isolating(batch[:middle]),
+            *await self._write_isolating(batch[middle:]),
+        ]
+
+
+    async def _dead_letter(self, rejected: list[tuple[BufferedRow, Exception]]) -> None:
+        for (_, row), exc in rejected:
+            error = str(getattr(exc, "orig", exc))
+            logger.error(
+                "chat.write_behind.row_rejected",
+                extra={
+                    "message_id": str(row["id"]),
+                    "conversation_id": str(row["conversation_id"]),
+                    "error": error,
+                },
+            )
+            if self._redis is None:
+                continue
+            try:
+                await self._redis.xadd(
+                    self._dead_letter_key,
+                    {"row": encode_message_row(row), "error": error[:1000]},
+                    maxlen=self.DEAD_LETTER_MAXLEN,
+                    approximate=True,
+                )
+            except RedisError:
+                logger.warning("chat.write_behind.stream_unavailable")
+
+
+    async def _write(self, rows: list[dict[str, Any]]) -> None:
+        message_rows: list[dict[str, Any]] = []
+        latest_by_conversation: dict[uuid.UUID, tuple[datetime, int]] = {}
+        for row in rows:
+            row = dict(row)
+            # Stream entries written before keys were claimed up front.
+            row.pop("client_message_id", None)
+            message_rows.append(row)
+
+            latest_at, latest_seq = latest_by_conversation.get(
+                row["conversation_id"],
+                (row["create_at"], row["seq"]),
+            )
+            latest_by_conversation[row["conversation_id"]] = (
+                max(latest_at, row["create_at"]),
+                max(latest_seq, row["seq"]),
+            )
+
+        conversations = ChatConversation.__table__
+        async with SessionLocal() as db:
+            await db.execute(insert(ChatMessage).on_conflict_do_nothing(), message_rows)
+            await db.execute(
+                update(conversations)
+                .where(conversations.c.id == bindparam("conversation_key"))
+                .values(
+                    last_message_at=func.greatest(
+                        conversations.c.last_message_at,
+                        bindparam("latest_at"),
+                    ),
+                    last_seq=func.greatest(conversations.c.last_seq, bindparam("latest_seq")),
+                ),
+                [
+                    {
+                        "conversation_key": conversation_id,
+                        "latest_at": latest_at,
+                        "latest_seq": latest_seq,
+                    }
+                    for conversation_id, (latest_at, latest_seq)
+                    in latest_by_conversation.items()
+                ],
+            )
+            await db.commit()
+
+
+    async def _ack(self, entry_ids: list[str]) -> None:
+        if not entry_ids or self._redis is None:
+            return
+        try:
+            await self._redis.xdel(self._stream_key, *entry_ids)
+        except RedisError:
+            # Rows are already committed; a later replay skips them.
+            logger.warning("chat.write_behind.stream_unavailable")
+
+
+    async def replay(self) -> int:
+        """Persist entries left in the stream by a worker that did not drain."""
+        if self._redis is None:
+            return 0
+
+        replayed = 0
+        start = "-"
+        while True:
+            try:
+                entries = await self._redis.xrange(self._stream_key, min=start, count=self._max_batch)
+            except RedisError:
+                logger.warning("chat.write_behind.stream_unavailable")
+                break
+            if not entries:
+                break
+
+            batch: list[BufferedRow] = []
+            for entry_id, fields in entries:
+                try:
+                    batch.append((entry_id, decode_message_row(fields["row"])))
+                except (KeyError, TypeError, ValueError):
+                    logger.error("chat.write_behind.entry_malformed", extra={"entry_id": entry_id})
+                    try:
+                        await self._redis.xadd(
+                            self._dead_letter_key,
+                            {**fields, "error": "malformed entry"},
+                            maxlen=self.DEAD_LETTER_MAXLEN,
+                            approximate=True,
+                        )
+                    except RedisError:
+                        logger.warning("chat.write_behind.stream_unavailable")
+            try:
+                rejected = await self._write_isolating(batch)
+            except Exception:
+                # Leave the rest in the stream for the next startup rather
+                # than keeping this worker from starting.
+                logger.exception(
+                    "chat.write_behind.replay_failed",
+                    extra={"message_count": len(entries)},
+                )
+                break
+            await self._dead_letter(rejected)
+            await self._ack([entry_id for entry_id, _ in entries])
+            replayed += len(entries)
+            start = f"({entries[-1][0]}"
+
+        if replayed:
+            logger.info("chat.write_behind.replayed", extra={"message_count": replayed})
+        return replayed
+
+
+    async def drain(self) -> None:
+        while self._buffer:
+            if not await self._flush():
+                break
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+
+
+message_write_behind = MessageWriteBehind(
+    enabled=settings.CHAT_WRITE_BEHIND_ENABLED,
+    flush_interval=settings.CHAT_WRITE_BEHIND_FLUSH_MS / 1000,
+    max_batch=settings.CHAT_WRITE_BEHIND_MAX_BATCH,
+    max_buffer=settings.CHAT_WRITE_BEHIND_MAX_BUFFER,
+    stream_key=settings.CHAT_WRITE_BEHIND_STREAM,
+)
@@ -2,6 +2,13 @@ from arq import cron
 from arq.connections import RedisSettings
 
 from src.auth.utils import send_reset_email
+from src.chat.presence import presence_service
+from src.chat.tasks import (
+    deliver_push_notifications,
+    fan_out_push_notifications,
+    generate_attachment_thumbnails,
+    maintain_chat_partitions,
+)
 from src.core.config import settings
 
 
@@ -19,10 +26,25 @@ def _get_redis_settings() -> RedisSettings:
         )
 
 
+async def startup(ctx) -> None:
+    """Đọc trạng thái online (presence) từ Redis khi gửi push"""
+    presence_service.attach_redis(ctx["redis"])
+
+
 class WorkerSettings:
     functions = {
         send_reset_email,
+        generate_attachment_thumbnails,
+        fan_out_push_notifications,
+        deliver_push_notifications,
     }
+
+    # Tạo trước partition tin nhắn theo tháng và lưu trữ các partition cũ lên S3
+    cron_jobs = [
+        cron(maintain_chat_partitions, hour={2}, minute={30}, run_at_startup=True),
+    ]
     
+    on_startup = startup
+
     # ARQ yêu cầu redis_settings phải là class attribute, không phải property
     redis_settings = _get_redis_settings()
\ No newline at end of file
@@ -16,6 +16,7 @@ class Settings(BaseSettings):
     # ─────────────── App & Env ───────────────
     APP_KEY: str
     ENVIRONMENT: Environment = Environment.LOCAL
+    METRICS_TOKEN: str | None = None  # Bearer token cho GET /metrics; để trống thì tắt endpoint
 
     # ─────────────── Database ───────────────
     # Railway chỉ cần 1 URL; local có thể dùng các field bên dưới
@@ -90,8 +91,48 @@ class Settings(BaseSettings):
         "application/msword",
         "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
     ]
+    CHAT_ATTACHMENT_UPLOAD_EXPIRES_SECONDS: int = 15 * 60
+    CHAT_ATTACHMENT_THUMBNAIL_SIZES: list[int] = [320, 960]
     CHAT_RATE_LIMIT_MAX_EVENTS: int = 30
     CHAT_RATE_LIMIT_WINDOW_SECONDS: int = 10
+    CHAT_ACK_COALESCE_WINDOW_MS: int = 250
+    CHAT_TYPING_INTERVAL_MS: int = 3000
+    CHAT_TYPING_IDLE_TIMEOUT_MS: int = 5000
+    CHAT_WS_HEARTBEAT_INTERVAL_SECONDS: int = 25
+    CHAT_WS_IDLE_TIMEOUT_SECONDS: int = 60
+    CHAT_WS_MAX_CONNECTIONS_PER_USER: int = 5
+    CHAT_WS_MAX_CONNECTIONS_PER_WORKER: int = 10_000
+    CHAT_PRESENCE_TTL_SECONDS: int = 60
+    CHAT_GROUP_MAX_MEMBERS: int = 300
+    CHAT_MODERATION_RELOAD_INTERVAL_SECONDS: int = 30
+    CHAT_PUSH_PROVIDER: str = "log"  # "log" (stub) hoặc "webhook"
+    CHAT_PUSH_WEBHOOK_URL: str | None = None
+    CHAT_PUSH_WEBHOOK_TOKEN: str | None = None
+    CHAT_PUSH_BATCH_WINDOW_SECONDS: int = 5
+    CHAT_PUSH_PENDING_TTL_SECONDS: int = 60 * 60
+    CHAT_MEMBERSHIP_CACHE_SIZE: int = 10_000
+    CHAT_MEMBERSHIP_CACHE_TTL_SECONDS: int = 60
+    CHAT_MEMBERSHIP_CACHE_REDIS_ENABLED: bool = False
+    CHAT_MEMBERSHIP_CACHE_REDIS_TTL_SECONDS: int = 60 * 60
+    CHAT_CONTACT_CACHE_SIZE: int = 50_000
+    CHAT_CONTACT_CACHE_TTL_SECONDS: int = 10 * 60
+    CHAT_WRITE_BEHIND_ENABLED: bool = False
+    CHAT_WRITE_BEHIND_FLUSH_MS: int = 10
+    CHAT_WRITE_BEHIND_MAX_BATCH: int = 500
+    CHAT_WRITE_BEHIND_STREAM: str = "chat:messages:pending"
+    CHAT_WRITE_BEHIND_MAX_BUFFER: int = 10_000  # tin chờ ghi tối đa mỗi worker, quá thì trả 503
+    CHAT_SYNC_SETTLE_MS: int = 2000
+    CHAT_MESSAGE_KEY_CACHE_TTL_SECONDS: int = 10 * 60
+    CHAT_MESSAGE_KEY_RETENTION_DAYS: int = 7
+    CHAT_PARTITION_MONTHS_AHEAD: int = 3
+    CHAT_ARCHIVE_RETENTION_MONTHS: int = 12
+    CHAT_ARCHIVE_CACHE_MAX_ROWS: int = 200_000  # cache tin đã lưu trữ (đọc từ S3) mỗi worker
+
+    # ─────────────── Rate limit ───────────────
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 100_000  # fallback khi Redis không khả dụng
+    TRUSTED_PROXY_HOPS: int = 0  # số proxy tin cậy phía trước app (Railway: 1); IP client lấy từ X-Forwarded-For
+    AUTH_LOGIN_RATE_LIMIT_MAX_EVENTS: int = 10
+    AUTH_LOGIN_RATE_LIMIT_WINDOW_SECONDS: int = 60
 
     # ─────────────── Database pool ───────────────
     DATABASE_POOL_SIZE: int = 16
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sess
 
 from src.core.config import settings
 from src.core.constants import DB_NAMING_CONVENTION
+from src.core.metrics import instrument_engine
 
 DATABASE_URL = str(settings.ASYNC_DATABASE_URI)
 
@@ -14,6 +15,8 @@ engine = create_async_engine(
     pool_recycle=settings.DATABASE_POOL_TTL,
     pool_pre_ping=settings.DATABASE_POOL_PRE_PING
 )
+# Query time per chat event (src.chat.metrics); no-op outside a timed block
+instrument_engine(engine.sync_engine)
 
 metadata = MetaData(naming_convention=DB_NAMING_CONVENTION)
 
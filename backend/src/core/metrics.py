@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class QueryTimer:
+    seconds: float = 0.0
+    count: int = 0
+
+
+_query_timer: ContextVar[QueryTimer | None] = ContextVar("query_timer", default=None)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Add each query's wall time to the `QueryTimer` active in the caller's context.
+
+    Costs one context lookup per query when no timer is active. SQLAlchemy
+    runs async engine hooks in the calling task's context, so the timer
+    follows the coroutine that issued the query.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if _query_timer.get() is not None:
+            conn.info["query_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        started_at = conn.info.pop("query_started_at", None)
+        timer = _query_timer.get()
+        if timer is None or started_at is None:
+            return
+        timer.seconds += time.perf_counter() - started_at
+        timer.count += 1
+
+
+@contextmanager
+def time_queries() -> Iterator[QueryTimer]:
+    """Accumulate the time of every query issued inside the block."""
+    timer = QueryTimer()
+    token = _query_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _query_timer.reset(token)
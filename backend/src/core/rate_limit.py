@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Literal
+
+from fastapi import Depends, Request
+from redis.exceptions import RedisError
+
+from src.auth.dependencies import get_current_user
+from src.core.config import settings
+from src.core.exceptions import TooManyRequests
+from src.user.models import User
+
+logger = logging.getLogger("rate_limit")
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """`limit` requests per `period_seconds`, all of which may arrive as a burst."""
+
+    name: str
+    limit: int
+    period_seconds: float
+
+    @property
+    def emission_interval_ms(self) -> int:
+        return max(int(self.period_seconds * 1000 / self.limit), 1)
+
+    @property
+    def tolerance_ms(self) -> int:
+        return self.emission_interval_ms * (self.limit - 1)
+
+
+# GCRA: one key per (policy, subject) holding the theoretical arrival time in
+# ms. Returns 0 when allowed, otherwise the ms to wait. Uses the Redis clock so
+# workers with skewed clocks agree, and the key expires once it is back to idle.
+_GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local allow_at = tat - tolerance
+if now < allow_at then
+    return allow_at - now
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return 0
+"""
+
+
+class RateLimiter:
+    """GCRA limiter shared by all workers through Redis.
+
+    Falls back to an in-process GCRA with a bounded key table when no Redis
+    client is attached or Redis is unreachable; limits are then per worker.
+    """
+
+    KEY_PREFIX = "ratelimit:"
+
+    def __init__(self, max_local_keys: int) -> None:
+        self._max_local_keys = max_local_keys
+        self._local: OrderedDict[str, float] = OrderedDict()
+        self._redis: Any | None = None
+        self._script: Any | None = None
+
+
+    def attach_redis(self, redis_client: Any) -> None:
+        self._redis = redis_client
+        self._script = redis_client.register_script(_GCRA_SCRIPT)
+
+
+    async def acquire(self, policy: RateLimitPolicy, subject: str) -> float:
+        """Record one request; returns 0 if allowed, else seconds to wait."""
+        key = f"{self.KEY_PREFIX}{policy.name}:{subject}"
+        if self._script is not None:
+            try:
+                wait_ms = await self._script(
+                    keys=[key],
+                    args=[policy.emission_interval_ms, policy.tolerance_ms],
+                )
+                return int(wait_ms) / 1000
+            except RedisError:
+                logger.warning("rate_limit.redis_unavailable", extra={"policy": policy.name})
+        return self._acquire_local(policy, key)
+
+
+    def _acquire_local(self, policy: RateLimitPolicy, key: str) -> float:
+        now = time.monotonic() * 1000
+        tat = max(self._local.get(key, now), now)
+        allow_at = tat - policy.tolerance_ms
+        if now < allow_at:
+            return (allow_at - now) / 1000
+
+        self._local[key] = tat + policy.emission_interval_ms
+        self._local.move_to_end(key)
+        while len(self._local) > self._max_local_keys:
+            # Oldest-touched entries are the likeliest to be idle already.
+            self._local.popitem(last=False)
+        return 0.0
+
+
+    async def reset(self, policy: RateLimitPolicy, subject: str) -> None:
+        key = f"{self.KEY_PREFIX}{policy.name}:{subject}"
+        self._local.pop(key, None)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(key)
+        except RedisError:
+            logger.warning("rate_limit.redis_unavailable", extra={"policy": policy.name})
+
+
+def retry_after_seconds(wait: float) -> int:
+    return max(math.ceil(wait), 1)
+
+
+rate_limiter = RateLimiter(max_local_keys=settings.RATE_LIMIT_LOCAL_MAX_KEYS)
+
+
+def _client_ip(request: Request) -> str:
+    """The address that reached our first trusted proxy.
+
+    Each proxy appends the peer it saw to `X-Forwarded-For`, so the entry
+    `TRUSTED_PROXY_HOPS` from the right is the client; anything further left
+    is whatever the client chose to send.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops > 0:
+        forwarded = [
+            host.strip()
+            for header in request.headers.getlist("x-forwarded-for")
+            for host in header.split(",")
+            if host.strip()
+        ]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit(policy: RateLimitPolicy,
+               *,
+               by: Literal["user", "ip"] = "user"
+               ) -> Callable[..., Any]:
+    """Route dependency enforcing `policy` per authenticated user or client IP.
+
+        @router.post("/login", dependencies=[Depends(rate_limit(LOGIN_POLICY, by="ip"))])
+    """
+    if by == "ip":
+        async def limit_by_ip(request: Request) -> None:
+            wait = await rate_limiter.acquire(policy, _client_ip(request))
+            if wait:
+                raise TooManyRequests(retry_after_seconds(wait))
+
+        return limit_by_ip
+
+    async def limit_by_user(current_user: User = Depends(get_current_user)) -> None:
+        wait = await rate_limiter.acquire(policy, str(current_user.id))
+        if wait:
+            raise TooManyRequests(retry_after_seconds(wait))
+
+    return limit_by_user
@@ -64,6 +64,7 @@ from src.lawyer.utils import (
     upload_file_to_s3,
 )
 from src.booking.utils import calculate_lawyer_rating
+from src.chat.presence import presence_service
 from src.user.constants import (
     UserRole,
     ALLOWED_AVATAR_CONTENT_TYPES,
@@ -189,10 +190,13 @@ async def _store_avatar_and_get_key(current_user: User, avatar: UploadFile) -> s
 
 async def _build_profile_response(db: SessionDep,
                                   profile: LawyerProfile, 
-                                  user: User
+                                  user: User,
+                                  is_online: bool | None = None
                                   ) -> LawyerProfileResponse:
     
     rating = await calculate_lawyer_rating(db, profile.user_id)
+    if is_online is None:
+        is_online = user.id in await presence_service.get_online([user.id])
 
     return LawyerProfileResponse(
         id = profile.id,
@@ -208,6 +212,7 @@ async def _build_profile_response(db: SessionDep,
         current_level = profile.current_level,
         years_of_experience = profile.years_of_experience,
         average_rating = rating,
+        is_online = is_online,
         create_at = profile.create_at,
         updated_at = profile.updated_at,
     )
@@ -569,10 +574,14 @@ async def list_lawyer_profiles(db: SessionDep,
 
     records = result.all()
 
+    online_ids = await presence_service.get_online(user.id for _, user in records)
+
     profiles: list[LawyerProfileResponse] = []
     updated = False
     for profile, user in records:
-        profiles.append(await _build_profile_response(db, profile, user))
+        profiles.append(
+            await _build_profile_response(db, profile, user, user.id in online_ids)
+        )
 
     profiles.sort(
         key=lambda item: (
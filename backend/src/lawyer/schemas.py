@@ -73,6 +73,7 @@ class LawyerProfileResponse(BaseModel):
     current_level: str | None
     years_of_experience: int
     average_rating: float | None = Field(default=None)
+    is_online: bool = False
     create_at: datetime
     updated_at: datetime
 
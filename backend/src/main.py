@@ -1,8 +1,10 @@
 import fastapi
+import secrets
 import subprocess
 from contextlib import asynccontextmanager
 from pathlib import Path
 from arq.connections import create_pool, RedisSettings
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from sqlalchemy.future import select
 from starlette.middleware.cors import CORSMiddleware
 
@@ -15,6 +17,15 @@ from src.user.models import User
 from src.user.router import user_route
 from src.lawyer.router import lawyer_route
 from src.chat.router import chat_route
+from src.chat.acks import ack_coalescer
+from src.chat.cache import contact_cache, conversation_cache, membership_cache
+from src.chat.dedupe import message_key_cache
+from src.chat.manager import manager
+from src.chat.membership import membership_broadcast
+from src.chat.moderation import moderation_engine
+from src.chat.presence import presence_service
+from src.chat.write_behind import message_write_behind
+from src.core.rate_limit import rate_limiter
 from src.legal_ai.router import legal_ai_route
 from src.documentation.router import documentation_route
 from src.booking.router import booking_route
@@ -90,6 +101,32 @@ async def lifespan(_app: fastapi.FastAPI):
         _app.state.redis_client = Redis(**redis_kwargs)
 
     _app.state.arq_pool = await create_pool(redis_settings)
+    # Rate limit dùng chung giữa các worker; tự chuyển về bộ đếm cục bộ khi Redis lỗi
+    rate_limiter.attach_redis(_app.state.redis_client)
+    # Cache khóa idempotency của tin nhắn để lần gửi lại không chạm Postgres
+    message_key_cache.attach_redis(_app.state.redis_client)
+    if settings.CHAT_MEMBERSHIP_CACHE_REDIS_ENABLED:
+        # Chia sẻ cache thành viên hội thoại giữa các worker
+        membership_cache.attach_redis(_app.state.redis_client)
+        contact_cache.attach_redis(_app.state.redis_client)
+        conversation_cache.attach_redis(_app.state.redis_client)
+    if settings.CHAT_WRITE_BEHIND_ENABLED:
+        # Ghi tin nhắn theo lô; phát lại các bản ghi còn sót trong stream
+        message_write_behind.attach_redis(_app.state.redis_client)
+        await message_write_behind.replay()
+
+    # Ping WebSocket định kỳ và đóng các kết nối không còn phản hồi
+    manager.start_heartbeat()
+    # Trạng thái online dùng chung giữa các worker (key Redis có TTL, gia hạn định kỳ)
+    presence_service.attach_redis(_app.state.redis_client)
+    presence_service.start()
+    # Báo thay đổi thành viên hội thoại cho các worker khác (Redis pub/sub)
+    membership_broadcast.attach_redis(_app.state.redis_client)
+    membership_broadcast.start()
+    # Luật kiểm duyệt nội dung chat: nạp từ DB, tự nạp lại khi admin thay đổi
+    moderation_engine.attach_redis(_app.state.redis_client)
+    await moderation_engine.load()
+    moderation_engine.start()
 
     # 👑 2. Tạo admin mặc định
     await create_admin()
@@ -118,6 +155,12 @@ async def lifespan(_app: fastapi.FastAPI):
     try:
         yield
     finally:
+        await manager.stop_heartbeat()
+        await presence_service.stop()
+        await membership_broadcast.stop()
+        await moderation_engine.stop()
+        await message_write_behind.drain()
+        await ack_coalescer.drain()
         await _app.state.arq_pool.close()
         await _app.state.redis_client.close()
 
@@ -143,3 +186,15 @@ app.include_router(chat_route)
 app.include_router(legal_ai_route)
 app.include_router(booking_route)
 app.include_router(documentation_route)
+
+
+# 📈 Prometheus metrics của worker này (socket chat, event, fan-out, thời gian DB)
+# Chỉ bật khi có METRICS_TOKEN; Prometheus gửi kèm "Authorization: Bearer <token>"
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: str | None = fastapi.Header(default=None)) -> fastapi.Response:
+    if not settings.METRICS_TOKEN:
+        raise fastapi.HTTPException(status_code=404)
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if authorization is None or not secrets.compare_digest(authorization.encode(), expected.encode()):
+        raise fastapi.HTTPException(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return fastapi.Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
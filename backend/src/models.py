@@ -9,7 +9,10 @@ from src.chat.models import  (
     ChatConversation,
     ChatParticipant,
     ChatMessage,
-    ChatMessageReceipt,
+    ChatMessageArchive,
+    ChatMessageKey,
+    ChatModerationRule,
+    ChatParticipantRemoval,
 )
 from src.documentation.models import LawDocumentation
 from src.booking.models import (
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
 from pathlib import Path
 from typing import Optional
 from uuid import UUID, uuid4
@@ -105,4 +106,43 @@ async def resolve_avatar_url(avatar_value: str | None, expires_in: int = 3600) -
     if url:
         return url
 
-    return avatar_value
\ No newline at end of file
+    return avatar_value
+
+
+async def resolve_avatar_urls(
+    avatar_values: Iterable[str | None],
+    expires_in: int = 3600,
+) -> dict[str, str | None]:
+    keys_by_value: dict[str, str] = {}
+    resolved: dict[str, str | None] = {}
+    for value in avatar_values:
+        if not value or value in resolved or value in keys_by_value:
+            continue
+        key = extract_key_from_avatar_url(value)
+        if key:
+            keys_by_value[value] = key
+        else:
+            resolved[value] = value
+
+    if not keys_by_value:
+        return resolved
+
+    session = get_session()
+    async with session.create_client(
+        "s3",
+        region_name=settings.AWS_REGION,
+        aws_access_key_id=settings.AWS_ACCESS_KEY,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+    ) as client:
+        for value, key in keys_by_value.items():
+            try:
+                url = await client.generate_presigned_url(
+                    ClientMethod="get_object",
+                    Params={"Bucket": settings.S3_BUCKET, "Key": key},
+                    ExpiresIn=expires_in,
+                )
+            except ClientError as exc:
+                print("Avatar presign error:", exc)
+                url = None
+            resolved[value] = url or value
+    return resolved
@@ -1,11 +1,25 @@
-import axios from 'axios';
+import axios, { AxiosResponse } from 'axios';
 import { Conversation, MessageItem } from '../types/message';
 import envConfig from '../config/env';
 
+type ConversationPage = {
+  items: Conversation[];
+  next_cursor: string | null;
+};
+
 export const getAllConversations = async (): Promise<Conversation[]> => {
   try {
-    const response = await axios.get('/chat/conversations');
-    return response.data as Conversation[];
+    // Danh sách hội thoại được phân trang: đi theo next_cursor tới trang cuối
+    const conversations: Conversation[] = [];
+    let cursor: string | null = null;
+    do {
+      const response: AxiosResponse<ConversationPage> = await axios.get('/chat/conversations', {
+        params: { limit: 100, ...(cursor ? { cursor } : {}) },
+      });
+      conversations.push(...response.data.items);
+      cursor = response.data.next_cursor ?? null;
+    } while (cursor);
+    return conversations;
   } catch (error: any) {
     console.log('error: ', error);
     throw error;
@@ -37,7 +51,7 @@ export const getMessagesByConversationId = async (
     // API có thể trả về trực tiếp array hoặc trong wrapper
     const messages = Array.isArray(response.data)
       ? response.data
-      : response.data?.data || response.data?.messages || [];
+      : response.data?.items || response.data?.data || response.data?.messages || [];
 
     return messages as MessageItem[];
   } catch (error: any) {
@@ -83,6 +97,11 @@ export const connectChatSocket = (token: string) => {
     ws.onmessage = evt => {
       try {
         const parsed = JSON.parse(evt.data);
+        if (parsed?.type === 'ping') {
+          // Server heartbeat: reply so the socket is not reaped as idle
+          ws?.send(JSON.stringify({ type: 'pong' }));
+          return;
+        }
         if (parsed?.type) {
           wsListeners.forEach(cb => cb(parsed as ChatEvent));
         }
@@ -4,16 +4,21 @@ export interface MessageItem {
   sender_id: string;
   content: string;
   created_at: string;
+  seq: number;
   attachment_name?: string;
   attachment_url?: string;
   attachment_content_type?: string;
   attachment_size?: number;
+  delivered_count?: number;
+  read_count?: number;
   delivered_to: string[];
   read_by?: string[];
 }
 
 export interface Conversation {
   id: string;
+  is_group?: boolean;
+  title?: string;
   created_at: string;
   updated_at: string;
   last_message_at?: string;
@@ -30,6 +35,7 @@ export interface Conversation {
     },
   ];
   last_message?: MessageItem;
+  unread_count?: number;
 }
 
 export interface MessageState {